@@ -0,0 +1,149 @@
+"""
+Stage-by-stage timings of analyze_financial_data on synthetic payloads.
+
+Each size is the total number of transactions, split evenly across
+`--accounts` accounts. Every stage is timed `--repeat` times and the
+minimum and median are reported in milliseconds. Results are written as
+JSON so runs from two commits can be compared with `--compare`.
+
+Usage:
+    python -m benchmarks.bench_analyzer --sizes 1000 10000 100000 1000000 -o bench.json
+    python -m benchmarks.bench_analyzer --sizes 10000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from functions.finance_analyzer import (
+    analyze_account, analyze_behavioral_patterns, analyze_financial_data, analyze_transactions,
+    calculate_financial_health, extract_data_overview, generate_aggregate_insights,
+    generate_personalization_context, iter_accounts
+)
+from functions.synthetic_data import generate_fi_data
+from functions.transaction_columns import TransactionStore
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def run_stages(aa_data: dict) -> dict:
+    """Run the pipeline of analyze_financial_data once, returning seconds spent per stage."""
+    timings = {}
+
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage] = time.perf_counter() - started
+        return result
+
+    summary = {"data_overview": timed("overview", extract_data_overview, aa_data)}
+    entries = list(iter_accounts(aa_data))
+    store = timed("parse", TransactionStore.from_transaction_lists, [
+        account.get("transactions", {}).get("transaction", []) for account, _, _ in entries
+    ])
+    summary["accounts"] = timed("per_account", lambda: [
+        analyze_account(account, account_type, fip_id, analyze_transactions(columns))
+        for (account, account_type, fip_id), columns in zip(entries, store.accounts)
+    ])
+    summary["aggregated_insights"] = timed("aggregate", generate_aggregate_insights, summary["accounts"])
+    summary["behavioral_patterns"] = timed("behavioral", analyze_behavioral_patterns, store.timeline)
+    summary["financial_health_indicators"] = timed("health", calculate_financial_health, summary)
+    timed("personalization", generate_personalization_context, summary)
+    timed("end_to_end", analyze_financial_data, aa_data)
+    return timings
+
+
+def bench_size(transactions: int, accounts: int, repeat: int, seed: int) -> dict:
+    started = time.perf_counter()
+    aa_data = generate_fi_data(accounts, max(transactions // accounts, 1), seed=seed)
+    generated = time.perf_counter() - started
+
+    runs = [run_stages(aa_data) for _ in range(repeat)]
+    stages = {
+        stage: {
+            "min_ms": round(min(run[stage] for run in runs) * 1000, 3),
+            "median_ms": round(statistics.median(run[stage] for run in runs) * 1000, 3)
+        }
+        for stage in runs[0]
+    }
+    return {
+        "transactions": transactions,
+        "accounts": accounts,
+        "repeat": repeat,
+        "generate_ms": round(generated * 1000, 3),
+        "stages": stages
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(current: dict, baseline: dict) -> str:
+    """Render per-stage median ratios of `current` against `baseline` for the sizes both contain."""
+    base_results = {(r["transactions"], r["accounts"]): r for r in baseline.get("results", [])}
+    lines = [f"baseline {baseline.get('environment', {}).get('commit')} -> current {current['environment']['commit']}"]
+    for result in current["results"]:
+        base = base_results.get((result["transactions"], result["accounts"]))
+        if base is None:
+            continue
+        lines.append(f"{result['transactions']:>9} txns x {result['accounts']} accounts")
+        for stage, timing in result["stages"].items():
+            before = base["stages"].get(stage, {}).get("median_ms")
+            if not before:
+                continue
+            after = timing["median_ms"]
+            lines.append(f"  {stage:<16}{before:>12.2f} ms {after:>12.2f} ms  x{before / after if after else float('inf'):.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark analyze_financial_data stages on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Total transactions per payload")
+    parser.add_argument("--accounts", type=int, default=3, help="Accounts per payload")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "results": []}
+    for size in args.sizes:
+        result = bench_size(size, args.accounts, args.repeat, args.seed)
+        report["results"].append(result)
+        total = result["stages"]["end_to_end"]["median_ms"]
+        print(f"[bench_analyzer] {size} transactions: end_to_end {total:.1f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
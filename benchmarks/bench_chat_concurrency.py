@@ -0,0 +1,140 @@
+"""
+Concurrent chat throughput of one worker: blocking vs async Gemini calls.
+
+Drives the FastAPI app in process (httpx.ASGITransport, one event loop,
+as in a single uvicorn worker) with `--requests` chat requests,
+`--concurrency` at a time, against the persona and mentor endpoints.
+Gemini is replaced by a fake that takes `--latency-ms` per call, either
+blocking the loop (`blocking`, what calling the synchronous
+generate_content from an async endpoint did) or awaiting
+(`async`, generate_content_async). Supabase is benchmarks.postgrest_standin,
+writes go to a temporary journal, and the mentor's financial analysis is
+precomputed from synthetic data. Reports requests per second and latency
+percentiles per endpoint and mode.
+
+Usage:
+    python -m benchmarks.bench_chat_concurrency --requests 40 --concurrency 1 10 20 -o concurrency.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+import httpx
+from main import app
+from benchmarks.bench_analyzer import environment
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config import async_database, write_journal
+from controllers.chat import mentor, persona
+from functions.fi_records import FiSnapshot
+from functions.finance_analyzer import analyze_financial_data
+from functions.synthetic_data import generate_db_rows
+from routes import mentorRoutes, personaRoutes
+
+ENDPOINTS = {
+    "persona": ("/api/v1/persona/chat", lambda i: {"id": f"user-{i}", "message": "How do I start a SIP?"}),
+    "mentor": ("/api/v1/mentor/chat", lambda i: {"id": f"user-{i}"})
+}
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def fake_model(latency: float, blocking: bool):
+    class FakeGenerativeModel:
+        def __init__(self, **kwargs):
+            pass
+
+        async def generate_content_async(self, contents, **kwargs):
+            if blocking:
+                time.sleep(latency)
+            else:
+                await asyncio.sleep(latency)
+            return FakeResponse("Bro, here's the math. Start with an index fund SIP.")
+
+    return FakeGenerativeModel
+
+
+async def load(client: httpx.AsyncClient, endpoint: str, requests: int, concurrency: int) -> dict:
+    path, body = ENDPOINTS[endpoint]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, json=body(i), headers={"Authorization": "Bearer bench"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests_per_second": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+        "elapsed_s": round(elapsed, 2)
+    }
+
+
+async def run(requests: int, concurrency_levels: list, latency_ms: float) -> dict:
+    standin = PostgrestStandIn()
+    async_database._async_db_instance = async_database.AsyncChatDatabase(*await standin.async_client())
+    write_journal._write_journal = write_journal.WriteJournal(tempfile.mktemp(suffix=".db"))
+
+    accounts, transactions = generate_db_rows(accounts=2, transactions_per_account=500)
+    snapshot = FiSnapshot.from_rows(accounts, transactions, "2025-01-01")
+    analysis = (snapshot, analyze_financial_data(snapshot))
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("blocking", "async"):
+            model = fake_model(latency_ms / 1000, blocking=mode == "blocking")
+            with mock.patch.object(persona.genai, "GenerativeModel", model), \
+                    mock.patch.object(mentor.genai, "GenerativeModel", model), \
+                    mock.patch.object(mentor, "get_financial_analysis", lambda user_id: analysis), \
+                    mock.patch.object(personaRoutes, "verify_token", lambda token: {"user_id": "bench"}), \
+                    mock.patch.object(mentorRoutes, "verify_token", lambda token: {"user_id": "bench"}):
+                for endpoint in ENDPOINTS:
+                    for concurrency in concurrency_levels:
+                        results.setdefault(endpoint, {}).setdefault(mode, {})[str(concurrency)] = (
+                            await load(client, endpoint, requests, concurrency)
+                        )
+    await async_database.close_async_db()
+    await write_journal.stop_write_journal()
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-worker chat throughput with blocking and async model calls.")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint, mode and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 20])
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Simulated Gemini latency per call")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "environment": environment(),
+        "requests": args.requests,
+        "latency_ms": args.latency_ms,
+        "results": asyncio.run(run(args.requests, args.concurrency, args.latency_ms))
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Payload size and decode time of the FI fetch: select('*') vs ACCOUNT_COLUMNS/TRANSACTION_COLUMNS.
+
+Runs against the Supabase project in SUPABASE_URL/SUPABASE_KEY for one
+user, fetching the snapshot once with every column and once with the
+projected ones, and reports functions.fetch_metrics per query for each.
+
+Usage:
+    python -m benchmarks.bench_fetch --user-id <uuid> -o fetch.json
+"""
+import argparse
+import json
+import sys
+from benchmarks.bench_analyzer import environment
+from functions import fi_data
+from functions.fetch_metrics import get_fetch_metrics
+
+
+def run(user_id: str, projected: bool) -> dict:
+    columns = (fi_data.ACCOUNT_COLUMNS, fi_data.TRANSACTION_COLUMNS)
+    if not projected:
+        fi_data.ACCOUNT_COLUMNS, fi_data.TRANSACTION_COLUMNS = ("*",), ("*",)
+    try:
+        get_fetch_metrics().clear()
+        snapshot = fi_data.fetch_fi_snapshot(user_id)
+        return {"transactions": snapshot.transaction_count(), "queries": get_fetch_metrics().snapshot()}
+    finally:
+        fi_data.ACCOUNT_COLUMNS, fi_data.TRANSACTION_COLUMNS = columns
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare FI fetch payloads with and without column projection.")
+    parser.add_argument("--user-id", required=True, help="User whose accounts and transactions are fetched")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "environment": environment(),
+        "results": {"select_all": run(args.user_id, False), "projected": run(args.user_id, True)}
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Per-turn prompt history: the full conversation vs the token-budgeted window.
+
+Grows one conversation in benchmarks.postgrest_standin turn by turn. At
+each checkpoint it reads the history the way persona chat used to
+(get_conversation_messages, every row) and the way it does now
+(get_recent_messages for HISTORY_TAIL_MESSAGES rows, then
+select_history_window), and reports rows read, read time and the
+estimated tokens that would be sent to Gemini.
+
+Usage:
+    python -m benchmarks.bench_history_window --checkpoints 10 100 1000 -o window.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from benchmarks.bench_analyzer import environment
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config.database import ChatDatabase
+from functions.history_cache import to_history_message
+from functions.history_window import HISTORY_TAIL_MESSAGES, select_history_window, window_tokens
+
+WORDS = "budget savings spend salary rent emi invest goal month expense mutual fund sip upi".split()
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def measure(db: ChatDatabase, conversation_id: str) -> dict:
+    started = time.perf_counter()
+    full = [to_history_message(row) for row in db.get_conversation_messages(conversation_id)]
+    full_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    tail = [to_history_message(row) for row in db.get_recent_messages(conversation_id, HISTORY_TAIL_MESSAGES)]
+    window = select_history_window(tail)
+    window_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "full": {"rows_read": len(full), "tokens": window_tokens(full), "read_ms": round(full_ms, 2)},
+        "windowed": {
+            "rows_read": len(tail), "messages_sent": len(window),
+            "tokens": window_tokens(window), "read_ms": round(window_ms, 2)
+        }
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare full-history and windowed prompts as a conversation grows.")
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[10, 100, 1000], help="Turn counts to measure at")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    standin = PostgrestStandIn()
+    db = ChatDatabase(standin.client())
+    db.create_conversation("bench-user", "conv_bench")
+
+    results = {}
+    written = 0
+    for checkpoint in sorted(args.checkpoints):
+        while written < checkpoint:
+            db.add_turn("conv_bench", [
+                {"role": "user", "content": text(rng, rng.randint(10, 60))},
+                {"role": "model", "content": text(rng, rng.randint(80, 400)), "model": "gemini-2.5-flash"}
+            ])
+            written += 1
+        results[str(checkpoint)] = measure(db, "conv_bench")
+
+    report = {"environment": environment(), "tail_messages": HISTORY_TAIL_MESSAGES, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
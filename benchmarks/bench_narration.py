@@ -0,0 +1,88 @@
+"""
+Recipient tallies: per-row split-join keys vs parsed, interned recipient ids.
+
+`split_join` is the tally behavioral patterns used to build, a dict update
+keyed by " - ".join(narration.split("/")[2:-2]) per row. `interned` parses
+each narration with functions.narration, interns the counterparty into an
+integer id and sums with np.bincount, as TransactionColumns and
+TransactionAggregate now do.
+
+Usage:
+    python -m benchmarks.bench_narration --sizes 10000 100000 -o narration.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import numpy as np
+from benchmarks.bench_analyzer import environment
+from functions.finance_analyzer import iter_accounts
+from functions.narration import intern_recipients
+from functions.synthetic_data import generate_fi_data
+from functions.transaction_columns import group_totals
+
+
+def split_join(narrations: list, amounts: list) -> dict:
+    tally = {}
+    for narration, amount in zip(narrations, amounts):
+        if narration:
+            data = narration.split("/")
+            entry = tally.setdefault(" - ".join(data[2:-2]), [0, 0])
+            entry[0] += 1
+            entry[1] += amount
+    return tally
+
+
+def interned(narrations: list, amounts: list) -> dict:
+    recipient_ids = {}
+    codes = np.array(intern_recipients(narrations, recipient_ids), dtype=np.intp)
+    return {
+        label: [count, total]
+        for label, count, total in group_totals(codes, list(recipient_ids), np.array(amounts))
+        if label
+    }
+
+
+def timed(fn, repeat: int, *args) -> tuple[dict, float, float]:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        runs.append(time.perf_counter() - started)
+    return result, round(min(runs) * 1000, 3), round(statistics.median(runs) * 1000, 3)
+
+
+def bench_size(transactions: int, repeat: int, seed: int) -> dict:
+    aa_data = generate_fi_data(1, transactions, seed=seed)
+    rows = [txn for account, _, _ in iter_accounts(aa_data) for txn in account["transactions"]["transaction"]]
+    narrations = [txn["narration"] for txn in rows]
+    amounts = [float(txn["amount"]) for txn in rows]
+
+    result = {"transactions": len(rows), "repeat": repeat}
+    for name, fn in (("split_join", split_join), ("interned", interned)):
+        tally, best, median = timed(fn, repeat, narrations, amounts)
+        result[name] = {"min_ms": best, "median_ms": median, "distinct_keys": len(tally)}
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark recipient key extraction and tallying.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Narrations per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "results": [bench_size(n, args.repeat, args.seed) for n in args.sizes]}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+FI snapshot representations: FI_DATA_READY dicts vs typed fi_records columns.
+
+Both paths start from the same Supabase-shaped rows. `dict` is what
+get_fi_data used to do for every request: render the FI_DATA_READY payload
+(one dict of strings per transaction) and analyze it. `typed` builds a
+FiSnapshot (int64 paise, datetime64 timestamps, interned type/mode codes)
+and analyzes it directly. Each path reports CPU time and wall time for
+building and analyzing, the tracemalloc peak while doing both, and the
+memory still held by the built representation afterwards.
+
+Usage:
+    python -m benchmarks.bench_records --transactions 200000 -o records.json
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from benchmarks.bench_analyzer import environment
+from functions.fi_records import FiSnapshot
+from functions.finance_analyzer import analyze_financial_data
+from functions.synthetic_data import generate_db_rows
+
+
+def build_dict(accounts: list, transactions: list, data_to: str) -> dict:
+    return FiSnapshot.from_rows(accounts, transactions, data_to).to_fi_data()
+
+
+def build_typed(accounts: list, transactions: list, data_to: str) -> FiSnapshot:
+    return FiSnapshot.from_rows(accounts, transactions, data_to)
+
+
+def measure(build, accounts: list, transactions: list, data_to: str) -> dict:
+    """Time and memory for one build + analyze pass."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    built = build(accounts, transactions, data_to)
+    build_wall, build_cpu = time.perf_counter() - wall, time.process_time() - cpu
+    analyze_financial_data(built)
+    total_wall, total_cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return {
+        "build_ms": round(build_wall * 1000, 1),
+        "build_cpu_ms": round(build_cpu * 1000, 1),
+        "total_ms": round(total_wall * 1000, 1),
+        "total_cpu_ms": round(total_cpu * 1000, 1),
+        "peak_mb": round((peak - baseline) / 2 ** 20, 1),
+        "retained_mb": round((retained - baseline) / 2 ** 20, 1)
+    }
+
+
+def timed(build, accounts: list, transactions: list, data_to: str, repeat: int) -> dict:
+    """CPU and wall time without tracemalloc, whose hooks slow allocation-heavy code down."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        analyze_financial_data(build(accounts, transactions, data_to))
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    return {
+        "min_ms": round(min(walls) * 1000, 1),
+        "median_ms": round(statistics.median(walls) * 1000, 1),
+        "median_cpu_ms": round(statistics.median(cpus) * 1000, 1)
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dict vs typed FI snapshots from fetch through analysis.")
+    parser.add_argument("--transactions", type=int, default=200000, help="Transactions for the user, across accounts")
+    parser.add_argument("--accounts", type=int, default=3, help="Accounts the transactions are spread over")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per path")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    accounts, transactions = generate_db_rows(
+        accounts=args.accounts,
+        transactions_per_account=args.transactions // args.accounts,
+        seed=args.seed
+    )
+    data_to = "2025-01-01"
+
+    results = {"transactions": len(transactions), "accounts": len(accounts), "repeat": args.repeat}
+    for name, build in (("dict", build_dict), ("typed", build_typed)):
+        results[name] = {
+            **measure(build, accounts, transactions, data_to),
+            **timed(build, accounts, transactions, data_to, args.repeat)
+        }
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
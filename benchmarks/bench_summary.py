@@ -0,0 +1,105 @@
+"""
+Prompt tokens per persona chat turn: full transcript, window only, and
+window plus the running summary.
+
+Plays a synthetic thread of `--turns` turns through the async data layer on
+benchmarks.postgrest_standin (writes go straight to the stand-in, no
+journal). Before each turn it builds what persona chat would send; after
+each turn it runs the ConversationSummarizer with the deterministic
+ExtractiveSummaryModel, as the background task would. Reports estimated
+prompt tokens at checkpoints and summed over the thread, and how many
+summarizer runs folded messages.
+
+Usage:
+    python -m benchmarks.bench_summary --turns 200 -o summary.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from benchmarks.bench_analyzer import environment
+from benchmarks.bench_history_window import text
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config import async_database, write_journal
+from functions.conversation_summary import ConversationSummarizer, ExtractiveSummaryModel, with_summary
+from functions.history_cache import to_history_message
+from functions.history_window import HISTORY_TAIL_MESSAGES, estimate_tokens, select_history_window, window_tokens
+
+
+async def run(turns: int, seed: int, checkpoints: set) -> dict:
+    rng = random.Random(seed)
+    standin = PostgrestStandIn()
+    db = async_database.AsyncChatDatabase(*await standin.async_client())
+    async_database._async_db_instance = db
+    write_journal.WRITE_BEHIND_ENABLED = False
+    summarizer = ConversationSummarizer(ExtractiveSummaryModel())
+    await db.create_conversation("bench-user", "conv_bench")
+
+    totals = {"full": 0, "window": 0, "summary_and_window": 0}
+    at = {}
+    folds = 0
+    transcript = []
+    try:
+        for turn in range(1, turns + 1):
+            question = text(rng, rng.randint(10, 60))
+            conversation = await db.get_conversation("conv_bench")
+            summary = ((conversation.get("metadata") or {}).get("summary") or {}).get("text")
+            tail = [to_history_message(m) for m in await db.get_recent_messages("conv_bench", HISTORY_TAIL_MESSAGES)]
+            window = select_history_window(tail)
+
+            question_tokens = estimate_tokens(question)
+            prompt = {
+                "full": window_tokens(transcript) + question_tokens,
+                "window": window_tokens(window) + question_tokens,
+                "summary_and_window": window_tokens(window) + question_tokens + estimate_tokens(with_summary("", summary))
+            }
+            for key, tokens in prompt.items():
+                totals[key] += tokens
+            if turn in checkpoints:
+                at[str(turn)] = {**prompt, "summary_tokens": estimate_tokens(summary or "")}
+
+            messages = [
+                {"role": "user", "content": question},
+                {"role": "model", "content": text(rng, rng.randint(80, 400)), "model": "gemini-2.5-flash"}
+            ]
+            await db.add_turn("conv_bench", messages)
+            transcript.extend(to_history_message(m) for m in messages)
+            # persona chat schedules the summarizer when the window dropped messages or the tail is not the whole thread
+            if len(window) < len(tail) or len(tail) >= HISTORY_TAIL_MESSAGES:
+                folds += await summarizer.update("conv_bench")
+    finally:
+        await db.close()
+
+    return {
+        "at_turn": at,
+        "total_prompt_tokens": totals,
+        "reduction_vs_full": round(1 - totals["summary_and_window"] / totals["full"], 3),
+        "summary_updates": folds
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Prompt tokens with and without the rolling summary.")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[10, 50, 100, 150, 200])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "environment": environment(),
+        "turns": args.turns,
+        "results": asyncio.run(run(args.turns, args.seed, set(args.checkpoints)))
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Round trips to persist a chat turn: two add_message calls vs one add_turn.
+
+Runs ChatDatabase and AsyncChatDatabase against benchmarks.postgrest_standin
+with a simulated per-request latency. `add_message` writes the message and
+touches conversations.updated_at as separate requests, so a turn costs four
+round trips (two sequential pairs with the async client, which overlaps each
+pair); `add_turn` sends both messages to the add_conversation_turn RPC in
+one. Reports requests and wall time per turn, and checks both paths leave
+the same messages behind.
+
+Usage:
+    python -m benchmarks.bench_turn_writes --turns 200 --latency-ms 20 -o turns.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from benchmarks.bench_analyzer import environment
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config.async_database import AsyncChatDatabase
+from config.database import ChatDatabase
+
+MESSAGE_FIELDS = ("conversation_id", "role", "content", "model", "token_count", "metadata")
+
+
+def turn(i: int) -> list:
+    return [
+        {"role": "user", "content": f"question {i}", "metadata": {"request_id": i}},
+        {"role": "model", "content": f"answer {i}", "model": "gemini-2.5-flash", "metadata": {"request_id": i}}
+    ]
+
+
+def summarize(standin: PostgrestStandIn, requests_before: int, durations: list) -> dict:
+    return {
+        "requests_per_turn": (standin.requests - requests_before) / len(durations),
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+        "mean_ms": round(statistics.fmean(durations) * 1000, 2),
+        "messages": [{field: row[field] for field in MESSAGE_FIELDS} for row in standin.rows("messages")]
+    }
+
+
+def run_sync(turns: int, latency_ms: float, combined: bool) -> dict:
+    standin = PostgrestStandIn(latency_ms)
+    db = ChatDatabase(standin.client())
+    db.create_conversation("bench-user", "conv_bench")
+    before = standin.requests
+
+    durations = []
+    for i in range(turns):
+        started = time.perf_counter()
+        if combined:
+            db.add_turn("conv_bench", turn(i))
+        else:
+            for message in turn(i):
+                db.add_message("conv_bench", **message)
+        durations.append(time.perf_counter() - started)
+    return summarize(standin, before, durations)
+
+
+async def run_async(turns: int, latency_ms: float, combined: bool) -> dict:
+    standin = PostgrestStandIn(latency_ms)
+    db = AsyncChatDatabase(*await standin.async_client())
+    await db.create_conversation("bench-user", "conv_bench")
+    before = standin.requests
+
+    durations = []
+    try:
+        for i in range(turns):
+            started = time.perf_counter()
+            if combined:
+                await db.add_turn("conv_bench", turn(i))
+            else:
+                for message in turn(i):
+                    await db.add_message("conv_bench", **message)
+            durations.append(time.perf_counter() - started)
+    finally:
+        await db.close()
+    return summarize(standin, before, durations)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare per-turn round trips of add_message and add_turn.")
+    parser.add_argument("--turns", type=int, default=100, help="Turns (user + model message) written per run")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated latency of each request")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "sync": {
+            "add_message": run_sync(args.turns, args.latency_ms, combined=False),
+            "add_turn": run_sync(args.turns, args.latency_ms, combined=True)
+        },
+        "async": {
+            "add_message": asyncio.run(run_async(args.turns, args.latency_ms, combined=False)),
+            "add_turn": asyncio.run(run_async(args.turns, args.latency_ms, combined=True))
+        }
+    }
+    for paths in results.values():
+        paths["same_messages"] = paths["add_message"].pop("messages") == paths["add_turn"].pop("messages")
+
+    report = {
+        "environment": environment(),
+        "turns": args.turns,
+        "latency_ms": args.latency_ms,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
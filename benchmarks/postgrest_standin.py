@@ -0,0 +1,281 @@
+"""
+SQLite-backed stand-in for the PostgREST endpoints the chat tables use.
+
+Serves conversations, messages and mentor_sessions plus the
+add_conversation_turn RPC (sql/add_conversation_turn.sql) behind
+httpx.MockTransport, so ChatDatabase and AsyncChatDatabase run unchanged
+against a local database. Understands the subset of PostgREST the data
+access layer sends: select/insert/update with eq, gte, lte and in filters,
+order, limit, count=exact, is.null, ->/->> JSON paths in filters and
+inserts that ignore duplicates. Unique keys
+follow sql/write_idempotency_keys.sql. Every request is counted, and an optional
+per-request latency stands in for the network round trip.
+
+Usage:
+    standin = PostgrestStandIn(latency_ms=5)
+    db = ChatDatabase(standin.client())
+    async_db = AsyncChatDatabase(*await standin.async_client())
+"""
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+import httpx
+from supabase import AsyncClientOptions, ClientOptions, acreate_client, create_client
+
+URL = "https://standin.supabase.co"
+KEY = "standin-key"
+
+_SCHEMA = (
+    "CREATE TABLE conversations ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, conversation_id TEXT UNIQUE NOT NULL, "
+    "persona TEXT, title TEXT, metadata TEXT, is_archived INTEGER NOT NULL DEFAULT 0, "
+    "created_at TEXT NOT NULL, updated_at TEXT NOT NULL)",
+    "CREATE TABLE messages ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL REFERENCES conversations (conversation_id), "
+    "role TEXT NOT NULL, content TEXT NOT NULL, model TEXT, token_count INTEGER, metadata TEXT, "
+    "client_message_id TEXT UNIQUE, created_at TEXT NOT NULL)",
+    "CREATE INDEX messages_conversation_created_at ON messages (conversation_id, created_at)",
+    "CREATE TABLE mentor_sessions ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, session_id TEXT UNIQUE, question TEXT, "
+    "financial_data TEXT, analysis TEXT, mentor_response TEXT, model TEXT, data_quality TEXT, "
+    "metadata TEXT, created_at TEXT NOT NULL)",
+)
+
+# Columns held as jsonb upstream; stored as text here
+_JSON_COLUMNS = {"metadata", "financial_data", "analysis", "data_quality"}
+_BOOLEAN_COLUMNS = {"is_archived"}
+_TIMESTAMPED = {"conversations": ("created_at", "updated_at"), "messages": ("created_at",), "mentor_sessions": ("created_at",)}
+
+_PATH = re.compile(r"^/rest/v1/(?:(?P<rpc>rpc)/)?(?P<name>\w+)$")
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+class PostgrestStandIn:
+    """In-memory chat tables answering PostgREST requests; see the module docstring."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    # ==================== CLIENTS ====================
+
+    def client(self):
+        """A sync supabase client whose requests are served by this stand-in."""
+        http_client = httpx.Client(transport=httpx.MockTransport(self._handle_sync))
+        return create_client(URL, KEY, options=ClientOptions(httpx_client=http_client))
+
+    async def async_client(self) -> tuple:
+        """(AsyncClient, httpx.AsyncClient) served by this stand-in, as AsyncChatDatabase takes them."""
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle_async))
+        client = await acreate_client(URL, KEY, options=AsyncClientOptions(httpx_client=http_client))
+        return client, http_client
+
+    def _handle_sync(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.handle(request)
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.handle(request)
+
+    # ==================== REQUESTS ====================
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        match = _PATH.match(request.url.path)
+        if not match:
+            return _error(404, f"No route for {request.url.path}")
+
+        with self._lock:
+            self.requests += 1
+            try:
+                with self._conn:
+                    if match["rpc"]:
+                        rows = self._rpc(match["name"], _body(request))
+                        return httpx.Response(200, json=rows)
+                    return self._table(request, match["name"])
+            except (sqlite3.Error, KeyError, ValueError) as e:
+                return _error(400, str(e))
+
+    def _table(self, request: httpx.Request, table: str) -> httpx.Response:
+        if table not in _TIMESTAMPED:
+            return _error(404, f"relation \"{table}\" does not exist")
+        params = list(request.url.params.multi_items())
+        where, args = _where(params)
+
+        if request.method == "GET":
+            sql = f"SELECT {_columns(params)} FROM {table}{where}{_order(params)}"
+            limit = dict(params).get("limit")
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            rows = self._select(sql, args)
+            headers = {}
+            if "count=exact" in request.headers.get("prefer", ""):
+                total = self._conn.execute(f"SELECT COUNT(*) FROM {table}{where}", args).fetchone()[0]
+                headers["content-range"] = f"0-{max(len(rows) - 1, 0)}/{total}"
+            return httpx.Response(200, json=rows, headers=headers)
+
+        if request.method == "POST":
+            body = _body(request)
+            ignore = "resolution=ignore-duplicates" in request.headers.get("prefer", "")
+            rows = [self._insert(table, row, ignore) for row in (body if isinstance(body, list) else [body])]
+            return httpx.Response(201, json=[row for row in rows if row is not None])
+
+        if request.method == "PATCH":
+            values = _body(request)
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            ids = [row["id"] for row in self._select(f"SELECT id FROM {table}{where}", args)]
+            self._conn.execute(
+                f"UPDATE {table} SET {assignments}{where}",
+                [_stored(column, value) for column, value in values.items()] + args
+            )
+            rows = self._select(f"SELECT * FROM {table} WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+            return httpx.Response(200, json=rows)
+
+        return _error(405, f"{request.method} not supported")
+
+    def _rpc(self, name: str, params: dict) -> list:
+        if name != "add_conversation_turn":
+            raise KeyError(f"function {name} does not exist")
+        # Same statements as sql/add_conversation_turn.sql, in one transaction
+        now = datetime.now(timezone.utc)
+        conversation_id = params["p_conversation_id"]
+        self._conn.execute(
+            "UPDATE conversations SET updated_at = ? WHERE conversation_id = ?",
+            (now.isoformat(), conversation_id)
+        )
+        rows = [
+            self._insert("messages", {
+                "conversation_id": conversation_id,
+                "role": message.get("role"),
+                "content": message.get("content"),
+                "model": message.get("model"),
+                "token_count": message.get("token_count"),
+                "metadata": message.get("metadata"),
+                "client_message_id": message.get("client_message_id"),
+                "created_at": (now + timedelta(microseconds=position)).isoformat()
+            }, ignore_duplicates=True)
+            for position, message in enumerate(params["p_messages"])
+        ]
+        return [row for row in rows if row is not None]
+
+    def _insert(self, table: str, row: dict, ignore_duplicates: bool = False) -> dict | None:
+        """Insert `row` and return it as stored; None when ignore_duplicates skipped it."""
+        now = datetime.now(timezone.utc).isoformat()
+        row = {**{column: now for column in _TIMESTAMPED[table]}, **row}
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        conflict = " ON CONFLICT DO NOTHING" if ignore_duplicates else ""
+        cursor = self._conn.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders}){conflict}",
+            [_stored(column, value) for column, value in row.items()]
+        )
+        if not cursor.rowcount:
+            return None
+        return self._select(f"SELECT * FROM {table} WHERE id = ?", [cursor.lastrowid])[0]
+
+    def _select(self, sql: str, args: list) -> list:
+        return [_decoded(dict(row)) for row in self._conn.execute(sql, args)]
+
+    # ==================== INSPECTION ====================
+
+    def rows(self, table: str) -> list:
+        """Every row of `table` in insertion order, decoded as the API returns them."""
+        with self._lock:
+            return self._select(f"SELECT * FROM {table} ORDER BY id", [])
+
+
+def _where(params: list) -> tuple:
+    clauses, args = [], []
+    for column, expression in params:
+        if column in _RESERVED_PARAMS:
+            continue
+        operator, _, value = expression.partition(".")
+        column = _column(column)
+        if operator == "is" and value == "null":
+            clauses.append(f"{column} IS NULL")
+        elif operator == "in":
+            values = [_literal(column, v.strip('"')) for v in unquote(value).strip("()").split(",") if v]
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            args.extend(values)
+        elif operator in ("eq", "gte", "lte", "gt", "lt"):
+            sql_operator = {"eq": "=", "gte": ">=", "lte": "<=", "gt": ">", "lt": "<"}[operator]
+            clauses.append(f"{column} {sql_operator} ?")
+            args.append(_literal(column, value))
+        else:
+            raise ValueError(f"Unsupported filter {column}={expression}")
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+def _column(column: str) -> str:
+    """A filter column as SQL; JSON paths (metadata->summary->>messages) compare as text."""
+    if not re.fullmatch(r"\w+(->>?\w+)*", column):
+        raise ValueError(f"Unsupported column {column}")
+    name, *path = re.split(r"->>?", column)
+    if not path:
+        return name
+    return f"CAST(json_extract({name}, '$.{'.'.join(path)}') AS TEXT)"
+
+
+def _columns(params: list) -> str:
+    select = dict(params).get("select", "*")
+    columns = [column.strip() for column in select.split(",")]
+    if "*" in columns:
+        return "*"
+    if not all(re.fullmatch(r"\w+", column) for column in columns):
+        raise ValueError(f"Unsupported select {select}")
+    return ", ".join(columns)
+
+
+def _order(params: list) -> str:
+    terms = []
+    for key, value in params:
+        if key != "order":
+            continue
+        for term in value.split(","):
+            column, _, direction = term.partition(".")
+            terms.append(f"{column} {'DESC' if direction.startswith('desc') else 'ASC'}")
+    # Postgres leaves ties unordered; breaking them by insertion keeps results stable
+    return " ORDER BY " + ", ".join(terms + ["id"]) if terms else ""
+
+
+def _literal(column: str, value: str):
+    if column in _BOOLEAN_COLUMNS:
+        return 1 if value == "true" else 0
+    return value
+
+
+def _stored(column: str, value):
+    if column in _JSON_COLUMNS and value is not None:
+        return json.dumps(value)
+    if column in _BOOLEAN_COLUMNS:
+        return int(bool(value))
+    return value
+
+
+def _decoded(row: dict) -> dict:
+    for column in _JSON_COLUMNS & row.keys():
+        if row[column] is not None:
+            row[column] = json.loads(row[column])
+    for column in _BOOLEAN_COLUMNS & row.keys():
+        row[column] = bool(row[column])
+    return row
+
+
+def _body(request: httpx.Request):
+    return json.loads(request.content or b"null")
+
+
+def _error(status: int, message: str) -> httpx.Response:
+    return httpx.Response(status, json={"code": str(status), "message": message, "details": None, "hint": None})
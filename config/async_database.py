@@ -0,0 +1,478 @@
+import asyncio
+import os
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import httpx
+from dotenv import load_dotenv
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+from config.global_logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("async_database")
+
+url = os.getenv("SUPABASE_URL")
+key = os.getenv("SUPABASE_KEY")
+
+# Connection pool shared by every request on the worker
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+
+
+class AsyncChatDatabase:
+    """
+    Async counterpart of config.database.ChatDatabase.
+
+    Same tables, methods and return values, awaited on the async supabase
+    client so a slow query only suspends its own request. Queries that do
+    not depend on each other run concurrently over the shared pool.
+    """
+
+    def __init__(self, client: AsyncClient, http_client: httpx.AsyncClient):
+        self.supabase = client
+        self.http_client = http_client
+        logger.info("Async chat database initialized with Supabase")
+
+    async def close(self):
+        await self.http_client.aclose()
+        logger.info("Async chat database connection pool closed")
+
+    # ==================== CONVERSATION OPERATIONS ====================
+
+    async def create_conversation(
+        self,
+        user_id: str,
+        conversation_id: str,
+        persona: str = "sharan",
+        title: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        logger.info(f"Creating conversation | User: {user_id} | ID: {conversation_id} | Persona: {persona}")
+
+        data = {
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "persona": persona,
+            "title": title,
+            "metadata": metadata,
+            "is_archived": False
+        }
+
+        response = await (
+            self.supabase.table("conversations")
+            .insert(data)
+            .execute()
+        )
+
+        if response.data:
+            return response.data[0]
+        return {}
+
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        response = await (
+            self.supabase.table("conversations")
+            .select("*")
+            .eq("conversation_id", conversation_id)
+            .execute()
+        )
+
+        if response.data:
+            return response.data[0]
+        return None
+
+    async def get_user_conversations(
+        self,
+        user_id: str,
+        include_archived: bool = False,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        logger.debug(f"Fetching conversations for user: {user_id}")
+
+        query = (
+            self.supabase.table("conversations")
+            .select("*")
+            .eq("user_id", user_id)
+        )
+
+        if not include_archived:
+            query = query.eq("is_archived", False)
+
+        response = await (
+            query
+            .order("updated_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return response.data or []
+
+    async def update_conversation_title(self, conversation_id: str, title: str):
+        logger.info(f"Updating conversation title | ID: {conversation_id} | Title: {title}")
+
+        await (
+            self.supabase.table("conversations")
+            .update({
+                "title": title,
+                "updated_at": datetime.utcnow().isoformat()
+            })
+            .eq("conversation_id", conversation_id)
+            .execute()
+        )
+
+    async def update_conversation_metadata(
+        self,
+        conversation_id: str,
+        metadata: Dict[str, Any],
+        if_matches: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Replace a conversation's metadata without touching updated_at.
+
+        With `if_matches` ({column or JSON path like "metadata->summary->>messages":
+        value}, None meaning null) the update only applies while every
+        condition holds, as a compare-and-set. Returns whether it applied.
+        """
+        logger.debug(f"Updating conversation metadata | ID: {conversation_id}")
+
+        query = (
+            self.supabase.table("conversations")
+            .update({"metadata": metadata})
+            .eq("conversation_id", conversation_id)
+        )
+        for column, value in (if_matches or {}).items():
+            query = query.is_(column, "null") if value is None else query.eq(column, value)
+
+        response = await query.execute()
+        return bool(response.data)
+
+    async def archive_conversation(self, conversation_id: str):
+        logger.info(f"Archiving conversation | ID: {conversation_id}")
+
+        await (
+            self.supabase.table("conversations")
+            .update({
+                "is_archived": True,
+                "updated_at": datetime.utcnow().isoformat()
+            })
+            .eq("conversation_id", conversation_id)
+            .execute()
+        )
+
+    # ==================== MESSAGE OPERATIONS ====================
+
+    async def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        model: Optional[str] = None,
+        token_count: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        logger.debug(f"Adding message | Conversation: {conversation_id} | Role: {role} | Length: {len(content)} chars")
+
+        data = {
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "model": model,
+            "token_count": token_count,
+            "metadata": metadata
+        }
+
+        # Insert the message and bump the conversation's updated_at together
+        response, _ = await asyncio.gather(
+            self.supabase.table("messages")
+            .insert(data)
+            .execute(),
+            self.supabase.table("conversations")
+            .update({"updated_at": datetime.utcnow().isoformat()})
+            .eq("conversation_id", conversation_id)
+            .execute()
+        )
+
+        if response.data:
+            return response.data[0]
+        return {}
+
+    async def add_turn(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a turn's messages and bump updated_at in one round trip; see ChatDatabase.add_turn."""
+        logger.debug(f"Adding turn | Conversation: {conversation_id} | Messages: {len(messages)}")
+
+        response = await (
+            self.supabase.rpc(
+                "add_conversation_turn",
+                {"p_conversation_id": conversation_id, "p_messages": messages}
+            )
+            .execute()
+        )
+
+        return response.data or []
+
+    async def get_conversation_messages(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        logger.debug(f"Fetching messages for conversation: {conversation_id}")
+
+        query = (
+            self.supabase.table("messages")
+            .select("*")
+            .eq("conversation_id", conversation_id)
+            .order("created_at", desc=False)
+        )
+
+        if limit:
+            query = query.limit(limit)
+
+        response = await query.execute()
+        return response.data or []
+
+    async def get_recent_messages(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        The latest `limit` messages of a conversation, oldest first. Reads
+        the tail with a limited descending query, so the cost does not grow
+        with the length of the conversation.
+        """
+        logger.debug(f"Fetching last {limit} messages for conversation: {conversation_id}")
+
+        response = await (
+            self.supabase.table("messages")
+            .select("id, role, content, token_count, client_message_id, created_at")
+            .eq("conversation_id", conversation_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return list(reversed(response.data or []))
+
+    async def get_messages_between(
+        self,
+        conversation_id: str,
+        created_from: Optional[str],
+        created_before: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` of a conversation's messages, oldest first, with
+        created_from <= created_at < created_before (either bound may be
+        None). Used to fold turns older than the tail into the summary.
+        """
+        logger.debug(f"Fetching messages from {created_from} before {created_before} for conversation: {conversation_id}")
+
+        query = (
+            self.supabase.table("messages")
+            .select("id, role, content, created_at")
+            .eq("conversation_id", conversation_id)
+        )
+        if created_from:
+            query = query.gte("created_at", created_from)
+        if created_before:
+            query = query.lt("created_at", created_before)
+
+        response = await query.order("created_at", desc=False).limit(limit).execute()
+        return response.data or []
+
+    async def get_conversation_with_messages(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        conversation, messages = await asyncio.gather(
+            self.get_conversation(conversation_id),
+            self.get_conversation_messages(conversation_id)
+        )
+        if not conversation:
+            return None
+
+        conversation['messages'] = messages
+
+        return conversation
+
+    # ==================== FINANCIAL SESSION OPERATIONS ====================
+
+    async def save_financial_session(
+        self,
+        user_id: str,
+        session_id: str,
+        question: str,
+        financial_data: Dict[str, Any],
+        analysis: Dict[str, Any],
+        mentor_response: str,
+        model: str,
+        data_quality: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        logger.info(f"Saving financial session | User: {user_id} | Session: {session_id}")
+
+        data = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "question": question,
+            "financial_data": financial_data,
+            "analysis": analysis,
+            "mentor_response": mentor_response,
+            "model": model,
+            "data_quality": data_quality,
+            "metadata": metadata
+        }
+
+        response = await (
+            self.supabase.table("mentor_sessions")
+            .insert(data)
+            .execute()
+        )
+
+        if response.data:
+            return response.data[0]
+        return {}
+
+    async def save_financial_sessions(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert several sessions (save_financial_session's fields) in one
+        request. Sessions whose session_id is already stored are skipped, so
+        a resent batch is applied once.
+        """
+        logger.info(f"Saving financial sessions | Count: {len(sessions)}")
+
+        response = await (
+            self.supabase.table("mentor_sessions")
+            .upsert(sessions, on_conflict="session_id", ignore_duplicates=True)
+            .execute()
+        )
+
+        return response.data or []
+
+    async def get_financial_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        response = await (
+            self.supabase.table("mentor_sessions")
+            .select("*")
+            .eq("session_id", session_id)
+            .execute()
+        )
+
+        if response.data:
+            return response.data[0]
+        return None
+
+    async def get_user_financial_sessions(
+        self,
+        user_id: str,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        logger.debug(f"Fetching financial sessions for user: {user_id}")
+
+        response = await (
+            self.supabase.table("mentor_sessions")
+            .select("*")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return response.data or []
+
+    # ==================== STATISTICS & ANALYTICS ====================
+
+    async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
+        conv_response, conv_ids_response, sessions_response = await asyncio.gather(
+            # Total conversations
+            self.supabase.table("conversations")
+            .select("id", count="exact")
+            .eq("user_id", user_id)
+            .execute(),
+            # Conversation IDs for message count
+            self.supabase.table("conversations")
+            .select("conversation_id")
+            .eq("user_id", user_id)
+            .execute(),
+            # Total financial sessions
+            self.supabase.table("mentor_sessions")
+            .select("id", count="exact")
+            .eq("user_id", user_id)
+            .execute()
+        )
+        total_conversations = conv_response.count or 0
+        conv_ids = [c["conversation_id"] for c in (conv_ids_response.data or [])]
+        total_financial_sessions = sessions_response.count or 0
+
+        # Total messages
+        total_messages = 0
+        if conv_ids:
+            msg_response = await (
+                self.supabase.table("messages")
+                .select("id", count="exact")
+                .in_("conversation_id", conv_ids)
+                .execute()
+            )
+            total_messages = msg_response.count or 0
+
+        return {
+            "user_id": user_id,
+            "total_conversations": total_conversations,
+            "total_messages": total_messages,
+            "total_financial_sessions": total_financial_sessions
+        }
+
+    async def get_recent_activity(self, user_id: str, days: int = 7) -> Dict[str, Any]:
+        cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+        conv_response, sessions_response = await asyncio.gather(
+            # Recent conversations
+            self.supabase.table("conversations")
+            .select("conversation_id, persona, title, created_at, updated_at")
+            .eq("user_id", user_id)
+            .gte("updated_at", cutoff_date)
+            .order("updated_at", desc=True)
+            .execute(),
+            # Recent financial sessions
+            self.supabase.table("mentor_sessions")
+            .select("session_id, question, created_at")
+            .eq("user_id", user_id)
+            .gte("created_at", cutoff_date)
+            .order("created_at", desc=True)
+            .execute()
+        )
+
+        return {
+            "user_id": user_id,
+            "days": days,
+            "recent_conversations": conv_response.data or [],
+            "recent_financial_sessions": sessions_response.data or []
+        }
+
+
+async def init_async_db() -> AsyncChatDatabase:
+    """Create the pooled HTTP client and async supabase client; called from the app lifespan."""
+    global _async_db_instance
+    if _async_db_instance is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE
+            ),
+            timeout=SUPABASE_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            http2=True
+        )
+        client = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+        _async_db_instance = AsyncChatDatabase(client, http_client)
+    return _async_db_instance
+
+
+async def close_async_db():
+    global _async_db_instance
+    if _async_db_instance is not None:
+        await _async_db_instance.close()
+        _async_db_instance = None
+
+
+# Global async database instance
+_async_db_instance = None
+
+
+async def get_async_db() -> AsyncChatDatabase:
+    """The lifespan-created instance; created on first use when running without the app lifespan."""
+    if _async_db_instance is None:
+        return await init_async_db()
+    return _async_db_instance
@@ -24,8 +24,8 @@ class ChatDatabase:
     - mentor_sessions
     """
 
-    def __init__(self):
-        self.supabase = supabase
+    def __init__(self, client=None):
+        self.supabase = client or supabase
         logger.info("Chat database initialized with Supabase")
 
     # ==================== CONVERSATION OPERATIONS ====================
@@ -110,6 +110,32 @@ class ChatDatabase:
             .execute()
         )
 
+    def update_conversation_metadata(
+        self,
+        conversation_id: str,
+        metadata: Dict[str, Any],
+        if_matches: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Replace a conversation's metadata without touching updated_at.
+
+        With `if_matches` ({column or JSON path like "metadata->summary->>messages":
+        value}, None meaning null) the update only applies while every
+        condition holds, as a compare-and-set. Returns whether it applied.
+        """
+        logger.debug(f"Updating conversation metadata | ID: {conversation_id}")
+
+        query = (
+            self.supabase.table("conversations")
+            .update({"metadata": metadata})
+            .eq("conversation_id", conversation_id)
+        )
+        for column, value in (if_matches or {}).items():
+            query = query.is_(column, "null") if value is None else query.eq(column, value)
+
+        response = query.execute()
+        return bool(response.data)
+
     def archive_conversation(self, conversation_id: str):
         logger.info(f"Archiving conversation | ID: {conversation_id}")
 
@@ -164,6 +190,26 @@ class ChatDatabase:
             return response.data[0]
         return {}
 
+    def add_turn(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert a turn's messages and bump the conversation's updated_at in one
+        round trip (the add_conversation_turn RPC in sql/). Each message is a
+        dict of add_message's fields: role, content, and optionally model,
+        token_count, metadata and a client_message_id; messages whose id is
+        already stored are skipped. Returns the inserted rows in order.
+        """
+        logger.debug(f"Adding turn | Conversation: {conversation_id} | Messages: {len(messages)}")
+
+        response = (
+            self.supabase.rpc(
+                "add_conversation_turn",
+                {"p_conversation_id": conversation_id, "p_messages": messages}
+            )
+            .execute()
+        )
+
+        return response.data or []
+
     def get_conversation_messages(
         self,
         conversation_id: str,
@@ -184,6 +230,52 @@ class ChatDatabase:
         response = query.execute()
         return response.data or []
 
+    def get_recent_messages(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        The latest `limit` messages of a conversation, oldest first. Reads
+        the tail with a limited descending query, so the cost does not grow
+        with the length of the conversation.
+        """
+        logger.debug(f"Fetching last {limit} messages for conversation: {conversation_id}")
+
+        response = (
+            self.supabase.table("messages")
+            .select("id, role, content, token_count, client_message_id, created_at")
+            .eq("conversation_id", conversation_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return list(reversed(response.data or []))
+
+    def get_messages_between(
+        self,
+        conversation_id: str,
+        created_from: Optional[str],
+        created_before: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` of a conversation's messages, oldest first, with
+        created_from <= created_at < created_before (either bound may be
+        None). Used to fold turns older than the tail into the summary.
+        """
+        logger.debug(f"Fetching messages from {created_from} before {created_before} for conversation: {conversation_id}")
+
+        query = (
+            self.supabase.table("messages")
+            .select("id, role, content, created_at")
+            .eq("conversation_id", conversation_id)
+        )
+        if created_from:
+            query = query.gte("created_at", created_from)
+        if created_before:
+            query = query.lt("created_at", created_before)
+
+        response = query.order("created_at", desc=False).limit(limit).execute()
+        return response.data or []
+
     def get_conversation_with_messages(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         conversation = self.get_conversation(conversation_id)
         if not conversation:
@@ -232,6 +324,22 @@ class ChatDatabase:
             return response.data[0]
         return {}
 
+    def save_financial_sessions(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert several sessions (save_financial_session's fields) in one
+        request. Sessions whose session_id is already stored are skipped, so
+        a resent batch is applied once.
+        """
+        logger.info(f"Saving financial sessions | Count: {len(sessions)}")
+
+        response = (
+            self.supabase.table("mentor_sessions")
+            .upsert(sessions, on_conflict="session_id", ignore_duplicates=True)
+            .execute()
+        )
+
+        return response.data or []
+
     def get_financial_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         response = (
             self.supabase.table("mentor_sessions")
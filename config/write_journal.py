@@ -0,0 +1,409 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+from config.async_database import SUPABASE_TIMEOUT_SECONDS, get_async_db
+from config.global_logger import get_logger
+from functions.profiling import Histogram
+
+load_dotenv()
+
+logger = get_logger("write_journal")
+
+WRITE_JOURNAL_DB = os.getenv("WRITE_JOURNAL_DB", "data/write_journal.db")
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1").lower() in ("1", "true", "yes")
+# Entries sent to Supabase per flush
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "100"))
+# How long an entry may wait for a batch to fill before it is flushed anyway
+WRITE_BEHIND_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_INTERVAL_MS", "100"))
+# Failed entries are retried with exponential backoff, then moved to journal_failed
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
+WRITE_BEHIND_MAX_BACKOFF_SECONDS = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_SECONDS", "60"))
+# Upper bound on draining the journal during shutdown; the rest replays on the next start
+WRITE_BEHIND_DRAIN_SECONDS = float(os.getenv("WRITE_BEHIND_DRAIN_SECONDS", "10"))
+# How long a flusher owns the entries it claimed; after that another worker may resend them.
+# Well past the client timeout, so a request still in flight never loses its lease.
+WRITE_BEHIND_LEASE_SECONDS = float(os.getenv("WRITE_BEHIND_LEASE_SECONDS", str(SUPABASE_TIMEOUT_SECONDS * 3)))
+
+TURN = "turn"
+FINANCIAL_SESSION = "financial_session"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS journal ("
+    "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, "
+    "enqueued_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, "
+    "last_error TEXT, claimed_by TEXT, claimed_until REAL NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS journal_key_seq ON journal (key, seq)",
+    "CREATE TABLE IF NOT EXISTS journal_failed ("
+    "seq INTEGER PRIMARY KEY, kind TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, "
+    "enqueued_at REAL NOT NULL, attempts INTEGER NOT NULL, last_error TEXT, "
+    "failed_at REAL NOT NULL)",
+)
+
+# Columns added after the first release, for journal files created before them
+_MIGRATIONS = (
+    ("journal", "claimed_by", "ALTER TABLE journal ADD COLUMN claimed_by TEXT"),
+    ("journal", "claimed_until", "ALTER TABLE journal ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0"),
+)
+
+# Leases the ready entries to one flusher: entries neither backing off nor
+# claimed by a live lease, whose key has no earlier entry that is, so a
+# retried or in-flight turn is never overtaken by a later turn of the same
+# conversation, and two workers sharing the file never send the same entry
+_CLAIM = (
+    "UPDATE journal SET claimed_by = ?, claimed_until = ? WHERE seq IN ("
+    "SELECT seq FROM journal j "
+    "WHERE next_attempt_at <= ? AND claimed_until <= ? AND NOT EXISTS ("
+    "SELECT 1 FROM journal e WHERE e.key = j.key AND e.seq < j.seq "
+    "AND (e.next_attempt_at > ? OR e.claimed_until > ?)) "
+    "ORDER BY seq LIMIT ?) "
+    "RETURNING seq, kind, key, payload, enqueued_at, attempts"
+)
+
+
+class JournalEntry:
+    __slots__ = ("seq", "kind", "key", "payload", "enqueued_at", "attempts")
+
+    def __init__(self, seq, kind, key, payload, enqueued_at, attempts):
+        self.seq = seq
+        self.kind = kind
+        self.key = key
+        self.payload = json.loads(payload)
+        self.enqueued_at = enqueued_at
+        self.attempts = attempts
+
+
+class WriteJournal:
+    """
+    Write-behind layer for chat turns and financial sessions.
+
+    Writes are appended to a local SQLite journal (WAL, synchronous=FULL)
+    and the caller returns as soon as the append is durable. A flusher task
+    sends them to Supabase in batches: each conversation's pending turns go
+    out as one add_turn call in journal order, and financial sessions as one
+    bulk insert. Entries are deleted only after Supabase accepted them, so
+    whatever is left when the process stops is replayed by the next flusher.
+
+    Workers may share one WRITE_JOURNAL_DB: a flusher leases the entries it
+    sends for WRITE_BEHIND_LEASE_SECONDS, and one that crashed mid-flush
+    loses its lease. A resend after a lease expired or a timed-out request
+    is applied once, because messages carry a client_message_id and
+    sessions a session_id that Supabase ignores duplicates of. Reads that
+    must see a conversation's unflushed turns go through `conversation_messages`.
+    """
+
+    def __init__(self, path: str = WRITE_JOURNAL_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._key_locks = weakref.WeakValueDictionary()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._worker = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Appends since the flusher last ran, to wake it once a batch is waiting
+        self._appended = 0
+
+        self.flush_latency = Histogram()
+        self.flush_lag = Histogram()
+        self.flushed = 0
+        self.retries = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            for table, column, statement in _MIGRATIONS:
+                if column not in {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}:
+                    self._conn.execute(statement)
+        logger.info(f"Write journal initialized | Path: {path} | Pending: {self.depth()}")
+
+    def _key_lock(self, key: str) -> asyncio.Lock:
+        # Kept only while someone holds a reference, so idle conversations cost nothing
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = self._key_locks[key] = asyncio.Lock()
+        return lock
+
+    # ==================== WRITES ====================
+
+    async def add_turn(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        """Journal a turn for AsyncChatDatabase.add_turn; messages need a client_message_id (see with_message_ids)."""
+        await self._append(TURN, conversation_id, {"conversation_id": conversation_id, "messages": messages})
+
+    async def save_financial_session(self, **fields):
+        """Journal a session with AsyncChatDatabase.save_financial_session's arguments."""
+        await self._append(FINANCIAL_SESSION, fields["session_id"], fields)
+
+    async def _append(self, kind: str, key: str, payload: dict):
+        encoded = json.dumps(payload, default=str)
+        appended = await asyncio.to_thread(self._insert, kind, key, encoded)
+        if appended >= WRITE_BEHIND_BATCH:
+            self._wake.set()
+
+    def _insert(self, kind: str, key: str, payload: str) -> int:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO journal (kind, key, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                (kind, key, payload, time.time())
+            )
+            self._appended += 1
+            return self._appended
+
+    # ==================== READS ====================
+
+    async def conversation_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Stored messages followed by the conversation's journaled, not yet
+        flushed ones; only the latest `limit` of them when given.
+        """
+        db = await get_async_db()
+        # Held by this process's flusher while it writes the conversation
+        async with self._key_lock(conversation_id):
+            # Pending first: a turn another worker flushes in between is then in
+            # both reads, and dropped below by its id, rather than in neither
+            pending = await asyncio.to_thread(self._pending_turns, conversation_id)
+            if limit:
+                stored = await db.get_recent_messages(conversation_id, limit)
+            else:
+                stored = await db.get_conversation_messages(conversation_id)
+        stored_ids = {message.get("client_message_id") for message in stored} - {None}
+        messages = stored + [
+            {"conversation_id": conversation_id, **message}
+            for turn in pending for message in turn["messages"]
+            if message.get("client_message_id") not in stored_ids
+        ]
+        return messages[-limit:] if limit else messages
+
+    def _pending_turns(self, conversation_id: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM journal WHERE kind = ? AND key = ? ORDER BY seq",
+                (TURN, conversation_id)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    # ==================== FLUSHING ====================
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="write-journal-flusher")
+
+    async def stop(self):
+        """Flush what can be flushed within WRITE_BEHIND_DRAIN_SECONDS and stop the flusher."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, WRITE_BEHIND_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Write journal drain timed out | Pending: {self.depth()}")
+        self._task = None
+        logger.info(f"Write journal flusher stopped | Pending: {self.depth()}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), WRITE_BEHIND_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write journal flush failed | Error: {type(e).__name__}: {e}", exc_info=True)
+            if self._stopping:
+                return
+
+    async def flush(self) -> int:
+        """Send every ready entry to Supabase, batch by batch; returns how many were written."""
+        written = 0
+        self._appended = 0
+        while True:
+            batch = await asyncio.to_thread(self._claim_batch)
+            if not batch:
+                return written
+            started = time.perf_counter()
+            written += await self._flush_batch(batch)
+            self.flush_latency.observe((time.perf_counter() - started) * 1000)
+            if len(batch) < WRITE_BEHIND_BATCH:
+                return written
+
+    def _claim_batch(self) -> List[JournalEntry]:
+        now = time.time()
+        with self._lock, self._conn:
+            # Take the write lock before reading, so no other worker claims the same rows in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                _CLAIM, (self._worker, now + WRITE_BEHIND_LEASE_SECONDS, now, now, now, now, WRITE_BEHIND_BATCH)
+            ).fetchall()
+        return sorted((JournalEntry(*row) for row in rows), key=lambda entry: entry.seq)
+
+    async def _flush_batch(self, batch: List[JournalEntry]) -> int:
+        db = await get_async_db()
+        turns: dict[str, List[JournalEntry]] = defaultdict(list)
+        sessions = []
+        for entry in batch:
+            if entry.kind == TURN:
+                turns[entry.key].append(entry)
+            else:
+                sessions.append(entry)
+
+        async def write_turns(conversation_id: str, entries: List[JournalEntry]) -> int:
+            async with self._key_lock(conversation_id):
+                messages = [message for entry in entries for message in entry.payload["messages"]]
+                return await self._settle(entries, db.add_turn(conversation_id, messages))
+
+        async def write_sessions() -> int:
+            return await self._settle(sessions, db.save_financial_sessions([entry.payload for entry in sessions]))
+
+        results = await asyncio.gather(
+            *(write_turns(conversation_id, entries) for conversation_id, entries in turns.items()),
+            *([write_sessions()] if sessions else [])
+        )
+        return sum(results)
+
+    async def _settle(self, entries: List[JournalEntry], write) -> int:
+        """Await `write`; delete `entries` if it succeeded, schedule a retry otherwise."""
+        try:
+            await write
+        except Exception as e:
+            await asyncio.to_thread(self._record_failure, entries, f"{type(e).__name__}: {e}")
+            return 0
+
+        await asyncio.to_thread(self._delete, entries)
+        now = time.time()
+        for entry in entries:
+            self.flush_lag.observe((now - entry.enqueued_at) * 1000)
+        self.flushed += len(entries)
+        return len(entries)
+
+    def _delete(self, entries: List[JournalEntry]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM journal WHERE seq = ?", [(entry.seq,) for entry in entries])
+
+    def _record_failure(self, entries: List[JournalEntry], error: str):
+        now = time.time()
+        with self._lock, self._conn:
+            for entry in entries:
+                attempts = entry.attempts + 1
+                if attempts >= WRITE_BEHIND_MAX_ATTEMPTS:
+                    logger.error(
+                        f"Write journal entry dropped after {attempts} attempts | Kind: {entry.kind} | "
+                        f"Key: {entry.key} | Seq: {entry.seq} | Error: {error}"
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO journal_failed "
+                        "(seq, kind, key, payload, enqueued_at, attempts, last_error, failed_at) "
+                        "SELECT seq, kind, key, payload, enqueued_at, ?, ?, ? FROM journal "
+                        "WHERE seq = ? AND claimed_by = ?",
+                        (attempts, error, now, entry.seq, self._worker)
+                    )
+                    self._conn.execute(
+                        "DELETE FROM journal WHERE seq = ? AND claimed_by = ?", (entry.seq, self._worker)
+                    )
+                else:
+                    backoff = min(2 ** (attempts - 1), WRITE_BEHIND_MAX_BACKOFF_SECONDS)
+                    # Only while still ours: past the lease another worker may already be resending it
+                    self._conn.execute(
+                        "UPDATE journal SET attempts = ?, next_attempt_at = ?, last_error = ?, "
+                        "claimed_by = NULL, claimed_until = 0 WHERE seq = ? AND claimed_by = ?",
+                        (attempts, now + backoff, error, entry.seq, self._worker)
+                    )
+                    self.retries += 1
+        logger.warning(f"Write journal flush failed, will retry | Entries: {len(entries)} | Error: {error}")
+
+    # ==================== METRICS ====================
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            depth, oldest = self._conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM journal").fetchone()
+            failed = self._conn.execute("SELECT COUNT(*) FROM journal_failed").fetchone()[0]
+        return {
+            "queue_depth": depth,
+            "oldest_pending_age_ms": round((time.time() - oldest) * 1000, 2) if oldest else 0.0,
+            "flushed": self.flushed,
+            "retries": self.retries,
+            "dead_lettered": failed,
+            "flush_latency": self.flush_latency.to_dict(),
+            "enqueue_to_flush": self.flush_lag.to_dict()
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ==================== CALLERS ====================
+
+def with_message_ids(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Messages with a client_message_id, the key that makes a resent turn a no-op."""
+    return [{"client_message_id": str(uuid.uuid4()), **message} for message in messages]
+
+
+async def persist_turn(conversation_id: str, messages: List[Dict[str, Any]]):
+    """Save a chat turn through the journal, or directly when WRITE_BEHIND_ENABLED=0."""
+    messages = with_message_ids(messages)
+    if WRITE_BEHIND_ENABLED:
+        await get_write_journal().add_turn(conversation_id, messages)
+    else:
+        await (await get_async_db()).add_turn(conversation_id, messages)
+
+
+async def persist_financial_session(**fields):
+    """Save a financial session through the journal, or directly when WRITE_BEHIND_ENABLED=0."""
+    if WRITE_BEHIND_ENABLED:
+        await get_write_journal().save_financial_session(**fields)
+    else:
+        await (await get_async_db()).save_financial_session(**fields)
+
+
+async def load_conversation_messages(conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """A conversation's messages (the latest `limit` when given) including turns still waiting in the journal."""
+    if WRITE_BEHIND_ENABLED:
+        return await get_write_journal().conversation_messages(conversation_id, limit)
+    db = await get_async_db()
+    if limit:
+        return await db.get_recent_messages(conversation_id, limit)
+    return await db.get_conversation_messages(conversation_id)
+
+
+def start_write_journal():
+    """Open the journal and start its flusher, replaying anything left from the last run."""
+    if WRITE_BEHIND_ENABLED:
+        get_write_journal().start()
+
+
+async def stop_write_journal():
+    """Drain and stop the flusher; called from the app lifespan before the database closes."""
+    global _write_journal
+    if _write_journal is not None:
+        await _write_journal.stop()
+        _write_journal.close()
+        _write_journal = None
+
+
+# Global write journal instance
+_write_journal = None
+
+
+def get_write_journal() -> WriteJournal:
+    global _write_journal
+    if _write_journal is None:
+        _write_journal = WriteJournal()
+    return _write_journal
@@ -0,0 +1,10 @@
+summary_prompt = """You keep a running summary of a conversation between a user and Sharan, their personal finance mentor.
+
+You are given the summary so far (possibly empty) and the next messages of the conversation, oldest first.
+Return the updated summary: the user's situation and numbers they shared (income, expenses, debts, goals),
+questions they asked, advice Sharan gave and anything the user agreed to do. Prefer facts and figures over tone.
+Write plain sentences in the third person, no headings, at most {max_words} words. Return only the summary."""
+
+summary_preamble = """# Earlier in this conversation
+Summary of the turns before the messages you can see:
+{summary}"""
@@ -1,5 +1,5 @@
 from config.global_logger import get_logger
-from config.database import get_db
+from config.write_journal import persist_financial_session
 import os
 from dotenv import load_dotenv
 import uuid
@@ -7,9 +7,12 @@ from pydantic import BaseModel
 from google.generativeai.types import GenerationConfig
 import google.generativeai as genai
 from functions.mentor_prompt_builder import get_system_prompt
-from functions.finance_analyzer import analyze_financial_data
-from functions.fi_data import get_fi_data
-from typing import Optional
+from functions.analysis_cache import get_financial_analysis
+from functions.profiling import stage
+from controllers.chat.sse import sse_event, stream_text
+from typing import AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import time
 
 load_dotenv()
@@ -28,86 +31,100 @@ class FinancialMentorResponse(BaseModel):
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-async def financial_mentor(request: FinancialMentorRequest, user_id: str):
-    db = get_db()
-    request_id = str(uuid.uuid4())
+async def _prepare_mentor(request: FinancialMentorRequest, request_id: str, user_id: str) -> tuple:
+    """Financial analysis and the Gemini model prompted with it. Returns (financial_data, model)."""
+    # Step 1: Validate and analyze financial data
+    logger.info(f"Step 1: Getting financial Data | Request ID: {request_id}", extra={"request_id": request_id})
+    # Fetch, mirror sync and analysis are blocking; keep them off the event loop
+    with stage("financial_analysis"):
+        financial_data, data = await run_in_threadpool(get_financial_analysis, user_id)
+    # logger.info(f"Data: {data}")
+    #Step 2: Build system prompt
+    logger.info(f"Step 2: Building System Prompt | Request ID: {request_id}", extra={"request_id": request_id})
+    with stage("system_prompt"):
+        system_prompt = get_system_prompt(data)
 
-    financial_data = get_fi_data(user_id=user_id)
-    logger.info(
-        f"Financial Mentor API called | User ID: {user_id} | Question: {request.message[:100]}... | Request ID: {request_id}",
-        extra={"request_id": request_id, "user_id": user_id, "endpoint": "/api/v1/financial-mentor"}
+    # Step 3: Generate AI mentor response with optimized config
+    logger.info(f"Step 3: Generating AI mentor response | Request ID: {request_id}", extra={"request_id": request_id})
+    # Configure generation parameters for financial mentorship
+    # Using slightly lower temperature for more consistent financial advice
+    logger.debug(
+        f"Configuring Gemini model | temperature=0.8, top_p=0.95, top_k=40 | Request ID: {request_id}",
+        extra={"request_id": request_id}
     )
 
+    generation_config = GenerationConfig(
+        temperature=0.8,  # Slightly lower for financial advice consistency
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=3000,  # Allow longer responses for detailed advice
+    )
 
-    try:
-        # Step 1: Validate and analyze financial data
-        logger.info(f"Step 1: Getting financial Data | Request ID: {request_id}", extra={"request_id": request_id})
-        data = analyze_financial_data(financial_data)
-        # logger.info(f"Data: {data}")
-        #Step 2: Build system prompt
-        logger.info(f"Step 2: Building System Prompt | Request ID: {request_id}", extra={"request_id": request_id})
-        system_prompt = get_system_prompt(data)
+    # Initialize Gemini model with financial mentor persona
+    model = genai.GenerativeModel(
+        model_name='gemini-2.5-pro',
+        system_instruction=system_prompt,
+        generation_config=generation_config
+    )
+    return financial_data, model
 
-        # Step 3: Generate AI mentor response with optimized config
-        logger.info(f"Step 3: Generating AI mentor response | Request ID: {request_id}", extra={"request_id": request_id})
-        try:
-            # Configure generation parameters for financial mentorship
-            # Using slightly lower temperature for more consistent financial advice
-            logger.debug(
-                f"Configuring Gemini model | temperature=0.8, top_p=0.95, top_k=40 | Request ID: {request_id}",
-                extra={"request_id": request_id}
-            )
-
-            generation_config = GenerationConfig(
-                temperature=0.8,  # Slightly lower for financial advice consistency
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=3000,  # Allow longer responses for detailed advice
-            )
-
-            # Initialize Gemini model with financial mentor persona
-            model = genai.GenerativeModel(
-                model_name='gemini-2.5-pro',
-                system_instruction=system_prompt,
-                generation_config=generation_config
-            )
-
-            logger.info(f"Calling Gemini API for financial mentorship | Request ID: {request_id}", extra={"request_id": request_id})
-
-            # Generate response
-            response = model.generate_content(request.message)
-            mentor_response = response.text
 
-            logger.info(
-                f"Mentor response generated | Response length: {len(mentor_response)} chars | Request ID: {request_id}",
-                extra={"request_id": request_id, "response_length": len(mentor_response)}
-            )
-
-        except Exception as error:
-            extra = {"request_id": request_id} if request_id else {}
-            logger.error(
-                f"Error in financial_mentor: {type(error).__name__}: {str(error)}",
-                exc_info=True,
-                extra=extra
-            )
-            kwargs = {"request_id": request_id, "user_id": request.id}
-            logger.error(f"Error context: {kwargs}", extra=extra)
-
-
-        # Step 4: Save financial session to database
-        logger.info(f"Saving financial session to database | Request ID: {request_id}", extra={"request_id": request_id})
-        session_id = f"fin_session_{request.id}_{int(time.time())}"
-        db.save_financial_session(
+async def _save_session(request: FinancialMentorRequest, financial_data, mentor_response: str, request_id: str) -> str:
+    # Step 4: Save financial session to database
+    logger.info(f"Saving financial session to database | Request ID: {request_id}", extra={"request_id": request_id})
+    # Unique per request: save_financial_sessions drops repeats of a session_id as resends
+    session_id = f"fin_session_{request.id}_{int(time.time())}_{request_id[:8]}"
+    with stage("save_financial_session"):
+        fi_data = await run_in_threadpool(financial_data.to_fi_data)
+        await persist_financial_session(
             user_id=request.id,
             session_id=session_id,
             question=request.message,
-            financial_data=financial_data,
+            financial_data=fi_data,
             analysis="",
             mentor_response=mentor_response,
             model="gemini-2.5-flash",
             data_quality={},
             metadata={"request_id": request_id}
         )
+    return session_id
+
+
+def _log_error(error: Exception, request_id: str, request: FinancialMentorRequest):
+    extra = {"request_id": request_id} if request_id else {}
+    logger.error(
+        f"Error in financial_mentor: {type(error).__name__}: {str(error)}",
+        exc_info=True,
+        extra=extra
+    )
+    kwargs = {"request_id": request_id, "user_id": request.id}
+    logger.error(f"Error context: {kwargs}", extra=extra)
+
+
+async def financial_mentor(request: FinancialMentorRequest, user_id: str):
+    request_id = str(uuid.uuid4())
+
+    logger.info(
+        f"Financial Mentor API called | User ID: {user_id} | Question: {request.message[:100]}... | Request ID: {request_id}",
+        extra={"request_id": request_id, "user_id": user_id, "endpoint": "/api/v1/financial-mentor"}
+    )
+
+    try:
+        financial_data, model = await _prepare_mentor(request, request_id, user_id)
+
+        logger.info(f"Calling Gemini API for financial mentorship | Request ID: {request_id}", extra={"request_id": request_id})
+
+        # Generate response
+        with stage("gemini"):
+            response = await model.generate_content_async(request.message)
+            mentor_response = response.text
+
+        logger.info(
+            f"Mentor response generated | Response length: {len(mentor_response)} chars | Request ID: {request_id}",
+            extra={"request_id": request_id, "response_length": len(mentor_response)}
+        )
+
+        session_id = await _save_session(request, financial_data, mentor_response, request_id)
 
         # Step 5: Return comprehensive response
         logger.info(
@@ -123,12 +140,56 @@ async def financial_mentor(request: FinancialMentorRequest, user_id: str):
         )
 
     except Exception as error:
-        extra = {"request_id": request_id} if request_id else {}
-        logger.error(
-            f"Error in financial_mentor: {type(error).__name__}: {str(error)}",
-            exc_info=True,
-            extra=extra
-        )
-        kwargs = {"request_id": request_id, "user_id": request.id}
-        logger.error(f"Error context: {kwargs}", extra=extra)
+        _log_error(error, request_id, request)
         return FinancialMentorResponse(id=request.id, user_id=user_id, mentorResponse="Sorry, something went wrong, so I will be on a break", model="gemini-2.5-flash",)
+
+
+async def financial_mentor_stream(request: FinancialMentorRequest, user_id: str) -> AsyncIterator[str]:
+    """
+    financial_mentor as server-sent events: `meta` right away, a `chunk`
+    per piece of text as Gemini streams it, then `done` with the full
+    response once the session is saved (or `error`). If the client
+    disconnects, generation is cancelled and nothing is saved.
+    """
+    request_id = str(uuid.uuid4())
+
+    logger.info(
+        f"Streaming Financial Mentor API called | User ID: {user_id} | Question: {request.message[:100]}... | Request ID: {request_id}",
+        extra={"request_id": request_id, "user_id": user_id, "endpoint": "/api/v1/mentor/chat/stream"}
+    )
+    yield sse_event("meta", {"id": request.id, "user_id": user_id, "model": "gemini-2.5-flash"})
+
+    chunks = []
+    try:
+        financial_data, model = await _prepare_mentor(request, request_id, user_id)
+
+        logger.info(f"Streaming Gemini API response for financial mentorship | Request ID: {request_id}", extra={"request_id": request_id})
+        response = await model.generate_content_async(request.message, stream=True)
+        async for text in stream_text(response):
+            chunks.append(text)
+            yield sse_event("chunk", {"text": text})
+
+        mentor_response = "".join(chunks)
+        session_id = await _save_session(request, financial_data, mentor_response, request_id)
+
+        logger.info(
+            f"Financial mentor response streamed and saved | User ID: {request.id} | Session ID: {session_id} | Request ID: {request_id}",
+            extra={"request_id": request_id, "user_id": request.id, "session_id": session_id}
+        )
+        yield sse_event("done", {
+            "id": request.id,
+            "user_id": user_id,
+            "mentorResponse": mentor_response,
+            "model": "gemini-2.5-flash"
+        })
+
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(
+            f"Client disconnected, generation cancelled | Streamed: {sum(map(len, chunks))} chars | Request ID: {request_id}",
+            extra={"request_id": request_id}
+        )
+        raise
+
+    except Exception as error:
+        _log_error(error, request_id, request)
+        yield sse_event("error", {"message": "Sorry, something went wrong, so I will be on a break"})
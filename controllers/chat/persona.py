@@ -1,12 +1,19 @@
 from config.global_logger import get_logger
-from config.database import get_db
+from config.async_database import get_async_db
+from config.write_journal import load_conversation_messages, persist_turn
+from functions.history_cache import get_history_cache, to_history_message
+from functions.history_window import HISTORY_TAIL_MESSAGES, select_history_window, window_tokens
+from functions.conversation_summary import SUMMARY_ENABLED, conversation_summary, summarize_in_background, with_summary
+from fastapi import BackgroundTasks
+from controllers.chat.sse import sse_event, stream_text
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from google.generativeai.types import GenerationConfig
 import google.generativeai as genai
 from constants.persona_message import sharan
-from typing import Optional
+from typing import AsyncIterator, Optional
+import asyncio
 import time
 import random
 
@@ -32,27 +39,29 @@ class ChatResponse(BaseModel):
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-async def persona_chat(request: ChatRequest, user_id:str):
-    request_id = random.randint(3, 99999)
-    db = get_db()
-
-    # Determine conversation ID
-    conversation_id = request.conversation_id or f"conv_{request.id}_{int(time.time())}"
-
-    logger.info(
-        f"Chat API called | User ID: {user_id} | Message length: {len(request.message)} chars | "
-        f"Conversation ID: {conversation_id} | Request ID: {request_id}",
-        extra={"request_id": request_id, "user_id": request.id, "endpoint": "/api/v1/chat"}
-    )
+async def _prepare_turn(request: ChatRequest, user_id: str, conversation_id: str, request_id: int) -> tuple:
+    """
+    Conversation, history window and model for one persona chat turn.
+    Returns (model, contents, windowed).
+    """
+    db = await get_async_db()
 
-    if not os.getenv("GEMINI_API_KEY"):
-        logger.error(f"GEMINI_API_KEY not configured | Request ID: {request_id}", extra={"request_id": request_id})
-
-    try:
-        existing_conversation = db.get_conversation(conversation_id)
+    # Hot conversations are served from the history cache without touching the database
+    history_cache = get_history_cache()
+    history_messages = history_cache.get(conversation_id) if request.conversation_id else None
+    if history_messages is not None:
+        summary = history_cache.get_summary(conversation_id)
+        complete = history_cache.is_complete(conversation_id)
+        logger.info(
+            f"Loaded {len(history_messages)} messages from history cache | Request ID: {request_id}",
+            extra={"request_id": request_id}
+        )
+    else:
+        existing_conversation = await db.get_conversation(conversation_id)
+        summary = conversation_summary(existing_conversation)
         if not existing_conversation:
             logger.info(f"Creating new conversation | ID: {conversation_id} | Request ID: {request_id}", extra={"request_id": request_id})
-            db.create_conversation(
+            await db.create_conversation(
                 user_id=user_id,
                 conversation_id=conversation_id,
                 persona="sharan",
@@ -61,83 +70,133 @@ async def persona_chat(request: ChatRequest, user_id:str):
         else:
             logger.info(f"Continuing existing conversation | ID: {conversation_id} | Request ID: {request_id}", extra={"request_id": request_id})
 
-        # Step 2: Load conversation history from database
+        # Step 2: Load the tail of the conversation history from database
         history_messages = []
+        complete = True
         if request.conversation_id:
             logger.info(f"Loading conversation history from database | Request ID: {request_id}", extra={"request_id": request_id})
-            stored_messages = db.get_conversation_messages(conversation_id)
+            stored_messages = await load_conversation_messages(conversation_id, limit=HISTORY_TAIL_MESSAGES)
             logger.info(f"Loaded {len(stored_messages)} messages from history | Request ID: {request_id}", extra={"request_id": request_id})
 
             # Convert database messages to API format
-            for msg in stored_messages:
-                history_messages.append({
-                    "role": msg['role'],
-                    "parts": [msg['content']]
-                })
-
-        # Step 3: Save user message to database
-        db.add_message(
-            conversation_id=conversation_id,
-            role="user",
-            content=request.message,
-            metadata={"request_id": request_id}
-        )
+            history_messages = [to_history_message(msg) for msg in stored_messages]
+            # A full tail may have older messages before it
+            complete = len(stored_messages) < HISTORY_TAIL_MESSAGES
+        history_cache.put(conversation_id, history_messages, summary=summary, complete=complete)
 
-        # Step 4: Configure and call Gemini API
-        logger.debug(
-            f"Configuring Gemini model | temperature=1.0, top_p=0.95, top_k=40 | Request ID: {request_id}",
+    # Only the latest turns that fit the token budget go to Gemini, after the summary of older ones
+    window = select_history_window(history_messages)
+    # Messages older than the tail left the window too, though they were never in the list
+    windowed = len(window) < len(history_messages) or not complete
+    if windowed:
+        logger.info(
+            f"History windowed | Kept {len(window)} of {len(history_messages)}"
+            f"{'' if complete else '+'} messages | ~{window_tokens(window)} tokens | Request ID: {request_id}",
             extra={"request_id": request_id}
         )
+    history_messages = window
 
-        generation_config = GenerationConfig(
-            temperature=1.0,  # Default for Gemini 2.5 models
-            top_p=0.95,
-            top_k=40,
-            max_output_tokens=2048,
-        )
+    # Step 3: Configure Gemini
+    logger.debug(
+        f"Configuring Gemini model | temperature=1.0, top_p=0.95, top_k=40 | Request ID: {request_id}",
+        extra={"request_id": request_id}
+    )
+
+    generation_config = GenerationConfig(
+        temperature=1.0,  # Default for Gemini 2.5 models
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=2048,
+    )
+
+    # Initialize Gemini model with system instruction
+    model = genai.GenerativeModel(
+        model_name='gemini-2.5-flash',
+        system_instruction=with_summary(sharan, summary),
+        generation_config=generation_config
+    )
 
-        # Initialize Gemini model with system instruction
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            system_instruction=sharan,
-            generation_config=generation_config
+    logger.info(f"Gemini model initialized successfully | Request ID: {request_id}", extra={"request_id": request_id})
+
+    # Build conversation content with history
+    if history_messages:
+        logger.info(
+            f"Building conversation with history | History messages: {len(history_messages)} | Request ID: {request_id}",
+            extra={"request_id": request_id}
         )
 
-        logger.info(f"Gemini model initialized successfully | Request ID: {request_id}", extra={"request_id": request_id})
+        # Add current message
+        history_messages.append({
+            "role": "user",
+            "parts": [request.message]
+        })
+        return model, history_messages, windowed
 
-        # Build conversation content with history
-        if history_messages:
-            logger.info(
-                f"Building conversation with history | History messages: {len(history_messages)} | Request ID: {request_id}",
-                extra={"request_id": request_id}
-            )
+    # Single turn conversation
+    return model, request.message, windowed
 
-            # Add current message
-            history_messages.append({
-                "role": "user",
-                "parts": [request.message]
-            })
 
-            # Generate response with full conversation context
-            logger.info(f"Calling Gemini API with conversation context | Request ID: {request_id}", extra={"request_id": request_id})
-            response = model.generate_content(history_messages)
-        else:
-            # Single turn conversation
-            logger.info(f"Calling Gemini API for single-turn chat | Request ID: {request_id}", extra={"request_id": request_id})
-            response = model.generate_content(request.message)
+async def _save_turn(
+    request: ChatRequest,
+    conversation_id: str,
+    response_text: str,
+    request_id: int,
+    windowed: bool,
+    background_tasks: Optional[BackgroundTasks]
+):
+    # Step 5: Save the turn (user message, and the AI response if requested) in one round trip
+    turn = [{"role": "user", "content": request.message, "metadata": {"request_id": request_id}}]
+    if request.save_conversation:
+        turn.append({
+            "role": "model",
+            "content": response_text,
+            "model": "gemini-2.5-flash",
+            "metadata": {"request_id": request_id}
+        })
+    logger.debug(f"Saving turn to database | Messages: {len(turn)} | Request ID: {request_id}", extra={"request_id": request_id})
+    await persist_turn(conversation_id, turn)
+    get_history_cache().append(conversation_id, [to_history_message(message) for message in turn])
 
+    # Turns that left the window are folded into the summary after the response is sent
+    if windowed and SUMMARY_ENABLED and background_tasks is not None:
+        background_tasks.add_task(summarize_in_background, conversation_id)
+
+
+def _log_error(error: Exception, request_id: int, user_id: str):
+    extra = {"request_id": request_id} if request_id else {}
+    logger.error(
+        f"Error in persona_chat: {type(error).__name__}: {str(error)}",
+        exc_info=True,
+        extra=extra
+    )
+    kwargs = {"request_id": request_id, "user_id": user_id}
+    logger.error(f"Error context: {kwargs}", extra=extra)
+
+
+async def persona_chat(request: ChatRequest, user_id:str, background_tasks: Optional[BackgroundTasks] = None):
+    request_id = random.randint(3, 99999)
+
+    # Determine conversation ID
+    conversation_id = request.conversation_id or f"conv_{request.id}_{int(time.time())}"
+
+    logger.info(
+        f"Chat API called | User ID: {user_id} | Message length: {len(request.message)} chars | "
+        f"Conversation ID: {conversation_id} | Request ID: {request_id}",
+        extra={"request_id": request_id, "user_id": request.id, "endpoint": "/api/v1/chat"}
+    )
+
+    if not os.getenv("GEMINI_API_KEY"):
+        logger.error(f"GEMINI_API_KEY not configured | Request ID: {request_id}", extra={"request_id": request_id})
+
+    try:
+        model, contents, windowed = await _prepare_turn(request, user_id, conversation_id, request_id)
+
+        # Step 4: Call Gemini API
+        logger.info(f"Calling Gemini API | Request ID: {request_id}", extra={"request_id": request_id})
+        response = await model.generate_content_async(contents)
         response_text = response.text
 
-        # Step 5: Save AI response to database
-        if request.save_conversation:
-            logger.debug(f"Saving AI response to database | Request ID: {request_id}", extra={"request_id": request_id})
-            db.add_message(
-                conversation_id=conversation_id,
-                role="model",
-                content=response_text,
-                model="gemini-2.5-flash",
-                metadata={"request_id": request_id}
-            )
+        await _save_turn(request, conversation_id, response_text, request_id, windowed, background_tasks)
 
         logger.info(
             f"Chat response generated and saved | User ID: {user_id} | Response length: {len(response_text)} chars | "
@@ -153,17 +212,68 @@ async def persona_chat(request: ChatRequest, user_id:str):
         )
 
     except Exception as error:
-        extra = {"request_id": request_id} if request_id else {}
-        logger.error(
-            f"Error in persona_chat: {type(error).__name__}: {str(error)}",
-            exc_info=True,
-            extra=extra
-        )
-        kwargs = {"request_id": request_id, "user_id": user_id}
-        logger.error(f"Error context: {kwargs}", extra=extra)
+        _log_error(error, request_id, user_id)
         return ChatResponse(
             id=request.id,
             response="Something went wrong, so I will take a quick break till then.",
             model="gemini-2.5-flash",
             conversation_id=conversation_id
         )
+
+
+async def persona_chat_stream(
+    request: ChatRequest,
+    user_id: str,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> AsyncIterator[str]:
+    """
+    persona_chat as server-sent events: `meta` with the conversation ID
+    right away, a `chunk` per piece of text as Gemini streams it, then
+    `done` with the full response once the turn is saved (or `error`).
+    If the client disconnects, generation is cancelled and nothing is saved.
+    """
+    request_id = random.randint(3, 99999)
+    conversation_id = request.conversation_id or f"conv_{request.id}_{int(time.time())}"
+
+    logger.info(
+        f"Streaming chat API called | User ID: {user_id} | Message length: {len(request.message)} chars | "
+        f"Conversation ID: {conversation_id} | Request ID: {request_id}",
+        extra={"request_id": request_id, "user_id": request.id, "endpoint": "/api/v1/persona/chat/stream"}
+    )
+    yield sse_event("meta", {"id": request.id, "conversation_id": conversation_id, "model": "gemini-2.5-flash"})
+
+    chunks = []
+    try:
+        model, contents, windowed = await _prepare_turn(request, user_id, conversation_id, request_id)
+
+        logger.info(f"Streaming Gemini API response | Request ID: {request_id}", extra={"request_id": request_id})
+        response = await model.generate_content_async(contents, stream=True)
+        async for text in stream_text(response):
+            chunks.append(text)
+            yield sse_event("chunk", {"text": text})
+
+        response_text = "".join(chunks)
+        await _save_turn(request, conversation_id, response_text, request_id, windowed, background_tasks)
+
+        logger.info(
+            f"Chat response streamed and saved | User ID: {user_id} | Response length: {len(response_text)} chars | "
+            f"Conversation ID: {conversation_id} | Request ID: {request_id}",
+            extra={"request_id": request_id, "user_id": user_id, "response_length": len(response_text)}
+        )
+        yield sse_event("done", {
+            "id": request.id,
+            "response": response_text,
+            "model": "gemini-2.5-flash",
+            "conversation_id": conversation_id
+        })
+
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(
+            f"Client disconnected, generation cancelled | Streamed: {sum(map(len, chunks))} chars | Request ID: {request_id}",
+            extra={"request_id": request_id}
+        )
+        raise
+
+    except Exception as error:
+        _log_error(error, request_id, user_id)
+        yield sse_event("error", {"message": "Something went wrong, so I will take a quick break till then."})
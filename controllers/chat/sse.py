@@ -0,0 +1,28 @@
+import json
+from typing import AsyncIterator
+
+# Keep proxies (nginx, Vercel) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: dict) -> str:
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_text(response) -> AsyncIterator[str]:
+    """
+    Text of each chunk of a streamed Gemini response as it arrives.
+
+    Chunks without text (e.g. a final chunk carrying only usage metadata)
+    are skipped. Cancelling the consumer cancels the underlying Gemini
+    call: a pending read is cancelled in place, and an abandoned stream
+    is cancelled when it is garbage collected.
+    """
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
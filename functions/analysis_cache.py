@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from config.global_logger import get_logger
+from functions.analysis_state import analyze_financial_data_incremental
+from functions.fi_data import get_fi_fingerprint
+from functions.fi_mirror import fetch_fi_snapshot_mirrored
+from functions.fi_records import FiSnapshot
+from functions.profiling import stage
+
+logger = get_logger(__name__)
+
+ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "300"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256"))
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of per-user analysis results, addressed by a fingerprint
+    of the financial snapshot they were computed from.
+
+    An entry is only served while its fingerprint matches the caller's and
+    it is younger than `ttl_seconds`; the TTL bounds staleness of account
+    metadata the fingerprint does not cover. At most `max_entries` users are
+    kept, least recently used first out.
+    """
+
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES, ttl_seconds: float = ANALYSIS_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[str, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, fingerprint: str | None) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or fingerprint is None:
+                self.misses += 1
+                return None
+
+            cached_fingerprint, stored_at, value = entry
+            if cached_fingerprint != fingerprint or time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return value
+
+    def put(self, user_id: str, fingerprint: str | None, value: Any):
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._entries[user_id] = (fingerprint, time.monotonic(), value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+def get_financial_analysis(user_id: str) -> tuple[FiSnapshot, dict]:
+    """
+    Return (financial_data, analysis) for a user.
+
+    A single fingerprint query decides freshness; on a warm hit neither the
+    full fetch nor the analysis runs. financial_data is the typed snapshot;
+    call `to_fi_data()` where the FI_DATA_READY dict is needed.
+    """
+    cache = get_analysis_cache()
+    with stage("fingerprint"):
+        fingerprint = get_fi_fingerprint(user_id)
+
+    cached = cache.get(user_id, fingerprint)
+    if cached is not None:
+        logger.info(f"Analysis cache hit | User ID: {user_id}")
+        return cached
+
+    with stage("get_fi_data"):
+        financial_data = fetch_fi_snapshot_mirrored(user_id=user_id)
+    with stage("analyze"):
+        analysis = analyze_financial_data_incremental(user_id, financial_data)
+    # Data left over from a failed sync is served once, never under the fresh fingerprint
+    if not financial_data.stale:
+        cache.put(user_id, fingerprint, (financial_data, analysis))
+    return financial_data, analysis
+
+
+# Global analysis cache instance
+_analysis_cache = None
+
+
+def get_analysis_cache() -> AnalysisCache:
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from config.global_logger import get_logger
+from functions.fi_records import FiSnapshot, TransactionBatch
+from functions.profiling import stage
+from functions.finance_analyzer import analyze_account, build_summary, data_as_of, iter_accounts
+from functions.time_index import TimeIndex
+from functions.transaction_aggregate import TransactionAggregate
+from functions.transaction_columns import TransactionStore
+
+logger = get_logger(__name__)
+
+ANALYSIS_STATE_DB = os.getenv("ANALYSIS_STATE_DB", "data/analysis_state.db")
+# States kept in memory; older ones are reloaded from SQLite on their next request
+ANALYSIS_STATE_MAX_USERS = int(os.getenv("ANALYSIS_STATE_MAX_USERS", "1000"))
+# Users share this many locks, so the lock table stays fixed however many users are seen
+USER_LOCK_STRIPES = 64
+
+# Bump when the aggregate's contents change meaning; older stored states are rebuilt
+STATE_VERSION = 5
+
+
+def account_key(account: dict, fip_id: str) -> str:
+    """Stable identity of an account across FI_DATA_READY payloads."""
+    return f"{fip_id}:{account.get('linkedAccRef') or account.get('maskedAccNumber') or ''}"
+
+
+class AccountState:
+    """Aggregate for one account plus the cursor marking how many of its rows were folded in."""
+
+    __slots__ = ("aggregate", "folded_rows", "cursor")
+
+    def __init__(self, aggregate: TransactionAggregate | None = None, folded_rows: int = 0, cursor: list | None = None):
+        self.aggregate = aggregate or TransactionAggregate()
+        self.folded_rows = folded_rows
+        self.cursor = cursor  # [transactionTimestamp, txnId] of the last folded row
+
+    def continues(self, transactions: list | TransactionBatch) -> bool:
+        """True when `transactions` is the folded history with (possibly) new rows appended."""
+        if len(transactions) < self.folded_rows:
+            return False
+        if not self.folded_rows:
+            return True
+        return _cursor_at(transactions, self.folded_rows - 1) == self.cursor
+
+    def advance(self, transactions: list | TransactionBatch):
+        self.folded_rows = len(transactions)
+        if len(transactions):
+            self.cursor = _cursor_at(transactions, len(transactions) - 1)
+
+
+def _cursor_at(transactions: list | TransactionBatch, i: int) -> list:
+    if isinstance(transactions, TransactionBatch):
+        return transactions.cursor(i)
+    row = transactions[i]
+    return [row.get("transactionTimestamp"), row.get("txnId")]
+
+
+class UserAnalysisState:
+    """
+    Persistent per-user analysis state.
+
+    Keeps a TransactionAggregate per account and one over the merged
+    timeline. `update` folds in only the transactions appended since the
+    previous call, so producing the summary costs O(new rows) instead of
+    O(history). Incremental folding relies on get_fi_data returning each
+    account's rows in timestamp order; if an account's history no longer
+    lines up with the stored cursor (rows removed or rewritten, accounts
+    added or unlinked) the state is rebuilt from the full payload.
+
+    A state is not thread-safe; callers hold the store's user_lock around
+    get, update and put.
+    """
+
+    def __init__(self):
+        self.accounts: dict[str, AccountState] = {}
+        self.timeline = TransactionAggregate()
+        # Changed since it was last written to the store
+        self.dirty = False
+
+    def update(
+        self,
+        aa_data: dict | FiSnapshot,
+        sections: tuple[str, ...] | None = None,
+        granularity: str = "month"
+    ) -> dict:
+        """
+        Fold new transactions from `aa_data` into the state and return the
+        current analysis summary (see analyze_financial_data for `sections`
+        and `granularity`).
+        """
+        if isinstance(aa_data, FiSnapshot):
+            histories = aa_data.transaction_batches()
+            aa_data = aa_data.to_fi_data(include_transactions=False)
+            entries = list(iter_accounts(aa_data))
+        else:
+            entries = list(iter_accounts(aa_data))
+            histories = [account.get("transactions", {}).get("transaction", []) for account, _, _ in entries]
+        keys = [account_key(account, fip_id) for account, _, fip_id in entries]
+
+        in_sync = set(keys) == set(self.accounts) and len(keys) == len(self.accounts) and all(
+            self.accounts[key].continues(txns) for key, txns in zip(keys, histories)
+        )
+        if not in_sync:
+            if self.accounts:
+                logger.info("Analysis state out of sync with payload, rebuilding")
+            self.accounts = {key: AccountState() for key in keys}
+            self.timeline = TransactionAggregate()
+            self.dirty = True
+        elif any(len(txns) > self.accounts[key].folded_rows for key, txns in zip(keys, histories)):
+            self.dirty = True
+
+        # Parse only the rows past each account's cursor
+        with stage("parse"):
+            store = TransactionStore.from_transaction_lists([
+                txns[self.accounts[key].folded_rows:] for key, txns in zip(keys, histories)
+            ])
+        with stage("fold"):
+            for key, txns, columns in zip(keys, histories, store.accounts):
+                state = self.accounts[key]
+                state.aggregate.fold(columns)
+                state.advance(txns)
+            self.timeline.fold(store.timeline)
+
+        with stage("accounts"):
+            accounts = [
+                analyze_account(
+                    account, account_type, fip_id,
+                    self.accounts[key].aggregate.transaction_summary(granularity=granularity)
+                )
+                for (account, account_type, fip_id), key in zip(entries, keys)
+            ]
+        with stage("behavioral_patterns"):
+            behavioral_patterns = self.timeline.behavioral_patterns(data_as_of(aa_data))
+        return build_summary(aa_data, accounts, behavioral_patterns, sections)
+
+    def time_index(self) -> TimeIndex:
+        """Date-range and rolling-window totals over the user's merged timeline."""
+        return self.timeline.time_index()
+
+    def merge(self, other: "UserAnalysisState") -> "UserAnalysisState":
+        """Combine states built from disjoint slices of the same user's history."""
+        for key, state in other.accounts.items():
+            mine = self.accounts.setdefault(key, AccountState())
+            mine.aggregate.merge(state.aggregate)
+            mine.folded_rows += state.folded_rows
+            mine.cursor = state.cursor or mine.cursor
+        self.timeline.merge(other.timeline)
+        self.dirty = True
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "version": STATE_VERSION,
+            "accounts": {
+                key: {
+                    "aggregate": state.aggregate.to_dict(),
+                    "folded_rows": state.folded_rows,
+                    "cursor": state.cursor
+                }
+                for key, state in self.accounts.items()
+            },
+            "timeline": self.timeline.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserAnalysisState":
+        state = cls()
+        if data.get("version", 1) != STATE_VERSION:
+            return state
+        state.accounts = {
+            key: AccountState(
+                TransactionAggregate.from_dict(acc["aggregate"]),
+                acc.get("folded_rows", 0),
+                acc.get("cursor")
+            )
+            for key, acc in data.get("accounts", {}).items()
+        }
+        state.timeline = TransactionAggregate.from_dict(data.get("timeline", {}))
+        return state
+
+
+class AnalysisStateStore:
+    """
+    User analysis states kept in memory and mirrored to a local SQLite file.
+
+    The SQLite copy lets states survive restarts so a returning user only
+    pays for the transactions that arrived while the process was down.
+    At most `max_users` states are kept in memory, least recently used
+    first out; a state is only re-serialized when an update changed it.
+    """
+
+    def __init__(self, path: str = ANALYSIS_STATE_DB, max_users: int = ANALYSIS_STATE_MAX_USERS):
+        self.path = path
+        self.max_users = max_users
+        self._states: OrderedDict[str, UserAnalysisState] = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(USER_LOCK_STRIPES)]
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS analysis_state ("
+            "user_id TEXT PRIMARY KEY, state TEXT NOT NULL, "
+            "updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+        logger.info(f"Analysis state store initialized | Path: {path}")
+
+    def _execute(self, sql: str, params: tuple = ()):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def user_lock(self, user_id: str) -> threading.Lock:
+        """Serializes get/update/put of one user's state across threads (striped by user id)."""
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def get(self, user_id: str) -> UserAnalysisState | None:
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None:
+                self._states.move_to_end(user_id)
+                return state
+
+            row = self._execute("SELECT state FROM analysis_state WHERE user_id = ?", (user_id,))
+            if row is None:
+                return None
+
+            state = UserAnalysisState.from_dict(json.loads(row[0]))
+            self._remember(user_id, state)
+            return state
+
+    def put(self, user_id: str, state: UserAnalysisState):
+        payload = json.dumps(state.to_dict()) if state.dirty else None
+        with self._lock:
+            self._remember(user_id, state)
+            if payload is not None:
+                self._execute(
+                    "INSERT INTO analysis_state (user_id, state) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP",
+                    (user_id, payload)
+                )
+        state.dirty = False
+
+    def _remember(self, user_id: str, state: UserAnalysisState):
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+
+    def discard(self, user_id: str):
+        with self._lock:
+            self._states.pop(user_id, None)
+            self._execute("DELETE FROM analysis_state WHERE user_id = ?", (user_id,))
+
+
+def analyze_financial_data_incremental(
+    user_id: str,
+    aa_data: dict | FiSnapshot,
+    sections: tuple[str, ...] | None = None,
+    granularity: str = "month"
+) -> dict:
+    """
+    Same output as analyze_financial_data, computed from the user's stored
+    state plus only the transactions added since the last call.
+    """
+    store = get_state_store()
+    # Concurrent requests for one user would fold the same rows twice
+    with store.user_lock(user_id):
+        state = store.get(user_id) or UserAnalysisState()
+        try:
+            summary = state.update(aa_data, sections, granularity)
+        except Exception:
+            # A half-folded state must not be reused
+            store.discard(user_id)
+            raise
+        store.put(user_id, state)
+    return summary
+
+
+# Global state store instance
+_state_store = None
+
+
+def get_state_store() -> AnalysisStateStore:
+    global _state_store
+    if _state_store is None:
+        _state_store = AnalysisStateStore()
+    return _state_store
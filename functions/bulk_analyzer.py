@@ -0,0 +1,141 @@
+"""
+Offline bulk analysis of FI_DATA_READY payloads.
+
+Reads payloads from a directory (one JSON document per `*.json` file,
+`*.ndjson` files one per line) or from an NDJSON stream, runs
+analyze_financial_data across a process pool and writes one JSON result
+per line, in input order.
+
+Usage:
+    python -m functions.bulk_analyzer payloads/ -o results.ndjson --workers 8
+    cat payloads.ndjson | python -m functions.bulk_analyzer - > results.ndjson
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, TextIO
+from functions.finance_analyzer import analyze_financial_data
+from functions.streaming_analyzer import iter_chunks
+
+
+def iter_payloads(source: str) -> Iterator[tuple[str, str]]:
+    """Yield (source_id, raw_json) for every payload in a directory, an NDJSON file or stdin ("-")."""
+    if source == "-":
+        yield from _iter_ndjson(sys.stdin, "stdin")
+        return
+
+    path = Path(source)
+    if not path.is_dir():
+        with path.open(encoding="utf-8") as f:
+            yield from _iter_ndjson(f, path.name)
+        return
+
+    for file in sorted(path.iterdir()):
+        if file.suffix == ".json":
+            yield file.name, file.read_text(encoding="utf-8")
+        elif file.suffix == ".ndjson":
+            with file.open(encoding="utf-8") as f:
+                yield from _iter_ndjson(f, file.name)
+
+
+def _iter_ndjson(stream: TextIO, name: str) -> Iterator[tuple[str, str]]:
+    for line_no, line in enumerate(stream, start=1):
+        if line.strip():
+            yield f"{name}:{line_no}", line
+
+
+def analyze_batch(batch: list[tuple[str, str]]) -> list[tuple[str, int, bool]]:
+    """Worker entry point: analyze a batch of raw payloads and return (ndjson_line, transaction_count, ok) tuples."""
+    results = []
+    for source_id, raw in batch:
+        try:
+            analysis = analyze_financial_data(raw)
+            record = {
+                "source": source_id,
+                "data_session_id": analysis["data_overview"].get("data_session_id"),
+                "analysis": analysis
+            }
+            txn_count, ok = analysis["aggregated_insights"].get("total_transactions_analyzed", 0), True
+        except Exception as e:
+            record = {"source": source_id, "error": f"{type(e).__name__}: {e}"}
+            txn_count, ok = 0, False
+        results.append((json.dumps(record, default=str), txn_count, ok))
+    return results
+
+
+def run(
+    source: str,
+    output: TextIO,
+    workers: int,
+    batch_size: int,
+    progress_every: float = 5.0
+) -> dict:
+    """
+    Analyze every payload from `source` and write NDJSON results to `output`.
+
+    Payloads are sent to the pool in batches of `batch_size`, with at most
+    two batches per worker in flight so memory stays bounded on large inputs.
+    """
+    started = last_report = time.perf_counter()
+    payloads = transactions = errors = 0
+    pending = []
+
+    def drain(future):
+        nonlocal payloads, transactions, errors, last_report
+        for line, txn_count, ok in future.result():
+            output.write(line + "\n")
+            payloads += 1
+            transactions += txn_count
+            errors += not ok
+        now = time.perf_counter()
+        if now - last_report >= progress_every:
+            last_report = now
+            _report(payloads, transactions, errors, now - started)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in iter_chunks(iter_payloads(source), batch_size):
+            pending.append(executor.submit(analyze_batch, batch))
+            if len(pending) >= workers * 2:
+                drain(pending.pop(0))
+        for future in pending:
+            drain(future)
+
+    output.flush()
+    elapsed = time.perf_counter() - started
+    _report(payloads, transactions, errors, elapsed)
+    return {"payloads": payloads, "transactions": transactions, "errors": errors, "seconds": round(elapsed, 3)}
+
+
+def _report(payloads: int, transactions: int, errors: int, elapsed: float):
+    rate = payloads / elapsed if elapsed else 0.0
+    txn_rate = transactions / elapsed if elapsed else 0.0
+    print(
+        f"[bulk_analyzer] {payloads} payloads ({errors} errors), {transactions} transactions "
+        f"in {elapsed:.1f}s | {rate:.1f} payloads/s | {txn_rate:,.0f} txns/s",
+        file=sys.stderr
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze FI_DATA_READY payloads in bulk.")
+    parser.add_argument("source", help="Directory of .json/.ndjson payloads, an NDJSON file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("-b", "--batch-size", type=int, default=16, help="Payloads per task sent to a worker")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress reports")
+    args = parser.parse_args(argv)
+
+    if args.output == "-":
+        run(args.source, sys.stdout, args.workers, args.batch_size, args.progress_every)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            run(args.source, output, args.workers, args.batch_size, args.progress_every)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import re
+from datetime import datetime
+import google.generativeai as genai
+from config.async_database import get_async_db
+from config.global_logger import get_logger
+from config.write_journal import load_conversation_messages
+from constants.summary_message import summary_preamble, summary_prompt
+from functions.history_cache import get_history_cache, to_history_message
+from functions.history_window import CHARS_PER_TOKEN, HISTORY_TAIL_MESSAGES, select_history_window
+
+logger = get_logger(__name__)
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "1").lower() in ("1", "true", "yes")
+# "gemini", or "extractive" for the deterministic local model
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini")
+# Messages that must have left the window before the summary is updated
+SUMMARY_MIN_NEW_MESSAGES = int(os.getenv("SUMMARY_MIN_NEW_MESSAGES", "4"))
+# Most messages folded per update; a long unsummarized backlog catches up over several turns
+SUMMARY_FOLD_BATCH = int(os.getenv("SUMMARY_FOLD_BATCH", "100"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "600"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+class GeminiSummaryModel:
+    """Folds messages into the summary with a Gemini call."""
+
+    def __init__(self, model_name: str = "gemini-2.5-flash"):
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=summary_prompt.format(max_words=SUMMARY_MAX_TOKENS * 3 // 4)
+        )
+
+    def summarize(self, summary: str, messages: list) -> str:
+        transcript = "\n".join(f"{_speaker(m)}: {m['content']}" for m in messages)
+        response = self.model.generate_content(
+            f"Summary so far:\n{summary or '(none)'}\n\nNext messages:\n{transcript}"
+        )
+        return response.text.strip()
+
+
+class ExtractiveSummaryModel:
+    """
+    Deterministic local model: keeps the first sentence of every message,
+    dropping the oldest lines once the summary is over SUMMARY_MAX_TOKENS.
+    Used offline and by the benchmarks.
+    """
+
+    def summarize(self, summary: str, messages: list) -> str:
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            first = _SENTENCE_END.split(message["content"].strip(), maxsplit=1)[0]
+            lines.append(f"{_speaker(message)}: {first[:240]}")
+        budget = SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN
+        while len(lines) > 1 and sum(len(line) + 1 for line in lines) > budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+def _speaker(message: dict) -> str:
+    return "User" if message["role"] == "user" else "Sharan"
+
+
+def conversation_summary(conversation: dict | None) -> str | None:
+    """The running summary stored in a conversations row, if any."""
+    metadata = (conversation or {}).get("metadata") or {}
+    return (metadata.get("summary") or {}).get("text")
+
+
+def with_summary(system_instruction: str, summary: str | None) -> str:
+    """A system instruction extended with the conversation summary."""
+    if not summary:
+        return system_instruction
+    return f"{system_instruction}\n\n{summary_preamble.format(summary=summary)}"
+
+
+class ConversationSummarizer:
+    """
+    Keeps a running summary of the turns that have left the history window.
+
+    The summary lives in conversations.metadata["summary"] together with
+    the (created_at, id) of the last message folded into it, so every
+    message is folded exactly once. Everything stored before the window
+    persona chat sends is folded, oldest first and at most
+    SUMMARY_FOLD_BATCH messages per update, including turns older than
+    the HISTORY_TAIL_MESSAGES tail it reads.
+
+    The `_running` guard only covers this process. Across workers the
+    write is a compare-and-set on the number of messages folded so far,
+    so a summary built from an older state never replaces a newer one.
+    """
+
+    def __init__(self, model=None):
+        self.model = model or (ExtractiveSummaryModel() if SUMMARY_MODEL == "extractive" else GeminiSummaryModel())
+        self._running: set[str] = set()
+
+    async def update(self, conversation_id: str) -> bool:
+        """Fold newly dropped messages into the summary; True when it changed."""
+        # A turn arriving while the previous one is still being folded picks it up next time
+        if conversation_id in self._running:
+            return False
+        self._running.add(conversation_id)
+        try:
+            return await self._update(conversation_id)
+        finally:
+            self._running.discard(conversation_id)
+
+    async def _update(self, conversation_id: str) -> bool:
+        db = await get_async_db()
+        conversation, tail = await asyncio.gather(
+            db.get_conversation(conversation_id),
+            load_conversation_messages(conversation_id, limit=HISTORY_TAIL_MESSAGES)
+        )
+        if not conversation:
+            return False
+
+        window = select_history_window([to_history_message(message) for message in tail])
+        if not window:
+            return False
+        # Journaled messages have no created_at yet; when the window opens on one, every stored message precedes it
+        window_start = tail[len(tail) - len(window)].get("created_at")
+
+        metadata = conversation.get("metadata") or {}
+        state = metadata.get("summary") or {}
+        through = tuple(state["through"]) if state.get("through") else None
+        # One extra row for the folded message at the cursor, which the inclusive bound returns again
+        candidates = await db.get_messages_between(
+            conversation_id, through[0] if through else None, window_start, SUMMARY_FOLD_BATCH + 1
+        )
+        new = [
+            message for message in candidates
+            if through is None or (message["created_at"], message["id"]) > through
+        ][:SUMMARY_FOLD_BATCH]
+        if len(new) < SUMMARY_MIN_NEW_MESSAGES:
+            return False
+
+        text = await asyncio.to_thread(self.model.summarize, state.get("text", ""), new)
+        folded = state.get("messages")
+        state = {
+            "text": text,
+            "through": [new[-1]["created_at"], new[-1]["id"]],
+            "messages": (folded or 0) + len(new),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        applied = await db.update_conversation_metadata(
+            conversation_id,
+            {**metadata, "summary": state},
+            if_matches={"metadata->summary->>messages": None if folded is None else str(folded)}
+        )
+        if not applied:
+            logger.info(f"Conversation summary updated elsewhere meanwhile, discarding | ID: {conversation_id}")
+            return False
+        get_history_cache().set_summary(conversation_id, text)
+        logger.info(f"Conversation summary updated | ID: {conversation_id} | Folded: {len(new)} messages")
+        return True
+
+
+async def summarize_in_background(conversation_id: str):
+    """Background task run after a persona chat response has been sent."""
+    try:
+        await get_summarizer().update(conversation_id)
+    except Exception as e:
+        logger.error(
+            f"Conversation summary failed | ID: {conversation_id} | Error: {type(e).__name__}: {e}",
+            exc_info=True
+        )
+
+
+# Global summarizer instance
+_summarizer = None
+
+
+def get_summarizer() -> ConversationSummarizer:
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ConversationSummarizer()
+    return _summarizer
@@ -0,0 +1,119 @@
+import threading
+import time
+import httpx
+
+# Set by the response hook of the thread that sent the request
+_payload = threading.local()
+
+
+class QueryStats:
+    """Running totals for one Supabase query (table or RPC)."""
+
+    __slots__ = ("requests", "rows", "payload_bytes", "wire_bytes", "fetch_ms", "json_decode_ms", "typed_decode_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.payload_bytes = 0
+        self.wire_bytes = 0
+        self.fetch_ms = 0.0
+        self.json_decode_ms = 0.0
+        self.typed_decode_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "payload_bytes": self.payload_bytes,
+            "wire_bytes": self.wire_bytes,
+            "bytes_per_row": round(self.payload_bytes / self.rows, 1) if self.rows else 0.0,
+            "fetch_ms": round(self.fetch_ms, 2),
+            "json_decode_ms": round(self.json_decode_ms, 2),
+            "typed_decode_ms": round(self.typed_decode_ms, 2)
+        }
+
+
+class FetchMetrics:
+    """
+    Payload size and decode time per Supabase query since startup.
+
+    `payload_bytes` is the JSON body as received, `wire_bytes` what came
+    over the network (smaller when the response is compressed).
+    `fetch_ms` runs until the body has arrived, `json_decode_ms` from
+    there until postgrest returned the parsed rows, and `typed_decode_ms` is
+    the conversion of those rows into fi_records columns.
+    """
+
+    def __init__(self):
+        self._queries: dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, query: str, rows: int, payload_bytes: int, wire_bytes: int, fetch_ms: float, json_decode_ms: float):
+        with self._lock:
+            stats = self._queries.setdefault(query, QueryStats())
+            stats.requests += 1
+            stats.rows += rows
+            stats.payload_bytes += payload_bytes
+            stats.wire_bytes += wire_bytes
+            stats.fetch_ms += fetch_ms
+            stats.json_decode_ms += json_decode_ms
+
+    def observe_decode(self, query: str, typed_decode_ms: float):
+        with self._lock:
+            self._queries.setdefault(query, QueryStats()).typed_decode_ms += typed_decode_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {query: stats.to_dict() for query, stats in sorted(self._queries.items())}
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+
+
+def execute_measured(query, name: str, client) -> list:
+    """Execute a postgrest query built on `client` and record its payload and timings under `name`."""
+    _watch_payloads(client.postgrest.session)
+    _payload.bytes = _payload.wire_bytes = 0
+    _payload.received_at = None
+
+    started = time.perf_counter()
+    response = query.execute()
+    finished = time.perf_counter()
+    received = _payload.received_at or finished
+
+    rows = response.data or []
+    get_fetch_metrics().observe(
+        name,
+        rows=len(rows) if isinstance(rows, list) else 1,
+        payload_bytes=_payload.bytes,
+        wire_bytes=_payload.wire_bytes,
+        fetch_ms=(received - started) * 1000,
+        json_decode_ms=(finished - received) * 1000
+    )
+    return rows
+
+
+def _watch_payloads(session: httpx.Client):
+    # The postgrest client is recreated on auth events, so check on every call
+    hooks = session.event_hooks["response"]
+    if _record_payload not in hooks:
+        hooks.append(_record_payload)
+
+
+def _record_payload(response: httpx.Response):
+    response.read()
+    _payload.bytes = len(response.content)
+    _payload.wire_bytes = response.num_bytes_downloaded
+    _payload.received_at = time.perf_counter()
+
+
+# Global fetch metrics instance
+_fetch_metrics = None
+
+
+def get_fetch_metrics() -> FetchMetrics:
+    global _fetch_metrics
+    if _fetch_metrics is None:
+        _fetch_metrics = FetchMetrics()
+    return _fetch_metrics
@@ -1,264 +1,188 @@
 from config.database import supabase
-from datetime import datetime, date
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Iterator
 from config.global_logger import get_logger
-import uuid
+from functions.fetch_metrics import execute_measured, get_fetch_metrics
+from functions.fi_records import ACCOUNT_COLUMNS, TRANSACTION_COLUMNS, FiSnapshot, decode_transaction_page
+import hashlib
+import json
+import os
+import time
 
 
 logger = get_logger(__name__)
 
+# Rows per account_transactions request; keep at or below PostgREST's max-rows
+FI_PAGE_SIZE = int(os.getenv("FI_PAGE_SIZE", "1000"))
+
 def get_fi_data(
     user_id: str,
     data_to: str = None
 ) -> dict:
+    """FI_DATA_READY payload for a user. Never returns None."""
+    return fetch_fi_snapshot(user_id, data_to).to_fi_data()
+
+
+def fetch_fi_snapshot(
+    user_id: str,
+    data_to: str = None
+) -> FiSnapshot:
+    """
+    Fetch a user's accounts and transactions as a typed FiSnapshot.
+
+    Analysis reads the snapshot directly; call `to_fi_data()` on it only
+    where the FI_DATA_READY dict itself is needed. On a failed fetch the
+    error is logged and an empty snapshot marked `stale` is returned, so it
+    is never cached as the user's data; use load_fi_snapshot to get the
+    error instead.
+    """
     if data_to is None:
         data_to = date.today().isoformat()
-    logger.info(f"User ID: {user_id}")
     try:
-        # Fetch accounts
-        accounts_response = (
-            supabase.table('user_financial_accounts')
-            .select('*')
-            .eq('user_id', user_id)
-            .execute()
-        )
-        accounts = accounts_response.data or []
-
-        if not accounts:
-            return _empty_response(data_to)
-
-        # Fetch transactions (no start date filter - get all from beginning)
-        account_ids = sorted([acc['id'] for acc in accounts if acc.get('id')])
-
-        if not account_ids:
-            return _empty_response(data_to)
-        txn_response = (
-            supabase.table('account_transactions')
-            .select('*')
-            .eq('user_id', user_id)
-            .in_('account_id', account_ids)
-            .lte('transaction_timestamp', f"{data_to}T23:59:59")
-            .order('transaction_timestamp')
-            .execute()
-        )
-
-        # Group transactions by account
-        txn_by_account = defaultdict(list)
-        for txn in (txn_response.data or []):
-            if txn and txn.get('account_id'):
-                txn_by_account[txn['account_id']].append(txn)
-        # Determine the earliest transaction date for data_from
-        all_txns = txn_response.data or []
-        if all_txns and all_txns[0].get('transaction_timestamp'):
-            data_from = _format_date(all_txns[0]['transaction_timestamp'])
-        else:
-            # If no transactions, use earliest account opening date
-            opening_dates = [acc.get('opening_date') for acc in accounts if acc.get('opening_date')]
-            data_from = _format_date(min(opening_dates)) if opening_dates else date.today().isoformat()
-
-        # Build response
-        return _build_response(accounts, txn_by_account, data_from, data_to)
-
+        return load_fi_snapshot(user_id, data_to)
     except Exception as e:
-        # Log the error but still return a valid empty response
-        print(f"Error fetching FI data: {e}")
-        return _empty_response(data_to)
-
-
-def _format_ts(ts: str) -> str:
-    """Format timestamp to ISO format. Returns empty string on failure."""
-    if not ts:
-        return ""
-    try:
-        if 'T' in str(ts):
-            dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00').replace('+00', '+00:00'))
-        else:
-            dt = datetime.fromisoformat(str(ts).replace(' ', 'T').split('+')[0])
-        return dt.strftime('%Y-%m-%dT%H:%M:%S+00:00')
-    except Exception:
-        return ""
-
-
-def _format_date(ts: str) -> str:
-    """Extract date from timestamp. Returns today's date on failure."""
-    if not ts:
-        return date.today().isoformat()
-    try:
-        return str(ts).split('T')[0].split(' ')[0]
-    except Exception:
-        return date.today().isoformat()
-
-
-def _build_transaction(t: dict) -> dict:
-    """Build a single transaction object with safe defaults."""
-    if not t:
-        return {
-            "amount": "",
-            "mode": "",
-            "narration": "",
-            "reference": "",
-            "transactionTimestamp": "",
-            "txnId": "",
-            "type": "",
-            "valueDate": "",
-            "balance": ""
-        }
-
-    return {
-        "amount": str(t.get('amount', '') or ''),
-        "mode": t.get('mode', '') or '',
-        "narration": t.get('narration', '') or '',
-        "reference": str(t.get('reference', '') or ''),
-        "transactionTimestamp": _format_ts(t.get('transaction_timestamp')),
-        "txnId": t.get('transactions_id', '') or '',
-        "type": t.get('type', '') or '',
-        "valueDate": _format_ts(t.get('value_date')),
-        "balance": str(t.get('balance', '') or '')
-    }
-
+        logger.error(f"Error fetching FI data | User ID: {user_id} | Error: {e}")
+        snapshot = FiSnapshot.empty(data_to)
+        snapshot.stale = True
+        return snapshot
 
-def _build_account_summary(acc: dict) -> dict:
-    """Build account summary with safe defaults."""
-    if not acc:
-        acc = {}
 
-    return {
-        "accountType": acc.get('account_type_category') or 'RECURRING',
-        "branch": acc.get('branch') or '',
-        "compoundingFrequency": acc.get('compounding_frequency') or '',
-        "description": acc.get('description') or '',
-        "ifsc": acc.get('ifsc') or '',
-        "interestComputation": acc.get('interest_computation') or '',
-        "interestOnMaturity": acc.get('interest_on_maturity') or '',
-        "interestPayout": acc.get('interest_payout') or '',
-        "interestPeriodicPayoutAmount": acc.get('interest_periodic_payout_amount') or '',
-        "interestRate": str(acc.get('interest_rate') or ''),
-        "maturityAmount": str(acc.get('maturity_amount') or ''),
-        "maturityDate": _format_ts(acc.get('maturity_date')),
-        "openingDate": _format_ts(acc.get('opening_date')),
-        "principalAmount": str(acc.get('principal_amount') or ''),
-        "recurringAmount": str(acc.get('recurring_amount') or ''),
-        "recurringDepositDay": str(acc.get('recurring_deposit_day') or ''),
-        "tenureDays": str(acc.get('tenure_days') or ''),
-        "tenureMonths": str(acc.get('tenure_months') or ''),
-        "tenureYears": str(acc.get('tenure_years') or ''),
-        "currentValue": str(acc.get('current_value') or '')
-    }
-
-
-def _build_account_data(acc: dict, txns: list) -> dict:
-    """Build complete account data structure with safe defaults."""
-    if not acc:
-        acc = {}
-    if not txns:
-        txns = []
-
-    # Build transactions list
-    formatted_txns = [_build_transaction(t) for t in txns if t]
-
-    # Transaction date range
-    if txns and txns[0].get('transaction_timestamp'):
-        start_dt = _format_date(txns[0]['transaction_timestamp'])
-    else:
-        start_dt = _format_date(acc.get('opening_date'))
+def load_fi_snapshot(
+    user_id: str,
+    data_to: str = None
+) -> FiSnapshot:
+    """fetch_fi_snapshot without the error handling: a failed read raises."""
+    if data_to is None:
+        data_to = date.today().isoformat()
+    logger.info(f"User ID: {user_id}")
+    accounts = fetch_accounts(user_id)
 
-    if txns and txns[-1].get('transaction_timestamp'):
-        end_dt = _format_date(txns[-1]['transaction_timestamp'])
-    else:
-        end_dt = date.today().isoformat()
+    if not accounts:
+        return FiSnapshot.empty(data_to)
 
-    return {
-        "linkRefNumber": acc.get('link_ref_number', '') or '',
-        "maskedAccNumber": acc.get('masked_acc_number', '') or '',
-        "decryptedFI": {
-            "account": {
-                "linkedAccRef": acc.get('link_ref_number', '') or '',
-                "maskedAccNumber": acc.get('masked_acc_number', '') or '',
-                "type": acc.get('account_type', '') or '',
-                "version": "2.0.0",
-                "profile": {
-                    "holders": {
-                        "type": "SINGLE",
-                        "holder": []
-                    }
-                },
-                "summary": _build_account_summary(acc),
-                "transactions": {
-                    "startDate": start_dt,
-                    "endDate": end_dt,
-                    "transaction": formatted_txns
-                }
-            },
-            "type": acc.get('account_type', '') or ''
-        }
-    }
+    # Fetch transactions (no start date filter - get all from beginning)
+    account_ids = sorted([acc['id'] for acc in accounts if acc.get('id')])
 
+    if not account_ids:
+        return FiSnapshot.empty(data_to)
+    # Pages are converted to typed columns as they arrive
+    pages = iter_transaction_pages(user_id, account_ids, data_to)
+    return FiSnapshot.from_decoded_pages(accounts, _decode_pages(pages), data_to)
 
-def _build_response(accounts: list, txn_by_account: dict, data_from: str, data_to: str) -> dict:
-    """Build the complete FI_DATA_READY response. Never returns None."""
 
-    if not accounts:
-        accounts = []
-    if not txn_by_account:
-        txn_by_account = {}
+def fetch_accounts(user_id: str) -> list:
+    """The user's user_financial_accounts rows, limited to ACCOUNT_COLUMNS."""
+    query = (
+        supabase.table('user_financial_accounts')
+        .select(','.join(ACCOUNT_COLUMNS))
+        .eq('user_id', user_id)
+    )
+    return execute_measured(query, 'user_financial_accounts', supabase)
 
-    # Group by (session, fip)
-    fip_groups = defaultdict(list)
 
-    for acc in accounts:
-        if not acc:
-            continue
+def _decode_pages(pages: Iterator[list]) -> Iterator[dict]:
+    for page in pages:
+        started = time.perf_counter()
+        decoded = decode_transaction_page(page)
+        get_fetch_metrics().observe_decode('account_transactions', (time.perf_counter() - started) * 1000)
+        yield decoded
 
-        txns = txn_by_account.get(acc.get('id'), [])
-        account_data = _build_account_data(acc, txns)
 
-        key = (
-            acc.get('fi_data_session_id') or str(uuid.uuid4()),
-            acc.get('fip_id') or 'unknown'
+def iter_transaction_pages(
+    user_id: str,
+    account_ids: list,
+    data_to: str,
+    page_size: int = FI_PAGE_SIZE,
+    prefetch: bool = True,
+    after: tuple | None = None
+) -> Iterator[list]:
+    """
+    Yield the user's account_transactions rows in pages, ordered by (transaction_timestamp, id).
+
+    Pages are keyset-paginated: each request starts after the last row of
+    the previous page instead of at an offset, so deep pages cost the same
+    as the first and rows are never skipped or repeated. Paging stops at the
+    first empty page, so a PostgREST max-rows cap below `page_size` only
+    means smaller pages, never truncation. With `prefetch` the next page is
+    requested on a background thread while the caller processes the current one.
+    Pass a (transaction_timestamp, id) cursor as `after` to resume a previous read.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fi-prefetch") if prefetch else None
+    try:
+        page = _fetch_transaction_page(user_id, account_ids, data_to, after, page_size)
+        while page:
+            cursor = (page[-1]['transaction_timestamp'], page[-1]['id'])
+            upcoming = (
+                executor.submit(_fetch_transaction_page, user_id, account_ids, data_to, cursor, page_size)
+                if executor else None
+            )
+            yield page
+            page = (
+                upcoming.result() if upcoming
+                else _fetch_transaction_page(user_id, account_ids, data_to, cursor, page_size)
+            )
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _fetch_transaction_page(
+    user_id: str,
+    account_ids: list,
+    data_to: str,
+    after: tuple | None,
+    page_size: int
+) -> list:
+    """One page of rows (TRANSACTION_COLUMNS only) after the (transaction_timestamp, id) cursor `after`."""
+    query = (
+        supabase.table('account_transactions')
+        .select(','.join(TRANSACTION_COLUMNS))
+        .eq('user_id', user_id)
+        .in_('account_id', account_ids)
+        .lte('transaction_timestamp', f"{data_to}T23:59:59")
+    )
+    if after is not None:
+        timestamp, row_id = after
+        query = query.or_(
+            f'transaction_timestamp.gt."{timestamp}",'
+            f'and(transaction_timestamp.eq."{timestamp}",id.gt."{row_id}")'
         )
-        fip_groups[key].append(account_data)
-
-    # Group into FIP objects
-    session_data = defaultdict(list)
-    for (session_id, fip_id), acc_list in fip_groups.items():
-        session_data[session_id].append({
-            "fipID": fip_id or 'unknown',
-            "data": acc_list or []
-        })
+    query = query.order('transaction_timestamp').order('id').limit(page_size)
+    return execute_measured(query, 'account_transactions', supabase)
 
-    # Get first session
-    session_id = list(session_data.keys())[0] if session_data else str(uuid.uuid4())
 
-    return {
-        "type": "FI_DATA_READY",
-        "status": "COMPLETED",
-        "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
-        "consentId": str(uuid.uuid4()),
-        "dataSessionId": session_id or str(uuid.uuid4()),
-        "dataRange": {
-            "from": f"{data_from}T00:00:00.000Z" if data_from else "",
-            "to": f"{data_to}T00:00:00.000Z" if data_to else ""
-        },
-        "fiData": session_data.get(session_id, []),
-        "notificationId": str(uuid.uuid4().int % 100000)
-    }
+def get_fi_fingerprint(
+    user_id: str,
+    data_to: str = None
+) -> str | None:
+    """
+    Digest of the user's FI snapshot (account ids, transaction counts and the
+    latest transaction_timestamp per account) from a single RPC round trip.
+    Changes whenever get_fi_data would return different transactions.
+    Returns None if the fingerprint could not be computed.
+    """
+    if data_to is None:
+        data_to = date.today().isoformat()
+    rows = fetch_fingerprint_rows(user_id, data_to)
+    if rows is None:
+        return None
 
+    canonical = json.dumps([data_to, rows], sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
 
-def _empty_response(data_to: str = None) -> dict:
-    """Return a valid empty response structure. Never returns None."""
-    if not data_to:
-        data_to = date.today().isoformat()
 
-    return {
-        "type": "FI_DATA_READY",
-        "status": "COMPLETED",
-        "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
-        "consentId": str(uuid.uuid4()),
-        "dataSessionId": str(uuid.uuid4()),
-        "dataRange": {
-            "from": "",
-            "to": f"{data_to}T00:00:00.000Z"
-        },
-        "fiData": [],
-        "notificationId": "0"
-    }
+def fetch_fingerprint_rows(user_id: str, data_to: str) -> list | None:
+    """
+    fi_snapshot_fingerprint rows: account_id, txn_count and
+    max_transaction_timestamp per account. None if the RPC failed.
+    """
+    try:
+        query = supabase.rpc(
+            'fi_snapshot_fingerprint',
+            {'p_user_id': user_id, 'p_data_to': f"{data_to}T23:59:59"}
+        )
+        return execute_measured(query, 'fi_snapshot_fingerprint', supabase)
+    except Exception as e:
+        logger.warning(f"Could not fetch FI fingerprint | User ID: {user_id} | Error: {e}")
+        return None
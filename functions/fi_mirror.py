@@ -0,0 +1,260 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Iterator
+from config.global_logger import get_logger
+from functions.fi_data import (
+    fetch_accounts, fetch_fi_snapshot, fetch_fingerprint_rows, iter_transaction_pages, load_fi_snapshot
+)
+from functions.fi_records import TRANSACTION_COLUMNS, FiSnapshot
+
+logger = get_logger(__name__)
+
+FI_MIRROR_DB = os.getenv("FI_MIRROR_DB", "data/fi_mirror.db")
+FI_MIRROR_ENABLED = os.getenv("FI_MIRROR_ENABLED", "1").lower() in ("1", "true", "yes")
+# Rows per fetchmany when reading a user's transactions back
+FI_MIRROR_READ_PAGE = int(os.getenv("FI_MIRROR_READ_PAGE", "5000"))
+# Users share this many sync locks, so the lock table stays fixed however many users are seen
+USER_LOCK_STRIPES = 64
+
+# account_transactions columns kept locally, the same ones fetches select
+MIRRORED_COLUMNS = TRANSACTION_COLUMNS
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS accounts ("
+    "user_id TEXT NOT NULL, id TEXT NOT NULL, row TEXT NOT NULL, PRIMARY KEY (user_id, id))",
+    "CREATE TABLE IF NOT EXISTS transactions ("
+    "user_id TEXT NOT NULL, id NOT NULL, account_id TEXT NOT NULL, transactions_id TEXT, "
+    "amount REAL, balance REAL, mode TEXT, narration TEXT, reference TEXT, type TEXT, "
+    "transaction_timestamp TEXT, value_date TEXT, PRIMARY KEY (user_id, id))",
+    "CREATE INDEX IF NOT EXISTS transactions_user_account_timestamp "
+    "ON transactions (user_id, account_id, transaction_timestamp)",
+    "CREATE INDEX IF NOT EXISTS transactions_user_timestamp_id "
+    "ON transactions (user_id, transaction_timestamp, id)",
+    "CREATE TABLE IF NOT EXISTS sync_state ("
+    "user_id TEXT PRIMARY KEY, account_ids TEXT NOT NULL, cursor TEXT, "
+    "complete INTEGER NOT NULL DEFAULT 0, "
+    "synced_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+)
+
+# Columns added after the first release, for mirror files created before them
+_MIGRATIONS = (
+    ("sync_state", "complete", "ALTER TABLE sync_state ADD COLUMN complete INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+class FiMirror:
+    """
+    Local SQLite copy of users' user_financial_accounts and account_transactions.
+
+    `sync` pulls only the transactions after the user's stored
+    (transaction_timestamp, id) cursor, so a returning user costs one
+    accounts query, one fingerprint RPC and usually one empty page. The
+    mirror is rebuilt for a user when their linked accounts change or when
+    the per-account counts from fi_snapshot_fingerprint disagree with the
+    local ones (rows deleted, or inserted behind the cursor). `snapshot`
+    reads everything back locally.
+
+    sync_state.complete is set once a sync has run to the end, so a mirror
+    left behind by a failed first pull is never mistaken for the user's data.
+    """
+
+    def __init__(self, path: str = FI_MIRROR_DB):
+        self.path = path
+        self._user_locks = [threading.Lock() for _ in range(USER_LOCK_STRIPES)]
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+                for table, column, statement in _MIGRATIONS:
+                    if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                        conn.execute(statement)
+        finally:
+            conn.close()
+        logger.info(f"FI mirror initialized | Path: {path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    # ==================== SYNC ====================
+
+    def sync(self, user_id: str) -> int:
+        """Bring the user's mirror up to date; returns the number of transactions pulled."""
+        with self._user_lock(user_id):
+            accounts = fetch_accounts(user_id)
+            account_ids = sorted(acc['id'] for acc in accounts if acc.get('id'))
+            data_to = date.today().isoformat()
+
+            conn = self._connect()
+            try:
+                stored = conn.execute(
+                    "SELECT account_ids, cursor FROM sync_state WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                with conn:
+                    conn.execute("DELETE FROM accounts WHERE user_id = ?", (user_id,))
+                    conn.executemany(
+                        "INSERT INTO accounts (user_id, id, row) VALUES (?, ?, ?)",
+                        [(user_id, acc['id'], json.dumps(acc, default=str)) for acc in accounts if acc.get('id')]
+                    )
+
+                cursor = None
+                if stored is not None and json.loads(stored[0]) == account_ids:
+                    cursor = tuple(json.loads(stored[1])) if stored[1] else None
+                else:
+                    self._reset(conn, user_id, account_ids)
+                pulled = self._pull(conn, user_id, account_ids, data_to, cursor)
+
+                if cursor is not None and not self._counts_match(conn, user_id, data_to):
+                    logger.warning(f"FI mirror out of sync with Supabase, rebuilding | User ID: {user_id}")
+                    self._reset(conn, user_id, account_ids)
+                    pulled = self._pull(conn, user_id, account_ids, data_to, None)
+
+                with conn:
+                    conn.execute("UPDATE sync_state SET complete = 1 WHERE user_id = ?", (user_id,))
+            finally:
+                conn.close()
+
+        logger.info(f"FI mirror synced | User ID: {user_id} | New transactions: {pulled}")
+        return pulled
+
+    def _reset(self, conn: sqlite3.Connection, user_id: str, account_ids: list):
+        with conn:
+            conn.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
+            conn.execute(
+                "INSERT INTO sync_state (user_id, account_ids, cursor, complete) VALUES (?, ?, NULL, 0) "
+                "ON CONFLICT(user_id) DO UPDATE SET account_ids = excluded.account_ids, cursor = NULL, "
+                "complete = 0, synced_at = CURRENT_TIMESTAMP",
+                (user_id, json.dumps(account_ids))
+            )
+
+    def _pull(self, conn: sqlite3.Connection, user_id: str, account_ids: list, data_to: str, cursor: tuple | None) -> int:
+        if not account_ids:
+            return 0
+
+        pulled = 0
+        placeholders = ", ".join("?" for _ in MIRRORED_COLUMNS)
+        for page in iter_transaction_pages(user_id, account_ids, data_to, after=cursor):
+            last = page[-1]
+            # Each page and the cursor after it commit together, so an interrupted sync resumes cleanly
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO transactions (user_id, {', '.join(MIRRORED_COLUMNS)}) "
+                    f"VALUES (?, {placeholders})",
+                    [(user_id, *(_sqlite_value(txn.get(column)) for column in MIRRORED_COLUMNS)) for txn in page]
+                )
+                conn.execute(
+                    "UPDATE sync_state SET cursor = ?, synced_at = CURRENT_TIMESTAMP WHERE user_id = ?",
+                    (json.dumps([last['transaction_timestamp'], last['id']]), user_id)
+                )
+            pulled += len(page)
+        return pulled
+
+    def _counts_match(self, conn: sqlite3.Connection, user_id: str, data_to: str) -> bool:
+        remote = fetch_fingerprint_rows(user_id, data_to)
+        if remote is None:
+            # Can't tell; keep the incremental result
+            return True
+        local = dict(conn.execute(
+            "SELECT account_id, COUNT(*) FROM transactions "
+            "WHERE user_id = ? AND substr(transaction_timestamp, 1, 19) <= ? GROUP BY account_id",
+            (user_id, f"{data_to}T23:59:59")
+        ).fetchall())
+        return all(local.get(str(row['account_id']), 0) == row['txn_count'] for row in remote)
+
+    # ==================== READS ====================
+
+    def is_complete(self, user_id: str) -> bool:
+        """True once a sync for the user has run to the end since the mirror was last reset."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT complete FROM sync_state WHERE user_id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return bool(row and row[0])
+
+    def snapshot(self, user_id: str, data_to: str = None) -> FiSnapshot:
+        """The user's mirrored data as get_fi_data would return it, without touching the network."""
+        if data_to is None:
+            data_to = date.today().isoformat()
+
+        conn = self._connect()
+        try:
+            accounts = [json.loads(row) for (row,) in conn.execute(
+                "SELECT row FROM accounts WHERE user_id = ? ORDER BY rowid", (user_id,)
+            )]
+            if not accounts:
+                return FiSnapshot.empty(data_to)
+            return FiSnapshot.from_pages(accounts, self._read_pages(conn, user_id, data_to), data_to)
+        finally:
+            conn.close()
+
+    def _read_pages(self, conn: sqlite3.Connection, user_id: str, data_to: str) -> Iterator[list]:
+        rows = conn.execute(
+            f"SELECT {', '.join(MIRRORED_COLUMNS)} FROM transactions "
+            "WHERE user_id = ? AND substr(transaction_timestamp, 1, 19) <= ? "
+            "ORDER BY transaction_timestamp, id",
+            (user_id, f"{data_to}T23:59:59")
+        )
+        while page := rows.fetchmany(FI_MIRROR_READ_PAGE):
+            yield [dict(zip(MIRRORED_COLUMNS, row)) for row in page]
+
+    def discard(self, user_id: str):
+        with self._user_lock(user_id):
+            conn = self._connect()
+            try:
+                with conn:
+                    for table in ("transactions", "accounts", "sync_state"):
+                        conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+            finally:
+                conn.close()
+
+
+def _sqlite_value(value):
+    # Numeric columns arrive as numbers; anything structured is stored as text
+    return value if value is None or isinstance(value, (str, int, float)) else str(value)
+
+
+def fetch_fi_snapshot_mirrored(user_id: str, data_to: str = None) -> FiSnapshot:
+    """
+    fetch_fi_snapshot served from the local mirror after an incremental sync.
+
+    Falls back to a full remote fetch when the mirror is disabled
+    (FI_MIRROR_ENABLED=0). When the sync fails, the last mirrored data is
+    served marked `stale` if an earlier sync completed; otherwise (a user
+    never mirrored, or a first pull cut short) it fetches remotely with
+    load_fi_snapshot, and raises if that fails too.
+    """
+    if not FI_MIRROR_ENABLED:
+        return fetch_fi_snapshot(user_id, data_to)
+
+    mirror = get_fi_mirror()
+    try:
+        mirror.sync(user_id)
+    except Exception as e:
+        if not mirror.is_complete(user_id):
+            logger.warning(f"FI mirror sync failed with no complete mirror, fetching remotely | User ID: {user_id} | Error: {e}")
+            return load_fi_snapshot(user_id, data_to)
+        logger.warning(f"FI mirror sync failed, serving mirrored data | User ID: {user_id} | Error: {e}")
+        snapshot = mirror.snapshot(user_id, data_to)
+        snapshot.stale = True
+        return snapshot
+    return mirror.snapshot(user_id, data_to)
+
+
+# Global mirror instance
+_fi_mirror = None
+
+
+def get_fi_mirror() -> FiMirror:
+    global _fi_mirror
+    if _fi_mirror is None:
+        _fi_mirror = FiMirror()
+    return _fi_mirror
@@ -0,0 +1,426 @@
+"""
+Typed, array-backed FI snapshot.
+
+Rows fetched from user_financial_accounts / account_transactions are kept
+as one AccountRecord per account, each holding a TransactionBatch: amounts
+and balances as int64 paise, timestamps as datetime64[us] epoch values and
+type/mode as small integer codes. Analysis reads the arrays directly; the
+string-typed FI_DATA_READY dict is only built by `FiSnapshot.to_fi_data`
+when a caller needs it (e.g. to persist or return it).
+"""
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable
+import numpy as np
+from functions.parsing import parse_date, parse_timestamp_column, safe_float
+
+# Columns the builders below read; fetches select exactly these instead of '*'
+ACCOUNT_COLUMNS = (
+    "id", "fi_data_session_id", "fip_id", "link_ref_number", "masked_acc_number", "account_type",
+    "account_type_category", "branch", "compounding_frequency", "description", "ifsc",
+    "interest_computation", "interest_on_maturity", "interest_payout", "interest_periodic_payout_amount",
+    "interest_rate", "maturity_amount", "maturity_date", "opening_date", "principal_amount",
+    "recurring_amount", "recurring_deposit_day", "tenure_days", "tenure_months", "tenure_years", "current_value"
+)
+TRANSACTION_COLUMNS = (
+    "id", "account_id", "transactions_id", "amount", "balance", "mode",
+    "narration", "reference", "type", "transaction_timestamp", "value_date"
+)
+
+class TransactionBatch:
+    """One account's transactions as columns, in the order they were fetched."""
+
+    __slots__ = (
+        "amount_paise", "balance_paise", "timestamp", "value_date",
+        "type_code", "mode_code", "types", "modes", "narration", "reference", "txn_id"
+    )
+
+    def __init__(self, amount_paise, balance_paise, timestamp, value_date, type_code, mode_code,
+                 types, modes, narration, reference, txn_id):
+        self.amount_paise = amount_paise
+        self.balance_paise = balance_paise
+        self.timestamp = timestamp
+        self.value_date = value_date
+        self.type_code = type_code
+        self.mode_code = mode_code
+        self.types = types
+        self.modes = modes
+        self.narration = narration
+        self.reference = reference
+        self.txn_id = txn_id
+
+    def __len__(self) -> int:
+        return len(self.amount_paise)
+
+    def __getitem__(self, rows: slice) -> "TransactionBatch":
+        """Row slice sharing the type/mode tables, e.g. batch[folded_rows:]."""
+        return TransactionBatch(
+            self.amount_paise[rows], self.balance_paise[rows], self.timestamp[rows], self.value_date[rows],
+            self.type_code[rows], self.mode_code[rows], self.types, self.modes,
+            self.narration[rows], self.reference[rows], self.txn_id[rows]
+        )
+
+    @classmethod
+    def concat(cls, batches: list["TransactionBatch"]) -> "TransactionBatch":
+        """One batch with the rows of `batches` in order, their type/mode tables unified."""
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls.from_rows([])
+
+        type_ids, mode_ids = {}, {}
+        type_codes, mode_codes = [], []
+        for batch in batches:
+            type_lookup = np.array([type_ids.setdefault(t, len(type_ids)) for t in batch.types], dtype=np.intp)
+            mode_lookup = np.array([mode_ids.setdefault(m, len(mode_ids)) for m in batch.modes], dtype=np.intp)
+            type_codes.append(type_lookup[batch.type_code])
+            mode_codes.append(mode_lookup[batch.mode_code])
+        return cls(
+            amount_paise=np.concatenate([b.amount_paise for b in batches]),
+            balance_paise=np.concatenate([b.balance_paise for b in batches]),
+            timestamp=np.concatenate([b.timestamp for b in batches]),
+            value_date=np.concatenate([b.value_date for b in batches]),
+            type_code=np.concatenate(type_codes),
+            mode_code=np.concatenate(mode_codes),
+            types=list(type_ids),
+            modes=list(mode_ids),
+            narration=[n for b in batches for n in b.narration],
+            reference=[r for b in batches for r in b.reference],
+            txn_id=[t for b in batches for t in b.txn_id]
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "TransactionBatch":
+        """Build from account_transactions rows as returned by Supabase."""
+        type_ids, mode_ids = {}, {}
+        return cls(
+            amount_paise=_paise([r.get('amount') for r in rows]),
+            balance_paise=_paise([r.get('balance') for r in rows]),
+            timestamp=_clock_column([r.get('transaction_timestamp') for r in rows]),
+            value_date=_clock_column([r.get('value_date') for r in rows]),
+            type_code=np.array([type_ids.setdefault(r.get('type') or '', len(type_ids)) for r in rows], dtype=np.intp),
+            mode_code=np.array([mode_ids.setdefault(r.get('mode') or '', len(mode_ids)) for r in rows], dtype=np.intp),
+            types=list(type_ids),
+            modes=list(mode_ids),
+            narration=[r.get('narration') or '' for r in rows],
+            reference=[str(r.get('reference') or '') for r in rows],
+            txn_id=[r.get('transactions_id') or '' for r in rows]
+        )
+
+    def cursor(self, i: int) -> list:
+        """[transactionTimestamp, txnId] of row i, as they appear in the FI dict."""
+        return [_format_clock(self.timestamp[i:i + 1])[0], self.txn_id[i]]
+
+    def to_transactions(self) -> list[dict]:
+        """The FI_DATA_READY transaction list for this batch."""
+        timestamps = _format_clock(self.timestamp)
+        value_dates = _format_clock(self.value_date)
+        return [
+            {
+                "amount": _format_paise(amount),
+                "mode": self.modes[mode],
+                "narration": narration,
+                "reference": reference,
+                "transactionTimestamp": ts,
+                "txnId": txn_id,
+                "type": self.types[txn_type],
+                "valueDate": value_date,
+                "balance": _format_paise(balance)
+            }
+            for amount, mode, narration, reference, ts, txn_id, txn_type, value_date, balance in zip(
+                self.amount_paise.tolist(), self.mode_code.tolist(), self.narration, self.reference,
+                timestamps, self.txn_id, self.type_code.tolist(), value_dates, self.balance_paise.tolist()
+            )
+        ]
+
+    def first_date(self) -> str | None:
+        return self._date_at(0)
+
+    def last_date(self) -> str | None:
+        return self._date_at(-1)
+
+    def _date_at(self, i: int) -> str | None:
+        if not len(self) or np.isnat(self.timestamp[i]):
+            return None
+        return str(self.timestamp[i].astype("datetime64[D]"))
+
+
+class AccountRecord:
+    """A user_financial_accounts row with its transactions."""
+
+    __slots__ = ("row", "transactions")
+
+    def __init__(self, row: dict, transactions: TransactionBatch):
+        self.row = row
+        self.transactions = transactions
+
+    def to_account_data(self, include_transactions: bool = True) -> dict:
+        txns = self.transactions
+        start_dt = txns.first_date() or _format_date(self.row.get('opening_date'))
+        end_dt = txns.last_date() or date.today().isoformat()
+        return _build_account_data(self.row, txns.to_transactions() if include_transactions else [], start_dt, end_dt)
+
+
+class FiSnapshot:
+    """Everything get_fi_data returns for a user, before it is rendered as a dict."""
+
+    __slots__ = ("accounts", "data_from", "data_to", "stale")
+
+    def __init__(self, accounts: list[AccountRecord], data_from: str, data_to: str):
+        self.accounts = accounts
+        self.data_from = data_from
+        self.data_to = data_to
+        # Served from a local copy because refreshing it failed
+        self.stale = False
+
+    @classmethod
+    def from_rows(cls, accounts: list, transactions: list, data_to: str) -> "FiSnapshot":
+        """Group account_transactions rows (ordered by transaction_timestamp) under their accounts."""
+        return cls.from_pages(accounts, [transactions], data_to)
+
+    @classmethod
+    def from_pages(cls, accounts: list, pages: Iterable[list], data_to: str) -> "FiSnapshot":
+        """
+        Like from_rows, for transactions arriving as consecutive pages.
+
+        Each page is converted to typed columns as it arrives, so only one
+        page of row dicts is alive at a time.
+        """
+        return cls.from_decoded_pages(accounts, (decode_transaction_page(page) for page in pages), data_to)
+
+    @classmethod
+    def from_decoded_pages(cls, accounts: list, pages: Iterable[dict], data_to: str) -> "FiSnapshot":
+        """Build from pages already passed through decode_transaction_page, in fetch order."""
+        parts = defaultdict(list)
+        data_from = None
+        for page in pages:
+            if data_from is None and page:
+                # Rows are in timestamp order, so the page's earliest row is the first one fetched
+                first_dates = [batch.first_date() for batch in page.values()]
+                data_from = min((d for d in first_dates if d), default="")
+            for account_id, batch in page.items():
+                parts[account_id].append(batch)
+
+        if not data_from:
+            # If no transactions, use earliest account opening date
+            opening_dates = [acc.get('opening_date') for acc in accounts if acc.get('opening_date')]
+            data_from = _format_date(min(opening_dates)) if opening_dates else date.today().isoformat()
+
+        records = [
+            AccountRecord(acc, TransactionBatch.concat(parts.get(acc.get('id'), [])))
+            for acc in accounts
+            if acc
+        ]
+        return cls(records, data_from, data_to)
+
+    @classmethod
+    def empty(cls, data_to: str | None = None) -> "FiSnapshot":
+        return cls([], "", data_to or date.today().isoformat())
+
+    def transaction_batches(self) -> list[TransactionBatch]:
+        """Per-account batches, in the order of the accounts in `to_fi_data`."""
+        return [record.transactions for _, group in self._fip_groups() for record in group]
+
+    def transaction_count(self) -> int:
+        return sum(len(record.transactions) for record in self.accounts)
+
+    def to_fi_data(self, include_transactions: bool = True) -> dict:
+        """
+        Render the FI_DATA_READY dict. Never returns None.
+
+        With include_transactions=False the accounts carry metadata only,
+        which is all analysis needs next to `transaction_batches`.
+        """
+        if not self.accounts:
+            return _empty_response(self.data_to)
+
+        groups = self._fip_groups()
+        session_id = groups[0][0][0]
+        return {
+            "type": "FI_DATA_READY",
+            "status": "COMPLETED",
+            "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            "consentId": str(uuid.uuid4()),
+            "dataSessionId": session_id,
+            "dataRange": {
+                "from": f"{self.data_from}T00:00:00.000Z" if self.data_from else "",
+                "to": f"{self.data_to}T00:00:00.000Z" if self.data_to else ""
+            },
+            "fiData": [
+                {
+                    "fipID": fip_id or 'unknown',
+                    "data": [record.to_account_data(include_transactions) for record in group]
+                }
+                for (_, fip_id), group in groups
+            ],
+            "notificationId": str(uuid.uuid4().int % 100000)
+        }
+
+    def _fip_groups(self) -> list[tuple[tuple[str, str], list[AccountRecord]]]:
+        """Accounts grouped by (session, fip), first session only, as get_fi_data always returned them."""
+        groups = defaultdict(list)
+        for record in self.accounts:
+            key = (
+                record.row.get('fi_data_session_id') or str(uuid.uuid4()),
+                record.row.get('fip_id') or 'unknown'
+            )
+            groups[key].append(record)
+        items = list(groups.items())
+        first_session = items[0][0][0] if items else None
+        return [(key, group) for key, group in items if key[0] == first_session]
+
+
+def decode_transaction_page(rows: list) -> dict[str, TransactionBatch]:
+    """account_transactions rows decoded into one typed batch per account_id, keeping row order."""
+    txn_by_account = defaultdict(list)
+    for txn in rows:
+        if txn and txn.get('account_id'):
+            txn_by_account[txn['account_id']].append(txn)
+    return {account_id: TransactionBatch.from_rows(txns) for account_id, txns in txn_by_account.items()}
+
+
+def _paise(values: list) -> np.ndarray:
+    """Rupee amounts (numbers or numeric strings, None/'' as 0) as int64 paise."""
+    rupees = np.array([safe_float(v) for v in values], dtype=np.float64)
+    return np.rint(rupees * 100).astype(np.int64)
+
+
+def _format_paise(paise: int) -> str:
+    """
+    str() of the amount as Supabase returns it: whole rupees as an int
+    ("1500"), anything else as a float ("1500.5"), and 0/None as '' like
+    get_fi_data always did.
+    """
+    if not paise:
+        return ""
+    if paise % 100 == 0:
+        return str(paise // 100)
+    return str(paise / 100)
+
+
+def _clock_column(values: list) -> np.ndarray:
+    """
+    Timestamps as datetime64[us], NaT where missing or unparseable.
+
+    Mirrors _format_ts: the clock time is kept to the second and any UTC
+    offset is dropped, so the values read back as `+00:00` timestamps.
+    """
+    wall, _ = parse_timestamp_column(values)
+    wall = wall.astype("datetime64[s]").astype("datetime64[us]")
+    for i in np.flatnonzero(np.isnat(wall)):
+        formatted = _format_ts(values[i])
+        parsed = parse_date(formatted[:19]) if formatted else None
+        if parsed is not None:
+            wall[i] = np.datetime64(parsed, "us")
+    return wall
+
+
+def _format_clock(values: np.ndarray) -> list[str]:
+    text = np.datetime_as_string(values, unit="s")
+    return ["" if t == "NaT" else f"{t}+00:00" for t in text.tolist()]
+
+
+def _format_ts(ts: str) -> str:
+    """Format timestamp to ISO format. Returns empty string on failure."""
+    if not ts:
+        return ""
+    try:
+        if 'T' in str(ts):
+            dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00').replace('+00', '+00:00'))
+        else:
+            dt = datetime.fromisoformat(str(ts).replace(' ', 'T').split('+')[0])
+        return dt.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    except Exception:
+        return ""
+
+
+def _format_date(ts: str) -> str:
+    """Extract date from timestamp. Returns today's date on failure."""
+    if not ts:
+        return date.today().isoformat()
+    try:
+        return str(ts).split('T')[0].split(' ')[0]
+    except Exception:
+        return date.today().isoformat()
+
+
+def _build_account_summary(acc: dict) -> dict:
+    """Build account summary with safe defaults."""
+    if not acc:
+        acc = {}
+
+    return {
+        "accountType": acc.get('account_type_category') or 'RECURRING',
+        "branch": acc.get('branch') or '',
+        "compoundingFrequency": acc.get('compounding_frequency') or '',
+        "description": acc.get('description') or '',
+        "ifsc": acc.get('ifsc') or '',
+        "interestComputation": acc.get('interest_computation') or '',
+        "interestOnMaturity": acc.get('interest_on_maturity') or '',
+        "interestPayout": acc.get('interest_payout') or '',
+        "interestPeriodicPayoutAmount": acc.get('interest_periodic_payout_amount') or '',
+        "interestRate": str(acc.get('interest_rate') or ''),
+        "maturityAmount": str(acc.get('maturity_amount') or ''),
+        "maturityDate": _format_ts(acc.get('maturity_date')),
+        "openingDate": _format_ts(acc.get('opening_date')),
+        "principalAmount": str(acc.get('principal_amount') or ''),
+        "recurringAmount": str(acc.get('recurring_amount') or ''),
+        "recurringDepositDay": str(acc.get('recurring_deposit_day') or ''),
+        "tenureDays": str(acc.get('tenure_days') or ''),
+        "tenureMonths": str(acc.get('tenure_months') or ''),
+        "tenureYears": str(acc.get('tenure_years') or ''),
+        "currentValue": str(acc.get('current_value') or '')
+    }
+
+
+def _build_account_data(acc: dict, formatted_txns: list, start_dt: str, end_dt: str) -> dict:
+    """Build complete account data structure with safe defaults."""
+    if not acc:
+        acc = {}
+
+    return {
+        "linkRefNumber": acc.get('link_ref_number', '') or '',
+        "maskedAccNumber": acc.get('masked_acc_number', '') or '',
+        "decryptedFI": {
+            "account": {
+                "linkedAccRef": acc.get('link_ref_number', '') or '',
+                "maskedAccNumber": acc.get('masked_acc_number', '') or '',
+                "type": acc.get('account_type', '') or '',
+                "version": "2.0.0",
+                "profile": {
+                    "holders": {
+                        "type": "SINGLE",
+                        "holder": []
+                    }
+                },
+                "summary": _build_account_summary(acc),
+                "transactions": {
+                    "startDate": start_dt,
+                    "endDate": end_dt,
+                    "transaction": formatted_txns
+                }
+            },
+            "type": acc.get('account_type', '') or ''
+        }
+    }
+
+
+def _empty_response(data_to: str = None) -> dict:
+    """Return a valid empty response structure. Never returns None."""
+    if not data_to:
+        data_to = date.today().isoformat()
+
+    return {
+        "type": "FI_DATA_READY",
+        "status": "COMPLETED",
+        "timestamp": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+        "consentId": str(uuid.uuid4()),
+        "dataSessionId": str(uuid.uuid4()),
+        "dataRange": {
+            "from": "",
+            "to": f"{data_to}T00:00:00.000Z"
+        },
+        "fiData": [],
+        "notificationId": "0"
+    }
@@ -1,27 +1,59 @@
 import json
 from datetime import datetime
 from collections import defaultdict
-from typing import Any
-from statistics import mean, stdev
 from constants.dummy import sample
+from functions.fi_records import FiSnapshot
+from functions.parsing import parse_date, safe_float, safe_int
+from functions.section_graph import SectionGraph
+from functions.transaction_aggregate import TransactionAggregate
+from functions.transaction_columns import CREDIT_TYPES, TransactionColumns, TransactionStore, as_columns
+
+
+# Top-level sections of the analysis, in output order
+SUMMARY_SECTIONS = (
+    "data_overview",
+    "accounts",
+    "aggregated_insights",
+    "behavioral_patterns",
+    "financial_health_indicators",
+    "personalization_context"
+)
+
+
+def analyze_financial_data(
+    aa_data: dict | str | FiSnapshot,
+    sections: tuple[str, ...] | list[str] | None = None,
+    granularity: str = "month"
+) -> dict:
+    """
+    Analyze an FI_DATA_READY payload.
+
+    Only `sections` (default: all of SUMMARY_SECTIONS) and what they depend
+    on are computed, e.g. ("personalization_context",) skips nothing it
+    needs but never renders data_overview. `granularity` ("month",
+    "quarter" or "year") sets the buckets of each account's
+    monthly_breakdown.
 
+    A FiSnapshot from fetch_fi_snapshot is analyzed straight from its typed
+    columns; only account metadata is rendered as FI dicts.
+    """
+    if isinstance(aa_data, FiSnapshot):
+        graph = SectionGraph(ANALYSIS_NODES, {
+            "aa_data": aa_data.to_fi_data(include_transactions=False),
+            "transaction_lists": aa_data.transaction_batches(),
+            "granularity": granularity
+        })
+        return graph.evaluate(sections or SUMMARY_SECTIONS)
 
-def analyze_financial_data(aa_data: dict | str) -> dict:
     if isinstance(aa_data, str):
         aa_data = json.loads(aa_data)
 
-    summary = {
-        "data_overview": extract_data_overview(aa_data),
-        "accounts": [],
-        "aggregated_insights": {},
-        "behavioral_patterns": {},
-        "financial_health_indicators": {},
-        "personalization_context": {}
-    }
+    graph = SectionGraph(ANALYSIS_NODES, {"aa_data": aa_data, "granularity": granularity})
+    return graph.evaluate(sections or SUMMARY_SECTIONS)
 
-    all_transactions = []
 
-    # Process each FIP's data
+def iter_accounts(aa_data: dict):
+    """Yield (account, account_type, fip_id) for every account in an FI_DATA_READY payload."""
     for fip_data in aa_data.get("fiData", []):
         fip_id = fip_data.get("fipID", "unknown")
 
@@ -29,21 +61,22 @@ def analyze_financial_data(aa_data: dict | str) -> dict:
             decrypted = account_data.get("decryptedFI", {})
             account = decrypted.get("account", {})
             account_type = decrypted.get("type", account.get("type", "unknown"))
+            yield account, account_type, fip_id
 
-            account_summary = analyze_account(account, account_type, fip_id)
-            summary["accounts"].append(account_summary)
-
-            # Collect transactions for aggregate analysis
-            txns = account.get("transactions", {}).get("transaction", [])
-            all_transactions.extend(txns)
 
-    # Generate aggregate insights across all accounts
-    summary["aggregated_insights"] = generate_aggregate_insights(summary["accounts"])
-    summary["behavioral_patterns"] = analyze_behavioral_patterns(all_transactions)
-    summary["financial_health_indicators"] = calculate_financial_health(summary)
-    summary["personalization_context"] = generate_personalization_context(summary)
-
-    return summary
+def build_summary(
+    aa_data: dict,
+    accounts: list,
+    behavioral_patterns: dict,
+    sections: tuple[str, ...] | list[str] | None = None
+) -> dict:
+    """Assemble the analysis from per-account summaries and cross-account behavioral patterns computed elsewhere."""
+    graph = SectionGraph(ANALYSIS_NODES, {
+        "aa_data": aa_data,
+        "accounts": accounts,
+        "behavioral_patterns": behavioral_patterns
+    })
+    return graph.evaluate(sections or SUMMARY_SECTIONS)
 
 
 def extract_data_overview(aa_data: dict) -> dict:
@@ -64,8 +97,13 @@ def extract_data_overview(aa_data: dict) -> dict:
     }
 
 
-def analyze_account(account: dict, account_type: str, fip_id: str) -> dict:
-    """Analyze a single account and return its summary."""
+def analyze_account(
+    account: dict,
+    account_type: str,
+    fip_id: str,
+    txn_analysis: dict | None = None
+) -> dict:
+    """Analyze a single account and return its summary. Pass `txn_analysis` when it was computed elsewhere."""
     profile = account.get("profile", {})
     summary_data = account.get("summary", {})
     transactions = account.get("transactions", {})
@@ -83,7 +121,8 @@ def analyze_account(account: dict, account_type: str, fip_id: str) -> dict:
         }
 
     # Analyze transactions
-    txn_analysis = analyze_transactions(transactions.get("transaction", []))
+    if txn_analysis is None:
+        txn_analysis = analyze_transactions(transactions.get("transaction", []))
 
     # Build account summary based on type
     account_summary = {
@@ -137,212 +176,20 @@ def extract_account_details(summary: dict, account_type: str) -> dict:
     return base_details
 
 
-def analyze_transactions(transactions: list) -> dict:
-    """Comprehensive transaction analysis."""
-    if not transactions:
-        return {"total_transactions": 0, "message": "No transactions found"}
-
-    # Parse all transactions
-    parsed_txns = []
-    for txn in transactions:
-        parsed = {
-            "amount": safe_float(txn.get("amount", 0)),
-            "mode": txn.get("mode", "UNKNOWN"),
-            "type": txn.get("type", "UNKNOWN"),
-            "narration": txn.get("narration", ""),
-            "timestamp": parse_date(txn.get("transactionTimestamp", "")),
-            "balance": safe_float(txn.get("balance", 0)),
-            "reference": txn.get("reference")
-        }
-        if parsed["timestamp"]:
-            parsed_txns.append(parsed)
-
-    if not parsed_txns:
-        return {"total_transactions": len(transactions), "message": "Could not parse transaction dates"}
-
-    # Sort by timestamp
-    parsed_txns.sort(key=lambda x: x["timestamp"])
-
-    # Calculate date range
-    date_range = {
-        "earliest": parsed_txns[0]["timestamp"].isoformat(),
-        "latest": parsed_txns[-1]["timestamp"].isoformat(),
-        "span_days": (parsed_txns[-1]["timestamp"] - parsed_txns[0]["timestamp"]).days
-    }
-
-    # Amount statistics
-    amounts = [t["amount"] for t in parsed_txns]
-    amount_stats = {
-        "total": round(sum(amounts), 2),
-        "average": round(mean(amounts), 2),
-        "min": round(min(amounts), 2),
-        "max": round(max(amounts), 2),
-        "std_dev": round(stdev(amounts), 2) if len(amounts) > 1 else 0
-    }
+def analyze_transactions(transactions: list | TransactionColumns, granularity: str = "month") -> dict:
+    """Comprehensive transaction analysis over a columnar view of the transactions."""
+    cols = as_columns(transactions)
+    return TransactionAggregate.from_columns(cols).transaction_summary(cols, granularity)
 
-    # Breakdown by transaction type
-    by_type = defaultdict(lambda: {"count": 0, "total": 0, "amounts": []})
-    for txn in parsed_txns:
-        t = txn["type"]
-        by_type[t]["count"] += 1
-        by_type[t]["total"] += txn["amount"]
-        by_type[t]["amounts"].append(txn["amount"])
-
-    type_breakdown = {}
-    for t, data in by_type.items():
-        type_breakdown[t] = {
-            "count": data["count"],
-            "total": round(data["total"], 2),
-            "average": round(mean(data["amounts"]), 2),
-            "percentage_of_total": round((data["total"] / amount_stats["total"]) * 100, 1) if amount_stats["total"] > 0 else 0
-        }
 
-    # Breakdown by payment mode
-    by_mode = defaultdict(lambda: {"count": 0, "total": 0})
-    for txn in parsed_txns:
-        m = txn["mode"]
-        by_mode[m]["count"] += 1
-        by_mode[m]["total"] += txn["amount"]
+def analyze_behavioral_patterns(all_transactions: list | TransactionColumns, as_of=None) -> dict:
+    """Analyze behavioral patterns across all transactions; rolling windows end on `as_of` (default: today)."""
+    return TransactionAggregate.from_columns(as_columns(all_transactions)).behavioral_patterns(as_of)
 
-    mode_breakdown = {
-        mode: {"count": data["count"], "total": round(data["total"], 2)}
-        for mode, data in by_mode.items()
-    }
 
-    # Monthly breakdown
-    monthly = defaultdict(lambda: {"count": 0, "total": 0})
-    for txn in parsed_txns:
-        month_key = txn["timestamp"].strftime("%Y-%m")
-        monthly[month_key]["count"] += 1
-        monthly[month_key]["total"] += txn["amount"]
-
-    monthly_breakdown = {
-        k: {"count": v["count"], "total": round(v["total"], 2)}
-        for k, v in sorted(monthly.items())
-    }
-
-    # Balance trajectory
-    balances = [t["balance"] for t in parsed_txns if t["balance"] > 0]
-    balance_stats = {}
-    if balances:
-        balance_stats = {
-            "starting": balances[0],
-            "ending": balances[-1],
-            "highest": max(balances),
-            "lowest": min(balances),
-            "average": round(mean(balances), 2),
-            "trend": "increasing" if balances[-1] > balances[0] else "decreasing" if balances[-1] < balances[0] else "stable"
-        }
-
-    # Identify large/unusual transactions (> 2 std dev from mean)
-    threshold = amount_stats["average"] + (2 * amount_stats["std_dev"]) if amount_stats["std_dev"] > 0 else amount_stats["max"]
-    large_transactions = [
-        {
-            "amount": t["amount"],
-            "type": t["type"],
-            "mode": t["mode"],
-            "date": t["timestamp"].isoformat()
-        }
-        for t in parsed_txns if t["amount"] > threshold
-    ][:10]  # Limit to top 10
-
-    return {
-        "total_transactions": len(parsed_txns),
-        "date_range": date_range,
-        "amount_statistics": amount_stats,
-        "by_transaction_type": type_breakdown,
-        "by_payment_mode": mode_breakdown,
-        "monthly_breakdown": monthly_breakdown,
-        "balance_statistics": balance_stats,
-        "notable_large_transactions": large_transactions
-    }
-
-
-def analyze_behavioral_patterns(all_transactions: list) -> dict:
-    """Analyze behavioral patterns across all transactions."""
-    if not all_transactions:
-        return {"message": "No transactions to analyze"}
-
-    parsed = []
-    for txn in all_transactions:
-        ts = parse_date(txn.get("transactionTimestamp", ""))
-        if ts:
-            parsed.append({
-                "timestamp": ts,
-                "amount": safe_float(txn.get("amount", 0)),
-                "mode": txn.get("mode"),
-                "type": txn.get("type"),
-                "narration": txn.get("narration"),
-                "weekday": ts.weekday(),
-                "hour": ts.hour,
-                "day_of_month": ts.day
-            })
-
-    if not parsed:
-        return {"message": "Could not parse transactions"}
-
-    # Day of week patterns
-    weekday_counts = defaultdict(int)
-    weekday_amounts = defaultdict(float)
-    weekday_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-    for t in parsed:
-        weekday_counts[t["weekday"]] += 1
-        weekday_amounts[t["weekday"]] += t["amount"]
-
-    most_active_day = max(weekday_counts, key=weekday_counts.get) if weekday_counts else 0
-
-    # Hour patterns
-    hour_counts = defaultdict(int)
-    for t in parsed:
-        hour_counts[t["hour"]] += 1
-
-    peak_hours = sorted(hour_counts.items(), key=lambda x: -x[1])[:3]
-
-    # Day of month patterns (for recurring payments detection)
-    day_counts = defaultdict(int)
-    for t in parsed:
-        day_counts[t["day_of_month"]] += 1
-
-    frequent_days = [day for day, count in day_counts.items() if count >= 3]
-
-    narration_data = defaultdict(int)
-    narration_amount_data = defaultdict(int)
-    # Payment mode preferences
-    mode_counts = defaultdict(int)
-    for t in parsed:
-        mode_counts[t["mode"]] += 1
-
-    for t in parsed:
-        narration = t["narration"]
-        amount = t["amount"]
-        if(narration):
-            data = narration.split("/")
-            key = " - ".join(data[2:-2])
-            narration_data[key] += 1
-            narration_amount_data[key] += amount
-
-    total_txns = len(parsed)
-    preferred_mode = max(mode_counts, key=mode_counts.get) if mode_counts else "UNKNOWN"
-    mode_percentages = {
-        mode: round((count / total_txns) * 100, 1)
-        for mode, count in mode_counts.items()
-    }
-
-    return {
-        "most_active_weekday": weekday_names[most_active_day],
-        "weekday_distribution": {
-            weekday_names[i]: {"count": weekday_counts[i], "total_amount": round(weekday_amounts[i], 2)}
-            for i in range(7)
-        },
-        "peak_transaction_hours": [{"hour": h, "count": c} for h, c in peak_hours],
-        "recurring_payment_days": sorted(frequent_days),
-        "preferred_payment_mode": preferred_mode,
-        "payment_mode_distribution": mode_percentages,
-        "total_analyzed_transactions": total_txns,
-        "receipent_count_data": narration_data,
-        "receipent_amount_data": narration_amount_data
-    }
+def data_as_of(aa_data: dict) -> str | None:
+    """End date of the fetched data range ("YYYY-MM-DD"), or None when the payload does not say."""
+    return aa_data.get("dataRange", {}).get("to", "")[:10] or None
 
 
 def generate_aggregate_insights(accounts: list) -> dict:
@@ -507,6 +354,48 @@ def generate_personalization_context(summary: dict) -> dict:
         context["conversation_hints"].append("Balance trend is negative - user might benefit from budgeting tips")
         context["recommended_topics"].append("expense_management")
 
+    # Recent cash flow from the rolling windows
+    windows = patterns.get("rolling_windows", {})
+    if windows:
+        context["financial_snapshot"]["recent_cash_flow"] = {
+            name: {"inflow": w["inflow"], "outflow": w["outflow"], "net": w["net"]}
+            for name, w in windows.items()
+        }
+        last_30 = windows.get("last_30_days", {})
+        if last_30.get("net", 0) < 0 and last_30.get("inflow", 0) > 0:
+            context["conversation_hints"].append(
+                f"Spent more than received in the last 30 days (₹{last_30['outflow']:,.0f} out vs ₹{last_30['inflow']:,.0f} in)"
+            )
+            if "expense_management" not in context["recommended_topics"]:
+                context["recommended_topics"].append("expense_management")
+
+    # Recurring payments (EMIs, SIPs, rent, subscriptions) and recurring income
+    recurring = [s for s in patterns.get("recurring_payments", []) if s["active"]]
+    commitments = [s for s in recurring if s["type"] not in CREDIT_TYPES]
+    income = [s for s in recurring if s["type"] in CREDIT_TYPES]
+    if commitments:
+        monthly_outflow = sum(s["monthly_equivalent"] for s in commitments)
+        context["financial_snapshot"]["monthly_recurring_outflow"] = round(monthly_outflow, 2)
+        context["financial_snapshot"]["recurring_commitments"] = [
+            {
+                "counterparty": s["counterparty"],
+                "frequency": s["frequency"],
+                "amount": s["expected_amount"],
+                "next_expected_date": s["next_expected_date"]
+            }
+            for s in commitments[:5]
+        ]
+        context["conversation_hints"].append(
+            f"{len(commitments)} recurring payment(s) such as EMIs, SIPs or subscriptions, about ₹{monthly_outflow:,.0f}/month"
+        )
+        context["recommended_topics"].append("recurring_commitments_review")
+    if income:
+        context["financial_snapshot"]["recurring_income"] = [
+            {"counterparty": s["counterparty"], "frequency": s["frequency"], "amount": s["expected_amount"]}
+            for s in income[:3]
+        ]
+        context["conversation_hints"].append(f"Regular income detected from {income[0]['counterparty']}")
+
     # Topics to potentially avoid (sensitive areas)
     if health.get("risk_indicators"):
         context["avoid_topics"].append("aggressive_investments")
@@ -514,58 +403,46 @@ def generate_personalization_context(summary: dict) -> dict:
     return context
 
 
-# Utility functions
-def parse_date(date_str: str) -> datetime | None:
-    """Parse various date formats."""
-    if not date_str:
-        return None
+def _transaction_lists(deps: dict) -> list:
+    return [account.get("transactions", {}).get("transaction", []) for account, _, _ in deps["account_entries"]]
+
+
+def _parse_store(deps: dict) -> TransactionStore:
+    # Parse every transaction once; per-account analysis and behavioral patterns share it
+    return TransactionStore.from_transaction_lists(deps["transaction_lists"])
 
-    formats = [
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-        "%Y-%m-%dT%H:%M:%S%z",
-        "%Y-%m-%dT%H:%M:%S+00:00",
-        "%Y-%m-%d",
+
+def _analyze_accounts(deps: dict) -> list:
+    return [
+        analyze_account(account, account_type, fip_id, analyze_transactions(columns, deps["granularity"]))
+        for (account, account_type, fip_id), columns in zip(deps["account_entries"], deps["store"].accounts)
     ]
 
-    # Handle timezone offset format like +00:00
-    if "+" in date_str and date_str.count(":") >= 2:
-        # Remove colon from timezone
-        parts = date_str.rsplit("+", 1)
-        if len(parts) == 2 and ":" in parts[1]:
-            tz_part = parts[1].replace(":", "")
-            date_str = parts[0] + "+" + tz_part
-
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str.replace("Z", "+0000"), fmt.replace("Z", "%z"))
-        except ValueError:
-            continue
-
-    # Fallback: try parsing just the date part
-    try:
-        return datetime.fromisoformat(date_str[:19])
-    except ValueError:
-        return None
-
-
-def safe_float(value: Any) -> float:
-    """Safely convert to float."""
-    if value is None:
-        return 0.0
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return 0.0
-
-
-def safe_int(value: Any) -> int:
-    """Safely convert to int."""
-    if value is None:
-        return 0
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        return 0
+
+# Section name -> (dependencies, fn(deps)). Health and personalization read
+# their dependencies as a partial summary, so they declare exactly the
+# summary keys they use.
+ANALYSIS_NODES = {
+    "account_entries": (("aa_data",), lambda deps: list(iter_accounts(deps["aa_data"]))),
+    # FI transaction lists or fi_records batches, one per account entry
+    "transaction_lists": (("account_entries",), _transaction_lists),
+    "store": (("transaction_lists",), _parse_store),
+    "data_overview": (("aa_data",), lambda deps: extract_data_overview(deps["aa_data"])),
+    "accounts": (("account_entries", "store", "granularity"), _analyze_accounts),
+    "behavioral_patterns": (
+        ("aa_data", "store"),
+        lambda deps: analyze_behavioral_patterns(deps["store"].timeline, data_as_of(deps["aa_data"]))
+    ),
+    "aggregated_insights": (("accounts",), lambda deps: generate_aggregate_insights(deps["accounts"])),
+    "financial_health_indicators": (
+        ("aggregated_insights", "behavioral_patterns", "accounts"),
+        calculate_financial_health
+    ),
+    "personalization_context": (
+        ("accounts", "aggregated_insights", "behavioral_patterns", "financial_health_indicators"),
+        generate_personalization_context
+    ),
+}
 
 
 def get_summary_for_llm(aa_data: dict | str) -> str:
@@ -573,7 +450,7 @@ def get_summary_for_llm(aa_data: dict | str) -> str:
     Convenience function that returns a formatted string summary
     ready to be injected into an LLM prompt.
     """
-    analysis = analyze_financial_data(aa_data)
+    analysis = analyze_financial_data(aa_data, sections=("personalization_context",))
 
     # Create a condensed, LLM-friendly summary
     context = analysis["personalization_context"]
@@ -601,6 +478,19 @@ def get_summary_for_llm(aa_data: dict | str) -> str:
         for mat in snapshot["upcoming_maturities"]:
             lines.append(f"  • {mat['type']}: ₹{mat.get('amount', 0):,.2f} in {mat['days_remaining']} days")
 
+    if snapshot.get("recent_cash_flow"):
+        lines.append("\nRecent Cash Flow:")
+        for name, flow in snapshot["recent_cash_flow"].items():
+            label = name.replace("_", " ").capitalize()
+            lines.append(f"  • {label}: ₹{flow['inflow']:,.2f} in, ₹{flow['outflow']:,.2f} out")
+
+    if snapshot.get("recurring_commitments"):
+        lines.append("\nRecurring Payments:")
+        for rec in snapshot["recurring_commitments"]:
+            lines.append(
+                f"  • {rec['counterparty']}: ₹{rec['amount']:,.2f} {rec['frequency']}, next around {rec['next_expected_date']}"
+            )
+
     lines.append("\n=== END CONTEXT ===")
 
     return "\n".join(lines)
@@ -608,8 +498,14 @@ def get_summary_for_llm(aa_data: dict | str) -> str:
 
 # Example usage and testing
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        # Bulk mode: python -m functions.finance_analyzer <dir | file.ndjson | -> [options]
+        from functions.bulk_analyzer import main
+        sys.exit(main(sys.argv[1:]))
 
-    print("Usage: python financial_analyzer.py <path_to_aa_data.json>")
+    print("Usage: python -m functions.finance_analyzer <dir | file.ndjson | -> [-o out.ndjson] [--workers N]")
     print("\nRunning with sample test...")
 
 
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from config.global_logger import get_logger
+from functions.history_window import HISTORY_TAIL_MESSAGES
+
+logger = get_logger(__name__)
+
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bounds how long a history written by another worker can go unseen
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "900"))
+
+# Rough per-message cost of the dicts and lists around the text
+_MESSAGE_OVERHEAD_BYTES = 200
+
+
+def to_history_message(message: dict) -> dict:
+    """A messages row (or add_turn message) in Gemini's {role, parts} shape."""
+    return {"role": message['role'], "parts": [message['content']]}
+
+
+def _size(history: list) -> int:
+    return sum(len(part.encode()) + _MESSAGE_OVERHEAD_BYTES for message in history for part in message["parts"])
+
+
+class HistoryEntry:
+    __slots__ = ("history", "size", "summary", "complete", "stored_at")
+
+    def __init__(self, history: list, size: int, summary: str | None = None, complete: bool = False):
+        self.history = history
+        self.size = size
+        self.summary = summary
+        # The history starts at the conversation's first message
+        self.complete = complete
+        self.stored_at = time.monotonic()
+
+
+class HistoryCache:
+    """
+    LRU of recent conversation histories in the {role, parts} shape persona
+    chat sends to Gemini, bounded by the approximate bytes they hold.
+
+    Warmed from the database on a miss (`put`) and extended in place after
+    each persisted turn (`append`), so a conversation that stays hot costs
+    no reads per turn. A cached entry also means the conversation exists.
+    Entries older than `ttl_seconds` are reloaded, which bounds staleness
+    when another worker wrote to the same conversation. Only the latest
+    `max_messages` of each history are kept, the tail persona chat reads,
+    along with the conversation's running summary of older turns and
+    whether the history still reaches back to the first message.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = HISTORY_CACHE_MAX_BYTES,
+        ttl_seconds: float = HISTORY_CACHE_TTL_SECONDS,
+        max_messages: int = HISTORY_TAIL_MESSAGES
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._entries: OrderedDict[str, HistoryEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conversation_id: str) -> list | None:
+        """A copy of the cached history, safe for the caller to extend."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or time.monotonic() - entry.stored_at > self.ttl_seconds:
+                if entry is not None:
+                    self._remove(conversation_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return list(entry.history)
+
+    def get_summary(self, conversation_id: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return entry.summary if entry is not None else None
+
+    def is_complete(self, conversation_id: str) -> bool:
+        """True when the cached history holds the whole conversation, not just its tail."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return entry is not None and entry.complete
+
+    def put(self, conversation_id: str, history: list, summary: str | None = None, complete: bool = False):
+        """Cache a history; `complete` when it starts at the conversation's first message."""
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+            complete = complete and len(history) <= self.max_messages
+            history = history[-self.max_messages:]
+            entry = HistoryEntry(list(history), _size(history) + len((summary or "").encode()), summary, complete)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[conversation_id] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, conversation_id: str, messages: list):
+        """Extend a cached history with newly written messages; no-op when it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            entry.history.extend(messages)
+            dropped = entry.history[:-self.max_messages]
+            del entry.history[:-self.max_messages]
+            if dropped:
+                entry.complete = False
+            delta = _size(messages) - _size(dropped)
+            entry.size += delta
+            self._bytes += delta
+            self._entries.move_to_end(conversation_id)
+            if entry.size > self.max_bytes:
+                self._remove(conversation_id)
+            self._evict()
+
+    def set_summary(self, conversation_id: str, summary: str):
+        """Replace a cached conversation's summary; no-op when it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            delta = len(summary.encode()) - len((entry.summary or "").encode())
+            entry.summary = summary
+            entry.size += delta
+            self._bytes += delta
+            self._evict()
+
+    def invalidate(self, conversation_id: str):
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+
+    def _remove(self, conversation_id: str):
+        self._bytes -= self._entries.pop(conversation_id).size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Global history cache instance
+_history_cache = None
+
+
+def get_history_cache() -> HistoryCache:
+    global _history_cache
+    if _history_cache is None:
+        _history_cache = HistoryCache()
+    return _history_cache
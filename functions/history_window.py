@@ -0,0 +1,69 @@
+import os
+
+# Tokens of past conversation sent with each persona chat turn
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+# Latest turns (user message + reply) always sent, even past the budget
+HISTORY_MIN_TURNS = int(os.getenv("HISTORY_MIN_TURNS", "3"))
+# Longest single message sent; longer ones are cut to their start and end
+HISTORY_MESSAGE_TOKEN_CAP = int(os.getenv("HISTORY_MESSAGE_TOKEN_CAP", "2000"))
+# Messages read from the database per turn; enough to fill any window
+HISTORY_TAIL_MESSAGES = int(os.getenv("HISTORY_TAIL_MESSAGES", "100"))
+
+# Gemini averages about four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+_ELISION = "\n[...]\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _capped(message: dict, cap: int) -> dict:
+    parts = message["parts"]
+    text = "".join(parts)
+    if estimate_tokens(text) <= cap:
+        return message
+    keep = max(cap * CHARS_PER_TOKEN - len(_ELISION), 0)
+    head = keep // 2
+    return {"role": message["role"], "parts": [text[:head] + _ELISION + text[len(text) - (keep - head):]]}
+
+
+def select_history_window(
+    history: list,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    min_turns: int = HISTORY_MIN_TURNS,
+    message_cap: int = HISTORY_MESSAGE_TOKEN_CAP
+) -> list:
+    """
+    The tail of a {role, parts} history to send to Gemini.
+
+    Walks back from the newest message, keeping every message of the last
+    `min_turns` turns and then older ones while the total stays within
+    `token_budget`; everything before the first message that does not fit
+    is dropped. Each message is capped at `message_cap` tokens, so the
+    window never exceeds roughly max(token_budget, 2 * min_turns * message_cap)
+    however long the conversation is. The window starts at a user message.
+    """
+    window = []
+    used = 0
+    turns = 0
+    for message in reversed(history):
+        message = _capped(message, message_cap)
+        tokens = estimate_tokens("".join(message["parts"]))
+        if turns >= min_turns and used + tokens > token_budget:
+            break
+        window.append(message)
+        used += tokens
+        if message["role"] == "user":
+            turns += 1
+
+    window.reverse()
+    # A window cut mid-turn would open with the reply to a message Gemini never sees
+    while window and window[0]["role"] != "user":
+        window.pop(0)
+    return window
+
+
+def window_tokens(history: list) -> int:
+    return sum(estimate_tokens("".join(message["parts"])) for message in history)
@@ -1,9 +1,11 @@
 from constants.mentor_message import mentor_prompt
 from toon import encode
+from functions.profiling import stage
 
 
 def get_system_prompt(financial_summary: dict) -> str:
-    data = encode(financial_summary)
+    with stage("toon.encode"):
+        data = encode(financial_summary)
     return mentor_prompt.format(
         financial_data=data
     )
@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any
+import numpy as np
+
+# Offset stored for timestamps that carry no timezone (e.g. plain dates)
+NAIVE_OFFSET = np.iinfo(np.int32).min
+
+# Layout written by fi_records._format_ts: 2024-01-31T09:15:00+00:00
+_FIXED_LAYOUT_LEN = 25
+_FIXED_LAYOUT_SEPARATORS = {4: "-", 7: "-", 10: "T", 13: ":", 16: ":", 22: ":"}
+_FIXED_LAYOUT_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 23, 24]
+
+_DATE_CACHE_SIZE = 16384
+
+
+def _strptime_parser(fmt: str):
+    def parse(date_str: str) -> datetime:
+        return datetime.strptime(date_str.replace("Z", "+0000"), fmt)
+    return parse
+
+
+# Tried after the fixed layout misses; the formats are mutually exclusive, so
+# the last one that matched can safely be tried first next time
+_DATE_PARSERS = [
+    _strptime_parser("%Y-%m-%dT%H:%M:%S.%f%z"),
+    _strptime_parser("%Y-%m-%dT%H:%M:%S%z"),
+    _strptime_parser("%Y-%m-%d"),
+]
+_last_parser = 0
+
+
+def parse_date(date_str: str) -> datetime | None:
+    """Parse various date formats. Repeated strings are served from a bounded memo."""
+    if not date_str:
+        return None
+    return _parse_date_cached(date_str)
+
+
+@lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _parse_date_cached(date_str: str) -> datetime | None:
+    if _is_fixed_layout(date_str):
+        try:
+            return datetime.fromisoformat(date_str)
+        except ValueError:
+            pass
+    return _parse_by_format(date_str)
+
+
+def _is_fixed_layout(date_str: str) -> bool:
+    return (
+        len(date_str) == _FIXED_LAYOUT_LEN
+        and date_str[10] == "T"
+        and date_str[19] in "+-"
+    )
+
+
+def _parse_by_format(date_str: str) -> datetime | None:
+    global _last_parser
+
+    order = [_last_parser] + [i for i in range(len(_DATE_PARSERS)) if i != _last_parser]
+    for i in order:
+        try:
+            parsed = _DATE_PARSERS[i](date_str)
+        except ValueError:
+            continue
+        _last_parser = i
+        return parsed
+
+    # Fallback: try parsing just the date part
+    try:
+        return datetime.fromisoformat(date_str[:19])
+    except ValueError:
+        return None
+
+
+def parse_timestamp_column(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a whole column of timestamp strings at once.
+
+    Returns the wall-clock times as datetime64[us] (NaT where a value could
+    not be parsed) and each value's UTC offset in minutes (NAIVE_OFFSET when
+    the value has no timezone). Values in fi_data's fixed
+    `%Y-%m-%dT%H:%M:%S+HH:MM` layout are decoded with array arithmetic on
+    their code points; anything else falls back to parse_date.
+    """
+    n = len(values)
+    wall = np.full(n, np.datetime64("NaT", "us"))
+    offset = np.full(n, NAIVE_OFFSET, dtype=np.int32)
+    if not n:
+        return wall, offset
+
+    text = np.array([v if isinstance(v, str) else "" for v in values])
+    fast = np.zeros(n, dtype=bool)
+    width = text.dtype.itemsize // 4
+
+    if width >= _FIXED_LAYOUT_LEN:
+        codes = text.view(np.uint32).reshape(n, width)
+        fast = codes[:, _FIXED_LAYOUT_LEN - 1] != 0
+        if width > _FIXED_LAYOUT_LEN:
+            fast &= codes[:, _FIXED_LAYOUT_LEN] == 0
+        for pos, sep in _FIXED_LAYOUT_SEPARATORS.items():
+            fast &= codes[:, pos] == ord(sep)
+        sign_code = codes[:, 19]
+        fast &= (sign_code == ord("+")) | (sign_code == ord("-"))
+        digits = codes[:, _FIXED_LAYOUT_DIGITS].astype(np.int64) - ord("0")
+        fast &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+        rows = np.flatnonzero(fast)
+        d = digits[rows]
+        year = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+        month, day = d[:, 4] * 10 + d[:, 5], d[:, 6] * 10 + d[:, 7]
+        hour, minute, second = d[:, 8] * 10 + d[:, 9], d[:, 10] * 10 + d[:, 11], d[:, 12] * 10 + d[:, 13]
+        off_hour, off_minute = d[:, 14] * 10 + d[:, 15], d[:, 16] * 10 + d[:, 17]
+
+        months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+        days = months.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+        valid = (
+            (month >= 1) & (month <= 12) & (day >= 1)
+            & (days.astype("datetime64[M]") == months)
+            & (hour < 24) & (minute < 60) & (second < 60)
+            & (off_hour < 24) & (off_minute < 60)
+        )
+        rows, days = rows[valid], days[valid]
+        seconds = ((hour * 60 + minute) * 60 + second)[valid]
+        sign = np.where(sign_code[rows] == ord("-"), -1, 1)
+
+        wall[rows] = days.astype("datetime64[us]") + (seconds * 1_000_000).astype("timedelta64[us]")
+        offset[rows] = sign * (off_hour * 60 + off_minute)[valid]
+        fast[:] = False
+        fast[rows] = True
+
+    for i in np.flatnonzero(~fast):
+        parsed = parse_date(str(text[i]))
+        if parsed:
+            wall[i] = np.datetime64(parsed.replace(tzinfo=None), "us")
+            utc_offset = parsed.utcoffset()
+            if utc_offset is not None:
+                offset[i] = utc_offset // timedelta(minutes=1)
+
+    return wall, offset
+
+
+def parse_datetime64(values: list) -> np.ndarray:
+    """Parse a column of timestamp strings into UTC datetime64[us]; naive values are taken as UTC."""
+    wall, offset = parse_timestamp_column(values)
+    minutes = np.where(offset == NAIVE_OFFSET, 0, offset).astype("timedelta64[m]")
+    return wall - minutes
+
+
+def to_datetime(wall: np.datetime64, offset: int) -> datetime:
+    """Rebuild the datetime parse_date would have returned from a parsed column value."""
+    parsed = wall.astype("datetime64[us]").item()
+    if offset == NAIVE_OFFSET:
+        return parsed
+    tz = timezone.utc if offset == 0 else timezone(timedelta(minutes=int(offset)))
+    return parsed.replace(tzinfo=tz)
+
+
+def safe_float(value: Any) -> float:
+    """Safely convert to float."""
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def safe_int(value: Any) -> int:
+    """Safely convert to int."""
+    if value is None:
+        return 0
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
@@ -0,0 +1,246 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from config.global_logger import get_logger
+
+logger = get_logger(__name__)
+
+# Profiling is off unless PROFILE_STAGES is set or a request sends PROFILE_HEADER: 1
+PROFILE_STAGES = os.getenv("PROFILE_STAGES", "0").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "X-Profile-Stages"
+# Share of requests run under cProfile; their stats are dumped when slower than PROFILE_SLOW_MS
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is unbounded
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+# cProfile is process-wide and exclusive (a second enable raises), so one sample runs at a time
+_sampling = threading.Lock()
+
+
+class Histogram:
+    """Bucketed latency distribution with count, sum and max."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        i = 0
+        while i < len(BUCKET_BOUNDS_MS) and value_ms > BUCKET_BOUNDS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (max for the open bucket)."""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return float(BUCKET_BOUNDS_MS[i]) if i < len(BUCKET_BOUNDS_MS) else self.max
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 2),
+            "buckets": {
+                f"le_{bound}" if i < len(BUCKET_BOUNDS_MS) else "inf": n
+                for i, (bound, n) in enumerate(zip((*BUCKET_BOUNDS_MS, None), self.buckets))
+            }
+        }
+
+
+class StageHistograms:
+    """In-process wall and CPU histograms per stage path (e.g. "analysis/analyze/accounts")."""
+
+    def __init__(self):
+        self._wall: dict[str, Histogram] = {}
+        self._cpu: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, wall_ms: float, cpu_ms: float):
+        with self._lock:
+            self._wall.setdefault(stage, Histogram()).observe(wall_ms)
+            self._cpu.setdefault(stage, Histogram()).observe(cpu_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"wall": wall.to_dict(), "cpu": self._cpu[stage].to_dict()}
+                for stage, wall in sorted(self._wall.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._wall.clear()
+            self._cpu.clear()
+
+
+class RequestProfile:
+    """Stages timed during one request, as (path, wall_ms, cpu_ms) in completion order."""
+
+    __slots__ = ("request_id", "stages", "_stack")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.stages: list[tuple[str, float, float]] = []
+        self._stack: list[str] = []
+
+    def server_timing(self) -> str:
+        """Server-Timing header value with each top-level stage's wall time."""
+        return ", ".join(
+            f'{path.replace("/", ".")};dur={wall_ms:.1f}'
+            for path, wall_ms, _ in self.stages
+            if "/" not in path
+        )
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as `name` under the active request profile.
+
+    Stages nest: a stage opened inside another is recorded as
+    "outer/inner". CPU time is the calling thread's, so it excludes time
+    spent waiting on the network; around an await it also counts other
+    requests the event loop ran meanwhile. Without an active profile this
+    is a no-op.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+
+    profile._stack.append(name)
+    path = "/".join(profile._stack)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall_ms = (time.perf_counter() - wall) * 1000
+        cpu_ms = (time.thread_time() - cpu) * 1000
+        profile._stack.pop()
+        profile.stages.append((path, wall_ms, cpu_ms))
+        get_stage_histograms().observe(path, wall_ms, cpu_ms)
+
+
+def profiling_requested(header_value: str | None) -> bool:
+    return PROFILE_STAGES or (header_value or "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_request(request_id: str, enabled: bool):
+    """
+    Activate stage profiling for the request running inside the block.
+
+    A PROFILE_SAMPLE_RATE share of requests also runs under cProfile; the
+    stats are written to PROFILE_DIR/<request_id>.pstats when the request
+    took longer than PROFILE_SLOW_MS. The sample covers the whole process
+    for the request's duration, every thread included, so other requests
+    running meanwhile appear in the dump too; the stage breakdown is the
+    per-request view. A request picked while another sample is running is
+    not sampled. A streamed response's body runs after the handler returns;
+    keep the profile open over it with `close_after_body`.
+    """
+    sampled = (
+        PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+        and _sampling.acquire(blocking=False)
+    )
+    if not enabled and not sampled:
+        yield None
+        return
+
+    profile = RequestProfile(request_id)
+    token = _current.set(profile)
+    profiler = cProfile.Profile() if sampled else None
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) holds the profiler hook
+            profiler = None
+            _sampling.release()
+    started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _sampling.release()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. a streamed body finalized after a disconnect
+            pass
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if profile.stages:
+            breakdown = " | ".join(f"{path}: {wall:.1f}ms wall, {cpu:.1f}ms cpu" for path, wall, cpu in profile.stages)
+            logger.info(
+                f"Stage profile | {breakdown} | Request ID: {request_id}",
+                extra={"request_id": request_id, "duration_ms": duration_ms}
+            )
+        if profiler is not None and duration_ms >= PROFILE_SLOW_MS:
+            _dump_stats(profiler, request_id, duration_ms)
+
+
+def _dump_stats(profiler: cProfile.Profile, request_id: str, duration_ms: float):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{request_id}.pstats")
+        profiler.dump_stats(path)
+        logger.info(f"Slow request profile written | Duration: {duration_ms:.2f}ms | Path: {path} | Request ID: {request_id}")
+    except OSError as e:
+        logger.warning(f"Could not write request profile | Request ID: {request_id} | Error: {e}")
+
+
+# Global stage histograms instance
+_stage_histograms = None
+
+
+def get_stage_histograms() -> StageHistograms:
+    global _stage_histograms
+    if _stage_histograms is None:
+        _stage_histograms = StageHistograms()
+    return _stage_histograms
+
+
+def is_streamed(response) -> bool:
+    """True for responses whose body is generated after the headers go out (SSE)."""
+    return response.headers.get("content-type", "").startswith("text/event-stream")
+
+
+async def close_after_body(body, profiling: ExitStack):
+    """
+    Pass a streamed response body through, closing `profiling` once it ends.
+
+    Stages timed while the body streams (generation, saving) land in the
+    request profile, log and sample; they cannot reach Server-Timing, which
+    was sent with the headers.
+    """
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        profiling.close()
@@ -0,0 +1,179 @@
+import math
+from datetime import date
+import numpy as np
+from functions.parsing import to_datetime
+from functions.transaction_columns import TransactionColumns
+
+# Interval classes in days; intervals outside every class count as irregular
+PERIODS = (("weekly", 5, 9), ("monthly", 25, 36), ("quarterly", 80, 100))
+MIN_OCCURRENCES = 4
+# Share of a series' intervals that must fall in its dominant class (allows a skipped month or two)
+MIN_REGULARITY = 0.7
+# Amounts within the same x1.2 log band belong to one series
+AMOUNT_BAND_RATIO = 1.2
+# Series kept per aggregate; beyond this the least likely to recur are dropped
+MAX_SERIES = 5000
+
+_CLASSES = len(PERIODS) + 1
+_BANDS = 256
+_BAND_OFFSET = 64
+_US_PER_DAY = 86_400_000_000
+# Occurrences per month, for the monthly-equivalent amount
+_PER_MONTH = {"weekly": 52 / 12, "monthly": 1.0, "quarterly": 1 / 3}
+
+
+def amount_band(amounts: np.ndarray) -> np.ndarray:
+    """Log-scale amount band in [0, 256), so 1,000 and 1,100 share a band but 1,000 and 2,000 do not."""
+    bands = np.floor(np.log(np.maximum(amounts, 0.01)) / math.log(AMOUNT_BAND_RATIO)).astype(np.int64)
+    return np.clip(bands + _BAND_OFFSET, 0, _BANDS - 1)
+
+
+def interval_class(days: np.ndarray) -> np.ndarray:
+    """Index into PERIODS for each interval, len(PERIODS) for irregular ones."""
+    conditions = [(days >= low) & (days <= high) for _, low, high in PERIODS]
+    return np.select(conditions, list(range(len(PERIODS))), len(PERIODS))
+
+
+def fold_series(series: dict, cols: TransactionColumns):
+    """
+    Add a batch of timestamp-ordered transactions to `series`.
+
+    A series is one (amount band, type, counterparty) and is stored as
+    [count, first_us, last_us, last_wall_us, last_utc_offset, last_amount,
+    amount_sum, interval_counts, interval_days], the last two holding the
+    number and summed length of intervals per class. Rows are grouped with
+    one sort, so a batch costs O(n log n); the state is keyed by string and
+    merges across batches and accounts with `merge_series`.
+    """
+    named = np.array([bool(label) for label in cols.recipients], dtype=bool)
+    rows = np.flatnonzero(named[cols.recipient_code]) if len(cols) else np.empty(0, dtype=np.intp)
+    if not len(rows):
+        return
+
+    keys = (cols.recipient_code[rows] * len(cols.types) + cols.type_code[rows]) * _BANDS
+    keys += amount_band(cols.amount[rows])
+    distinct, group = np.unique(keys, return_inverse=True)
+    order = np.argsort(group, kind="stable")  # rows within a series stay in timestamp order
+    rows, group = rows[order], group[order]
+    epoch = cols.epoch_us[rows]
+
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+    same = group[1:] == group[:-1]
+    days = (epoch[1:] - epoch[:-1])[same] / _US_PER_DAY
+    slots = group[1:][same] * _CLASSES + interval_class(days)
+    class_counts = np.bincount(slots, minlength=len(distinct) * _CLASSES).reshape(-1, _CLASSES)
+    class_days = np.bincount(slots, weights=days, minlength=len(distinct) * _CLASSES).reshape(-1, _CLASSES)
+    amount_sums = np.add.reduceat(cols.amount[rows], starts)
+
+    first, last = rows[starts], rows[ends]
+    entries = zip(
+        (ends - starts + 1).tolist(), cols.epoch_us[first].tolist(), cols.epoch_us[last].tolist(),
+        cols.wall[last].astype(np.int64).tolist(), cols.utc_offset[last].tolist(), cols.amount[last].tolist(),
+        amount_sums.tolist(), class_counts.tolist(), class_days.tolist()
+    )
+    bands = (distinct % _BANDS).tolist()
+    type_codes, recipient_codes = cols.type_code[first].tolist(), cols.recipient_code[first].tolist()
+    for band, type_code, recipient_code, entry in zip(bands, type_codes, recipient_codes, entries):
+        _merge_entry(series, f"{band}|{cols.types[type_code]}|{cols.recipients[recipient_code]}", list(entry))
+
+
+def merge_series(series: dict, other: dict):
+    """Combine series built from another batch or account into `series`."""
+    for key, entry in other.items():
+        _merge_entry(series, key, [*entry[:7], list(entry[7]), list(entry[8])])
+
+
+def prune_series(series: dict, limit: int = MAX_SERIES):
+    """
+    Cap `series` at `limit` entries.
+
+    Series that can still be reported (MIN_OCCURRENCES reached, or seen
+    within the longest period of the newest occurrence) are kept first,
+    then by count and recency. Under the limit nothing is dropped; above
+    it a dropped series that recurs later starts again from zero.
+    """
+    if len(series) <= limit:
+        return
+    newest = max(entry[2] for entry in series.values())
+    horizon = newest - PERIODS[-1][2] * _US_PER_DAY
+    ranked = sorted(
+        series,
+        key=lambda k: (series[k][0] >= MIN_OCCURRENCES or series[k][2] >= horizon, series[k][0], series[k][2]),
+        reverse=True
+    )
+    for key in ranked[limit:]:
+        del series[key]
+
+
+def _merge_entry(series: dict, key: str, entry: list):
+    mine = series.get(key)
+    if mine is None:
+        series[key] = entry
+        return
+
+    # The gap between the two runs is one more interval of the series
+    if entry[1] >= mine[2]:
+        gap = (entry[1] - mine[2]) / _US_PER_DAY
+    elif mine[1] >= entry[2]:
+        gap = (mine[1] - entry[2]) / _US_PER_DAY
+    else:
+        gap = None
+    if gap is not None:
+        c = int(interval_class(np.array([gap]))[0])
+        mine[7][c] += 1
+        mine[8][c] += gap
+
+    mine[0] += entry[0]
+    if entry[2] >= mine[2]:
+        mine[2:6] = entry[2:6]
+    mine[1] = min(mine[1], entry[1])
+    mine[6] += entry[6]
+    for c in range(_CLASSES):
+        mine[7][c] += entry[7][c]
+        mine[8][c] += entry[8][c]
+
+
+def detect_recurring(series: dict, latest_us: int | None = None) -> list[dict]:
+    """
+    Series whose intervals are regular enough to call recurring.
+
+    A series qualifies with at least MIN_OCCURRENCES rows and at least
+    MIN_REGULARITY of its intervals in one of PERIODS. It is `active` when
+    its next occurrence is not overdue by more than that period's upper
+    bound relative to `latest_us`, the newest transaction seen. Results are
+    ordered active first, then by monthly-equivalent amount.
+    """
+    found = []
+    for key, entry in series.items():
+        count, _, last_us, last_wall, last_offset, last_amount, amount_sum, class_counts, class_days = entry
+        if count < MIN_OCCURRENCES:
+            continue
+        period = max(range(len(PERIODS)), key=lambda c: class_counts[c])
+        regularity = class_counts[period] / (count - 1)
+        if regularity < MIN_REGULARITY:
+            continue
+
+        name, _, high = PERIODS[period]
+        interval = class_days[period] / class_counts[period]
+        last_date = to_datetime(np.datetime64(last_wall, "us"), last_offset)
+        next_date = to_datetime(np.datetime64(last_wall + round(interval * _US_PER_DAY), "us"), last_offset)
+        _, txn_type, counterparty = key.split("|", 2)
+        found.append({
+            "counterparty": counterparty,
+            "type": txn_type,
+            "frequency": name,
+            "occurrences": count,
+            "average_interval_days": round(interval, 1),
+            "regularity": round(regularity, 2),
+            "average_amount": round(amount_sum / count, 2),
+            "last_date": last_date.date().isoformat(),
+            "next_expected_date": next_date.date().isoformat(),
+            "expected_amount": round(last_amount, 2),
+            "monthly_equivalent": round(last_amount * _PER_MONTH[name], 2),
+            "active": latest_us is None or last_us + high * _US_PER_DAY >= latest_us
+        })
+
+    found.sort(key=lambda s: (not s["active"], -s["monthly_equivalent"]))
+    return found
+
@@ -0,0 +1,37 @@
+from typing import Any, Callable, Iterable
+from functions.profiling import stage
+
+
+class SectionGraph:
+    """
+    Named sections with explicit dependencies, evaluated lazily and at most once.
+
+    `nodes` maps a section name to (dependency names, fn); fn receives a dict
+    of its dependencies' values. `values` seeds inputs and sections that were
+    computed elsewhere, which are then never evaluated. Asking for a subset
+    only evaluates the nodes it transitively depends on. Each evaluation is
+    profiled as a stage named after its section, excluding its dependencies.
+    """
+
+    def __init__(self, nodes: dict[str, tuple[tuple[str, ...], Callable[[dict], Any]]], values: dict | None = None):
+        self.nodes = nodes
+        self.values = dict(values or {})
+
+    def get(self, name: str, _visiting: frozenset = frozenset()) -> Any:
+        if name in self.values:
+            return self.values[name]
+        if name not in self.nodes:
+            raise KeyError(f"Unknown section: {name}")
+        if name in _visiting:
+            raise ValueError(f"Dependency cycle at section: {name}")
+
+        deps, fn = self.nodes[name]
+        visiting = _visiting | {name}
+        inputs = {dep: self.get(dep, visiting) for dep in deps}
+        with stage(name):
+            self.values[name] = fn(inputs)
+        return self.values[name]
+
+    def evaluate(self, names: Iterable[str]) -> dict:
+        """Values of `names`, in the order given."""
+        return {name: self.get(name) for name in names}
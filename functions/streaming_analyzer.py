@@ -0,0 +1,95 @@
+import os
+from itertools import islice
+from typing import Iterable, Iterator
+from functions.analysis_state import account_key
+from functions.finance_analyzer import analyze_account, build_summary, data_as_of, iter_accounts
+from functions.transaction_aggregate import TransactionAggregate
+from functions.transaction_columns import TransactionColumns, TransactionStore
+
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "5000"))
+
+
+def iter_chunks(rows: Iterable, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[list]:
+    """Split an iterator into lists of at most `chunk_size` items without materializing it."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def aggregate_transaction_stream(rows: Iterable[dict], chunk_size: int = STREAM_CHUNK_SIZE) -> TransactionAggregate:
+    """
+    Fold an iterator of FI transactions into a TransactionAggregate one chunk at a time.
+
+    Only one chunk is held in memory; mean and standard deviation are kept
+    with Welford updates and the notable large transactions come from a
+    bounded set of largest-amount candidates, and the recipient, series and
+    daily maps are capped (see TransactionAggregate), so peak memory depends
+    on the chunk size and the number of months, not on the number of rows.
+    Rows are expected in timestamp order, as paged reads return them.
+    """
+    aggregate = TransactionAggregate()
+    for chunk in iter_chunks(rows, chunk_size):
+        aggregate.fold(TransactionColumns.from_transactions(chunk))
+    return aggregate
+
+
+def analyze_transactions_stream(rows: Iterable[dict], chunk_size: int = STREAM_CHUNK_SIZE) -> dict:
+    """Streaming counterpart of analyze_transactions."""
+    return aggregate_transaction_stream(rows, chunk_size).transaction_summary()
+
+
+def analyze_behavioral_patterns_stream(
+    rows: Iterable[dict], chunk_size: int = STREAM_CHUNK_SIZE, as_of=None
+) -> dict:
+    """Streaming counterpart of analyze_behavioral_patterns."""
+    return aggregate_transaction_stream(rows, chunk_size).behavioral_patterns(as_of)
+
+
+class StreamingAnalyzer:
+    """
+    Bounded-memory analysis over a user's transactions from several accounts.
+
+    Consumes (account_key, transaction) pairs, e.g. from paged DB reads
+    ordered by timestamp, and keeps one aggregate per account plus one over
+    the whole timeline. `summarize` then renders the analyze_financial_data
+    output for a payload whose accounts carry metadata but need not carry
+    their transactions.
+    """
+
+    def __init__(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.accounts: dict[str, TransactionAggregate] = {}
+        self.timeline = TransactionAggregate()
+
+    def consume(self, rows: Iterable[tuple[str, dict]]) -> "StreamingAnalyzer":
+        for chunk in iter_chunks(rows, self.chunk_size):
+            by_account: dict[str, list] = {}
+            for key, txn in chunk:
+                by_account.setdefault(key, []).append(txn)
+
+            store = TransactionStore.from_transaction_lists(list(by_account.values()))
+            for key, columns in zip(by_account, store.accounts):
+                self.accounts.setdefault(key, TransactionAggregate()).fold(columns)
+            self.timeline.fold(store.timeline)
+        return self
+
+    def summarize(self, aa_data: dict, sections: tuple[str, ...] | None = None, granularity: str = "month") -> dict:
+        accounts = [
+            analyze_account(
+                account, account_type, fip_id,
+                self.accounts.get(account_key(account, fip_id), TransactionAggregate()).transaction_summary(
+                    granularity=granularity
+                )
+            )
+            for account, account_type, fip_id in iter_accounts(aa_data)
+        ]
+        return build_summary(aa_data, accounts, self.timeline.behavioral_patterns(data_as_of(aa_data)), sections)
+
+
+def analyze_financial_data_stream(
+    aa_data: dict,
+    rows: Iterable[tuple[str, dict]],
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> dict:
+    """analyze_financial_data over streamed (account_key, transaction) rows instead of embedded transaction lists."""
+    return StreamingAnalyzer(chunk_size).consume(rows).summarize(aa_data)
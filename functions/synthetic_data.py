@@ -0,0 +1,261 @@
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Ishaan", "Kabir", "Rohan", "Arjun", "Karthik", "Nikhil", "Siddharth",
+    "Ananya", "Diya", "Ishita", "Kavya", "Meera", "Myra", "Priya", "Riya", "Saanvi", "Zara"
+]
+LAST_NAMES = [
+    "Sharma", "Iyer", "Reddy", "Nair", "Patel", "Gupta", "Menon", "Rao", "Shetty", "Kulkarni",
+    "Banerjee", "Chopra", "Desai", "Joshi", "Kapoor", "Mehta", "Pillai", "Singh", "Verma", "Yadav"
+]
+MERCHANTS = [
+    ("SWIGGY", "swiggy@icici"), ("ZOMATO", "zomato@hdfcbank"), ("AMAZON PAY", "amazon@apl"),
+    ("BIGBASKET", "bigbasket@ybl"), ("UBER INDIA", "uber@axisbank"), ("BESCOM", "bescom@sbi"),
+    ("AIRTEL", "airtel@paytm"), ("DMART", "dmart@ybl"), ("RELIANCE JIO", "jio@sbi"), ("IRCTC", "irctc@hdfcbank")
+]
+SUBSCRIPTIONS = [("NETFLIX", "netflix@hdfcbank", 649.0), ("SPOTIFY", "spotify@icici", 119.0)]
+BANK_CODES = ["HDFC", "ICIC", "SBIN", "UTIB", "KKBK", "YESB", "PUNB", "BARB"]
+VPA_HANDLES = ["okhdfcbank", "okicici", "oksbi", "ybl", "paytm", "axl"]
+
+# Share of a savings account's random spends by payment mode
+SAVINGS_MODES = (["UPI", "CARD", "ATM", "FT", "CASH", "OTHERS"], [0.6, 0.15, 0.08, 0.1, 0.04, 0.03])
+DEPOSIT_TYPES = ["INSTALLMENT", "INTEREST", "TDS", "OTHERS"]
+
+
+def generate_fi_data(
+    accounts: int = 1,
+    transactions_per_account: int = 1000,
+    seed: int = 0,
+    start: str = "2021-01-01",
+    end: str = "2025-01-01"
+) -> dict:
+    """
+    Build a synthetic FI_DATA_READY payload in the shape of constants.dummy.sample.
+
+    The first account (and every third after it) is a savings account with
+    salary, rent, SIP and subscription series on fixed days plus random UPI,
+    card, ATM and NEFT spends; the others are recurring deposits with monthly
+    installments. Balances are running balances. Ids come from the same
+    seeded generator, so a seed always yields the same payload.
+    """
+    rng = np.random.default_rng(seed)
+    start_s = _epoch(start)
+    end_s = _epoch(end)
+
+    account_data = []
+    for i in range(accounts):
+        account_type = "savings" if i % 3 == 0 else "recurring_deposit"
+        builder = _savings_transactions if account_type == "savings" else _deposit_transactions
+        transactions = builder(rng, transactions_per_account, start_s, end_s)
+        account_data.append(_account(rng, account_type, transactions, start, end))
+
+    return {
+        "type": "FI_DATA_READY",
+        "status": "COMPLETED",
+        "timestamp": f"{end}T00:00:00.000Z",
+        "consentId": _uuid(rng),
+        "dataSessionId": _uuid(rng),
+        "dataRange": {"from": f"{start}T00:00:00.000Z", "to": f"{end}T00:00:00.000Z"},
+        "fiData": [{"fipID": "synthetic-fip", "data": account_data}],
+        "notificationId": str(int(rng.integers(0, 100000)))
+    }
+
+
+def generate_db_rows(user_id: str = "synthetic-user", **kwargs) -> tuple[list, list]:
+    """
+    The same synthetic data as (user_financial_accounts rows, account_transactions rows).
+
+    Rows are shaped like the Supabase responses fi_data reads: numeric
+    columns as numbers and transactions ordered by (transaction_timestamp, id).
+    Accepts generate_fi_data's arguments.
+    """
+    aa_data = generate_fi_data(**kwargs)
+    account_rows, transaction_rows = [], []
+    for fip in aa_data["fiData"]:
+        for account_data in fip["data"]:
+            account = account_data["decryptedFI"]["account"]
+            summary = account["summary"]
+            account_id = account["linkedAccRef"]
+            account_rows.append({
+                "id": account_id,
+                "user_id": user_id,
+                "fi_data_session_id": aa_data["dataSessionId"],
+                "fip_id": fip["fipID"],
+                "link_ref_number": account["linkedAccRef"],
+                "masked_acc_number": account["maskedAccNumber"],
+                "account_type": account["type"],
+                "account_type_category": summary.get("accountType"),
+                "branch": summary.get("branch"),
+                "ifsc": summary.get("ifsc"),
+                "opening_date": summary.get("openingDate"),
+                "maturity_date": summary.get("maturityDate"),
+                "interest_rate": float(summary["interestRate"]) if "interestRate" in summary else None,
+                "current_value": float(summary["currentValue"])
+            })
+            transaction_rows.extend(
+                {
+                    "account_id": account_id,
+                    "user_id": user_id,
+                    "transactions_id": txn["txnId"],
+                    "amount": float(txn["amount"]),
+                    "balance": float(txn["balance"]),
+                    "mode": txn["mode"],
+                    "narration": txn["narration"],
+                    "reference": txn["reference"],
+                    "type": txn["type"],
+                    "transaction_timestamp": txn["transactionTimestamp"],
+                    "value_date": txn["valueDate"]
+                }
+                for txn in account["transactions"]["transaction"]
+            )
+
+    transaction_rows.sort(key=lambda row: row["transaction_timestamp"])
+    for row_id, row in enumerate(transaction_rows, start=1):
+        row["id"] = row_id
+    return account_rows, transaction_rows
+
+
+def _savings_transactions(rng: np.random.Generator, n: int, start_s: int, end_s: int) -> list:
+    months = np.arange(
+        np.datetime64(start_s, "s").astype("datetime64[M]"),
+        np.datetime64(end_s, "s").astype("datetime64[M]")
+    )
+    employer = f"{rng.choice(LAST_NAMES).upper()} TECHNOLOGIES PVT LTD"
+    landlord = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    salary = float(rng.integers(60, 250) * 1000)
+    rows = []
+
+    # Recurring series: salary, rent, SIP and subscriptions
+    series = [
+        (1, "CREDIT", "FT", salary, ("NEFT", employer, "HDFC")),
+        (5, "DEBIT", "UPI", round(salary * 0.3, -2), ("UPI", landlord, _vpa(rng, landlord))),
+        (10, "DEBIT", "OTHERS", 5000.0, ("ACH", "ZERODHA MF SIP", "HDFC")),
+    ] + [(int(rng.integers(1, 28)), "DEBIT", "UPI", price, ("UPI", name, vpa)) for name, vpa, price in SUBSCRIPTIONS]
+    for day, txn_type, mode, amount, counterparty in series:
+        for month in months[: max(n // 10, 1)]:
+            ts = (month.astype("datetime64[D]") + np.timedelta64(day - 1, "D")).astype("datetime64[s]").astype(np.int64) + int(rng.integers(9, 12)) * 3600
+            if start_s <= ts < end_s:
+                rows.append((ts, txn_type, mode, amount, counterparty))
+
+    # Random spends fill the rest
+    remaining = max(n - len(rows), 0)
+    stamps = rng.integers(start_s, end_s, remaining)
+    modes = rng.choice(SAVINGS_MODES[0], remaining, p=SAVINGS_MODES[1])
+    amounts = np.round(rng.lognormal(6.5, 1.1, remaining), 2)
+    credit = rng.random(remaining) < 0.12
+    people = rng.integers(0, len(FIRST_NAMES) * len(LAST_NAMES), remaining)
+    merchants = rng.integers(0, len(MERCHANTS), remaining)
+    use_merchant = rng.random(remaining) < 0.55
+
+    for i in range(remaining):
+        mode = str(modes[i])
+        if mode == "ATM":
+            counterparty = ("ATM", "CASH WDL", str(rng.choice(BANK_CODES)))
+        elif use_merchant[i]:
+            name, vpa = MERCHANTS[merchants[i]]
+            counterparty = ("UPI" if mode == "UPI" else mode, name, vpa)
+        else:
+            name = f"{FIRST_NAMES[people[i] % len(FIRST_NAMES)]} {LAST_NAMES[people[i] // len(FIRST_NAMES)]}"
+            counterparty = ("UPI" if mode == "UPI" else mode, name, _vpa(rng, name))
+        rows.append((int(stamps[i]), "CREDIT" if credit[i] else "DEBIT", mode, float(amounts[i]), counterparty))
+
+    rows.sort(key=lambda r: r[0])
+    return _with_balances(rng, rows[:n])
+
+
+def _deposit_transactions(rng: np.random.Generator, n: int, start_s: int, end_s: int) -> list:
+    installment = float(rng.integers(10, 100) * 100)
+    stamps = np.sort(rng.integers(start_s, end_s, n))
+    types = rng.choice(DEPOSIT_TYPES, n, p=[0.7, 0.15, 0.1, 0.05])
+    rows = []
+    for i, ts in enumerate(stamps.tolist()):
+        txn_type = "OPENING" if i == 0 else str(types[i])
+        amount = installment if txn_type in ("OPENING", "INSTALLMENT") else round(float(rng.uniform(10, 2000)), 2)
+        rows.append((ts, txn_type, "FT", amount, ("RD", txn_type, str(rng.choice(BANK_CODES)))))
+    return _with_balances(rng, rows)
+
+
+def _with_balances(rng: np.random.Generator, rows: list) -> list:
+    signed = np.array([-amount if txn_type in ("DEBIT", "TDS") else amount for _, txn_type, _, amount, _ in rows])
+    balances = np.cumsum(signed) + float(rng.integers(20, 200) * 1000)
+    if len(balances) and balances.min() < 0:
+        balances += -balances.min() + 1000
+    refs = rng.integers(10 ** 11, 10 ** 12, len(rows))
+    suffixes = rng.integers(10 ** 7, 10 ** 8, len(rows))
+
+    transactions = []
+    for (ts, txn_type, mode, amount, (rail, name, extra)), balance, ref, suffix in zip(rows, balances.tolist(), refs.tolist(), suffixes.tolist()):
+        direction = "CR" if txn_type in ("CREDIT", "INTEREST") else "DR"
+        timestamp = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        transactions.append({
+            "amount": f"{amount:.2f}",
+            "mode": mode,
+            "narration": f"{rail}/{direction}/{ref}/{name}/{extra}/{suffix}",
+            "reference": str(ref),
+            "transactionTimestamp": timestamp,
+            "txnId": f"S{ref}{suffix}",
+            "type": txn_type,
+            "valueDate": timestamp,
+            "balance": f"{balance:.2f}"
+        })
+    return transactions
+
+
+def _account(rng: np.random.Generator, account_type: str, transactions: list, start: str, end: str) -> dict:
+    link_ref = _uuid(rng)
+    masked = f"XXXXXXXX{int(rng.integers(1000, 10000))}"
+    last_balance = transactions[-1]["balance"] if transactions else "0"
+    summary = {
+        "branch": "Synthetic Branch",
+        "ifsc": f"{rng.choice(BANK_CODES)}0{int(rng.integers(100000, 1000000))}",
+        "openingDate": f"{start}T00:00:00+00:00",
+        "currentValue": last_balance,
+    }
+    if account_type == "savings":
+        summary.update({"currentBalance": last_balance, "availableBalance": last_balance, "currency": "INR", "status": "ACTIVE"})
+    else:
+        summary.update({
+            "accountType": "RECURRING",
+            "compoundingFrequency": "MONTHLY",
+            "interestRate": "6.5",
+            "maturityAmount": f"{float(last_balance) * 1.1:.2f}",
+            "maturityDate": f"{end}T00:00:00+00:00",
+            "principalAmount": last_balance,
+            "recurringAmount": transactions[0]["amount"] if transactions else "0",
+            "tenureMonths": "48"
+        })
+
+    return {
+        "linkRefNumber": link_ref,
+        "maskedAccNumber": masked,
+        "decryptedFI": {
+            "account": {
+                "linkedAccRef": link_ref,
+                "maskedAccNumber": masked,
+                "type": account_type,
+                "version": "2.0.0",
+                "profile": {"holders": {"type": "SINGLE", "holder": [{
+                    "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "nominee": str(rng.choice(["REGISTERED", "NOT-REGISTERED"])),
+                    "ckycCompliance": "true"
+                }]}},
+                "summary": summary,
+                "transactions": {"startDate": start, "endDate": end, "transaction": transactions}
+            },
+            "type": account_type
+        }
+    }
+
+
+def _vpa(rng: np.random.Generator, name: str) -> str:
+    return f"{name.lower().replace(' ', '.')}@{rng.choice(VPA_HANDLES)}"
+
+
+def _uuid(rng: np.random.Generator) -> str:
+    return str(uuid.UUID(bytes=rng.bytes(16), version=4))
+
+
+def _epoch(day: str) -> int:
+    return int(np.datetime64(day, "s").astype(np.int64))
@@ -0,0 +1,143 @@
+from datetime import date, datetime
+import numpy as np
+from functions.transaction_columns import CREDIT_TYPES, TransactionColumns
+
+ROLLING_WINDOWS = (7, 30, 90, 365)
+# Days kept at day granularity behind the newest one; older days roll up to
+# the first of their month. Must cover the longest rolling window.
+DAILY_HORIZON_DAYS = 400
+
+
+def fold_daily(daily: dict, cols: TransactionColumns):
+    """Add a batch's per-day, per-type tallies to `daily` ("YYYY-MM-DD" -> {type: [count, total]})."""
+    if not len(cols):
+        return
+
+    n_types = len(cols.types)
+    keys = cols.wall.astype("datetime64[D]").astype(np.int64) * n_types + cols.type_code
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(distinct))
+    totals = np.bincount(inverse, weights=cols.amount, minlength=len(distinct))
+
+    labels = {}
+    for key, count, total in zip(distinct.tolist(), counts.tolist(), totals.tolist()):
+        day, code = divmod(key, n_types)
+        label = labels.get(day)
+        if label is None:
+            label = labels[day] = str(np.datetime64(day, "D"))
+        entry = daily.setdefault(label, {}).setdefault(cols.types[code], [0, 0.0])
+        entry[0] += count
+        entry[1] += total
+
+
+def merge_daily(daily: dict, other: dict):
+    for day, by_type in other.items():
+        mine = daily.setdefault(day, {})
+        for txn_type, (count, total) in by_type.items():
+            entry = mine.setdefault(txn_type, [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+
+
+def compact_daily(daily: dict, horizon_days: int = DAILY_HORIZON_DAYS):
+    """
+    Roll days more than `horizon_days` before the newest one into "YYYY-MM-01".
+
+    Keeps `daily` at O(horizon + months) entries. The result depends only on
+    the newest day, so compacting after every batch matches compacting once.
+    """
+    if not daily:
+        return
+    cutoff = str(np.datetime64(max(daily), "D") - np.timedelta64(horizon_days, "D"))
+    for day in [d for d in daily if d < cutoff and not d.endswith("-01")]:
+        by_type = daily.pop(day)
+        merge_daily(daily, {f"{day[:8]}01": by_type})
+
+
+class TimeIndex:
+    """
+    Prefix sums over a user's daily transaction tallies.
+
+    `days` is sorted and `counts`/`totals` hold running sums per transaction
+    type (row 0 is all zeros), with `inflow`/`outflow` split by CREDIT_TYPES,
+    so totals for any date range are two binary searches and a subtraction.
+    Dates are the transactions' own calendar dates; once compacted with
+    `compact_daily`, ranges reaching past the horizon are month-granular.
+    """
+
+    __slots__ = ("days", "types", "counts", "totals", "inflow", "outflow")
+
+    def __init__(self, days: np.ndarray, types: list, counts: np.ndarray, totals: np.ndarray):
+        self.days = days
+        self.types = types
+        self.counts = counts
+        self.totals = totals
+        credit = np.array([t in CREDIT_TYPES for t in types], dtype=bool)
+        self.inflow = totals[:, credit].sum(axis=1)
+        self.outflow = totals[:, ~credit].sum(axis=1)
+
+    @classmethod
+    def from_daily(cls, daily: dict) -> "TimeIndex":
+        days = sorted(daily)
+        types = list(dict.fromkeys(t for day in days for t in daily[day]))
+        type_ids = {t: i for i, t in enumerate(types)}
+        counts = np.zeros((len(days) + 1, len(types)), dtype=np.int64)
+        totals = np.zeros((len(days) + 1, len(types)), dtype=np.float64)
+        for i, day in enumerate(days, start=1):
+            for txn_type, (count, total) in daily[day].items():
+                counts[i, type_ids[txn_type]] = count
+                totals[i, type_ids[txn_type]] = total
+        np.cumsum(counts, axis=0, out=counts)
+        np.cumsum(totals, axis=0, out=totals)
+        return cls(np.array(days, dtype="datetime64[D]"), types, counts, totals)
+
+    @classmethod
+    def from_columns(cls, cols: TransactionColumns) -> "TimeIndex":
+        daily = {}
+        fold_daily(daily, cols)
+        return cls.from_daily(daily)
+
+    def range_totals(self, start, end) -> dict:
+        """Totals for transactions dated `start` through `end` (inclusive); dates, datetimes or ISO strings."""
+        start, end = _as_day(start), _as_day(end)
+        i = int(np.searchsorted(self.days, start, side="left"))
+        j = max(int(np.searchsorted(self.days, end, side="right")), i)
+        counts = self.counts[j] - self.counts[i]
+        totals = self.totals[j] - self.totals[i]
+        inflow = float(self.inflow[j] - self.inflow[i])
+        outflow = float(self.outflow[j] - self.outflow[i])
+        return {
+            "from": str(start),
+            "to": str(end),
+            "transactions": int(counts.sum()),
+            "inflow": round(inflow, 2),
+            "outflow": round(outflow, 2),
+            "net": round(inflow - outflow, 2),
+            "by_transaction_type": {
+                t: {"count": int(count), "total": round(float(total), 2)}
+                for t, count, total in zip(self.types, counts, totals)
+                if count
+            }
+        }
+
+    def window(self, days: int, as_of=None) -> dict:
+        """
+        Totals for the `days` days ending on `as_of` (default: today).
+
+        Pass the end of the data range (FiSnapshot.data_to / dataRange.to),
+        not the latest transaction date, so a quiet month reads as a quiet
+        month instead of shifting the window back to older activity.
+        """
+        end = _as_day(as_of) if as_of is not None else np.datetime64(date.today(), "D")
+        return self.range_totals(end - np.timedelta64(days - 1, "D"), end)
+
+    def rolling_windows(self, sizes: tuple = ROLLING_WINDOWS, as_of=None) -> dict:
+        return {f"last_{days}_days": self.window(days, as_of) for days in sizes}
+
+
+def _as_day(value) -> np.datetime64:
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = value[:10]
+    return np.datetime64(value, "D")
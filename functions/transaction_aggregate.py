@@ -0,0 +1,424 @@
+import heapq
+import math
+import numpy as np
+from functions.parsing import to_datetime
+from functions.recurring_payments import detect_recurring, fold_series, merge_series, prune_series
+from functions.time_index import TimeIndex, compact_daily, fold_daily, merge_daily
+from functions.transaction_columns import TransactionColumns, first_seen, group_totals
+
+# How many of the largest transactions are kept as candidates for "notable_large_transactions"
+LARGE_CANDIDATES = 256
+# Recipients tallied per aggregate; beyond this the lightest are dropped
+MAX_RECIPIENTS = 2000
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Bucket label for a "YYYY-MM" month at each monthly_breakdown granularity
+GRANULARITIES = {
+    "month": lambda month: month,
+    "quarter": lambda month: f"{month[:4]}-Q{(int(month[5:7]) - 1) // 3 + 1}",
+    "year": lambda month: month[:4],
+}
+
+
+def calendar_fields(wall: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Weekday (Monday=0), hour and day of month for wall-clock datetime64 values."""
+    days = wall.astype("datetime64[D]")
+    weekdays = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    hours = (wall - days).astype("timedelta64[h]").astype(np.int64)
+    days_of_month = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    return weekdays, hours, days_of_month
+
+
+class TransactionAggregate:
+    """
+    Mergeable running statistics over a stream of transactions.
+
+    Holds everything `transaction_summary` and `behavioral_patterns` need
+    (counts, sums, Welford mean/M2, type/mode/month tallies, balance
+    extremes, weekday/hour/day-of-month histograms, recipient tallies, recurring payment
+    series and daily per-type tallies for the time index)
+    without keeping the transactions themselves. Batches are folded in with
+    `fold`, two aggregates combine with `merge`, and `to_dict`/`from_dict`
+    round-trip through JSON.
+
+    The keyed maps are capped so the state does not grow with history:
+    recipients at MAX_RECIPIENTS (heaviest by count, then amount), series at
+    MAX_SERIES (see `prune_series`) and daily tallies at DAILY_HORIZON_DAYS
+    plus one entry per older month (see `compact_daily`). Below the caps
+    folding in chunks gives exactly the one-shot result; above them the
+    recipient and series tallies are approximate (a dropped key that comes
+    back restarts from zero). Monthly tallies grow by one entry a month.
+    """
+
+    __slots__ = (
+        "source_rows", "count", "amount_sum", "amount_mean", "amount_m2", "amount_min", "amount_max",
+        "first", "last", "by_type", "by_mode", "monthly",
+        "balance_count", "balance_sum", "balance_high", "balance_low", "balance_first", "balance_last",
+        "large", "weekday_counts", "weekday_amounts", "weekday_order", "hour_counts", "hour_order",
+        "day_counts", "recipients", "series", "daily"
+    )
+
+    def __init__(self):
+        self.source_rows = 0
+        self.count = 0
+        self.amount_sum = 0.0
+        self.amount_mean = 0.0
+        self.amount_m2 = 0.0
+        self.amount_min = math.inf
+        self.amount_max = -math.inf
+        self.first = None  # [epoch_us, wall_us, utc_offset]
+        self.last = None
+        self.by_type = {}  # label -> [count, total]
+        self.by_mode = {}
+        self.monthly = {}  # "YYYY-MM" -> [count, total]
+        self.balance_count = 0
+        self.balance_sum = 0.0
+        self.balance_high = -math.inf
+        self.balance_low = math.inf
+        self.balance_first = None  # [epoch_us, balance]
+        self.balance_last = None
+        self.large = []  # [amount, epoch_us, seq, wall_us, utc_offset, type, mode]
+        self.weekday_counts = [0] * 7
+        self.weekday_amounts = [0.0] * 7
+        self.weekday_order = []
+        self.hour_counts = [0] * 24
+        self.hour_order = []
+        self.day_counts = [0] * 32
+        self.recipients = {}  # key -> [count, amount]
+        self.series = {}  # see recurring_payments.fold_series
+        self.daily = {}  # "YYYY-MM-DD" -> {type: [count, total]}
+
+    @classmethod
+    def from_columns(cls, cols: TransactionColumns) -> "TransactionAggregate":
+        return cls().fold(cols)
+
+    # ==================== UPDATES ====================
+
+    def fold(self, cols: TransactionColumns) -> "TransactionAggregate":
+        """Add a batch of parsed transactions to the running statistics."""
+        self.source_rows += cols.source_rows
+        n = len(cols)
+        if not n:
+            return self
+
+        amounts = cols.amount
+        batch_mean = float(amounts.mean())
+        batch_m2 = float(((amounts - batch_mean) ** 2).sum())
+        seq_start = self.count
+        self._add_moments(n, float(amounts.sum()), batch_mean, batch_m2, float(amounts.min()), float(amounts.max()))
+
+        self._take_first_last(
+            [int(cols.epoch_us[0]), int(cols.wall[0].astype(np.int64)), int(cols.utc_offset[0])],
+            [int(cols.epoch_us[-1]), int(cols.wall[-1].astype(np.int64)), int(cols.utc_offset[-1])]
+        )
+
+        _add_tallies(self.by_type, group_totals(cols.type_code, cols.types, amounts))
+        _add_tallies(self.by_mode, group_totals(cols.mode_code, cols.modes, amounts))
+
+        months, month_code = np.unique(cols.wall.astype("datetime64[M]"), return_inverse=True)
+        month_counts = np.bincount(month_code, minlength=len(months))
+        month_totals = np.bincount(month_code, weights=amounts, minlength=len(months))
+        _add_tallies(self.monthly, [
+            (str(month), int(count), float(total))
+            for month, count, total in zip(months, month_counts, month_totals)
+        ])
+
+        positive = np.flatnonzero(cols.balance > 0)
+        if len(positive):
+            balances = cols.balance[positive]
+            self._add_balances(
+                len(balances), float(balances.sum()), float(balances.max()), float(balances.min()),
+                [int(cols.epoch_us[positive[0]]), float(balances[0])],
+                [int(cols.epoch_us[positive[-1]]), float(balances[-1])]
+            )
+
+        top = np.argpartition(-amounts, LARGE_CANDIDATES - 1)[:LARGE_CANDIDATES] if n > LARGE_CANDIDATES else range(n)
+        self._keep_largest([
+            [float(amounts[i]), int(cols.epoch_us[i]), seq_start + int(i), int(cols.wall[i].astype(np.int64)),
+             int(cols.utc_offset[i]), cols.types[cols.type_code[i]], cols.modes[cols.mode_code[i]]]
+            for i in top
+        ])
+
+        weekdays, hours, days_of_month = calendar_fields(cols.wall)
+        for i, (count, total) in enumerate(zip(
+            np.bincount(weekdays, minlength=7).tolist(),
+            np.bincount(weekdays, weights=amounts, minlength=7).tolist()
+        )):
+            self.weekday_counts[i] += count
+            self.weekday_amounts[i] += total
+        for i, count in enumerate(np.bincount(hours, minlength=24).tolist()):
+            self.hour_counts[i] += count
+        for i, count in enumerate(np.bincount(days_of_month, minlength=32).tolist()):
+            self.day_counts[i] += count
+        _extend_order(self.weekday_order, first_seen(weekdays).tolist())
+        _extend_order(self.hour_order, first_seen(hours).tolist())
+
+        # Rows without a narration are interned as "" and left out of the tallies
+        _add_tallies(self.recipients, [
+            row for row in group_totals(cols.recipient_code, cols.recipients, amounts) if row[0]
+        ])
+        fold_series(self.series, cols)
+        fold_daily(self.daily, cols)
+        self._bound()
+
+        return self
+
+    def merge(self, other: "TransactionAggregate") -> "TransactionAggregate":
+        """Combine another aggregate into this one (parallel Welford for the moments)."""
+        self.source_rows += other.source_rows
+        if not other.count:
+            return self
+
+        seq_start = self.count
+        self._add_moments(other.count, other.amount_sum, other.amount_mean, other.amount_m2,
+                          other.amount_min, other.amount_max)
+        self._take_first_last(other.first, other.last)
+        _add_tallies(self.by_type, [(k, c, s) for k, (c, s) in other.by_type.items()])
+        _add_tallies(self.by_mode, [(k, c, s) for k, (c, s) in other.by_mode.items()])
+        _add_tallies(self.monthly, [(k, c, s) for k, (c, s) in other.monthly.items()])
+        _add_tallies(self.recipients, [(k, c, s) for k, (c, s) in other.recipients.items()])
+        merge_series(self.series, other.series)
+        merge_daily(self.daily, other.daily)
+        self._bound()
+
+        if other.balance_count:
+            self._add_balances(other.balance_count, other.balance_sum, other.balance_high, other.balance_low,
+                               other.balance_first, other.balance_last)
+
+        self._keep_largest([[row[0], row[1], seq_start + row[2], *row[3:]] for row in other.large])
+
+        for i in range(7):
+            self.weekday_counts[i] += other.weekday_counts[i]
+            self.weekday_amounts[i] += other.weekday_amounts[i]
+        for i in range(24):
+            self.hour_counts[i] += other.hour_counts[i]
+        for i in range(32):
+            self.day_counts[i] += other.day_counts[i]
+        _extend_order(self.weekday_order, other.weekday_order)
+        _extend_order(self.hour_order, other.hour_order)
+
+        return self
+
+    def _add_moments(self, n: int, total: float, mean: float, m2: float, low: float, high: float):
+        combined = self.count + n
+        delta = mean - self.amount_mean
+        self.amount_mean += delta * n / combined
+        self.amount_m2 += m2 + delta * delta * self.count * n / combined
+        self.count = combined
+        self.amount_sum += total
+        self.amount_min = min(self.amount_min, low)
+        self.amount_max = max(self.amount_max, high)
+
+    def _take_first_last(self, first: list, last: list):
+        if self.first is None or first[0] < self.first[0]:
+            self.first = first
+        if self.last is None or last[0] >= self.last[0]:
+            self.last = last
+
+    def _add_balances(self, n: int, total: float, high: float, low: float, first: list, last: list):
+        self.balance_count += n
+        self.balance_sum += total
+        self.balance_high = max(self.balance_high, high)
+        self.balance_low = min(self.balance_low, low)
+        if self.balance_first is None or first[0] < self.balance_first[0]:
+            self.balance_first = first
+        if self.balance_last is None or last[0] >= self.balance_last[0]:
+            self.balance_last = last
+
+    def _bound(self):
+        if len(self.recipients) > MAX_RECIPIENTS:
+            keep = heapq.nlargest(MAX_RECIPIENTS, self.recipients.items(), key=lambda item: (item[1][0], item[1][1]))
+            self.recipients = dict(keep)
+        prune_series(self.series)
+        compact_daily(self.daily)
+
+    def _keep_largest(self, rows: list):
+        self.large = heapq.nlargest(LARGE_CANDIDATES, self.large + rows, key=lambda r: (r[0], -r[2]))
+
+    # ==================== SUMMARIES ====================
+
+    def amount_statistics(self) -> dict:
+        return {
+            "total": round(self.amount_sum, 2),
+            "average": round(self.amount_mean, 2),
+            "min": round(self.amount_min, 2),
+            "max": round(self.amount_max, 2),
+            "std_dev": round(math.sqrt(self.amount_m2 / (self.count - 1)), 2) if self.count > 1 else 0
+        }
+
+    def transaction_summary(self, cols: TransactionColumns | None = None, granularity: str = "month") -> dict:
+        """
+        Per-account summary in the shape returned by analyze_transactions.
+
+        `granularity` ("month", "quarter" or "year") sets the buckets of
+        monthly_breakdown, keeping long histories compact.
+
+        When the full `cols` are available the notable large transactions are
+        taken from them exactly; otherwise they are picked from the retained
+        largest-amount candidates, which gives the same list as long as no
+        more than LARGE_CANDIDATES transactions exceed the threshold.
+        """
+        if not self.source_rows:
+            return {"total_transactions": 0, "message": "No transactions found"}
+
+        if not self.count:
+            return {"total_transactions": self.source_rows, "message": "Could not parse transaction dates"}
+
+        earliest, latest = _as_datetime(self.first), _as_datetime(self.last)
+        amount_stats = self.amount_statistics()
+
+        type_breakdown = {
+            t: {
+                "count": count,
+                "total": round(total, 2),
+                "average": round(total / count, 2),
+                "percentage_of_total": round((total / amount_stats["total"]) * 100, 1) if amount_stats["total"] > 0 else 0
+            }
+            for t, (count, total) in self.by_type.items()
+        }
+
+        balance_stats = {}
+        if self.balance_count:
+            starting, ending = self.balance_first[1], self.balance_last[1]
+            balance_stats = {
+                "starting": starting,
+                "ending": ending,
+                "highest": self.balance_high,
+                "lowest": self.balance_low,
+                "average": round(self.balance_sum / self.balance_count, 2),
+                "trend": "increasing" if ending > starting else "decreasing" if ending < starting else "stable"
+            }
+
+        # Identify large/unusual transactions (> 2 std dev from mean)
+        threshold = amount_stats["average"] + (2 * amount_stats["std_dev"]) if amount_stats["std_dev"] > 0 else amount_stats["max"]
+        if cols is not None:
+            large_transactions = [
+                {
+                    "amount": float(cols.amount[i]),
+                    "type": cols.types[cols.type_code[i]],
+                    "mode": cols.modes[cols.mode_code[i]],
+                    "date": cols.timestamp(i).isoformat()
+                }
+                for i in np.flatnonzero(cols.amount > threshold)[:10]  # Limit to top 10
+            ]
+        else:
+            above = sorted((r for r in self.large if r[0] > threshold), key=lambda r: (r[1], r[2]))[:10]
+            large_transactions = [
+                {
+                    "amount": amount,
+                    "type": t,
+                    "mode": mode,
+                    "date": to_datetime(np.datetime64(wall, "us"), offset).isoformat()
+                }
+                for amount, _, _, wall, offset, t, mode in above
+            ]
+
+        return {
+            "total_transactions": self.count,
+            "date_range": {
+                "earliest": earliest.isoformat(),
+                "latest": latest.isoformat(),
+                "span_days": (latest - earliest).days
+            },
+            "amount_statistics": amount_stats,
+            "by_transaction_type": type_breakdown,
+            "by_payment_mode": {
+                mode: {"count": count, "total": round(total, 2)}
+                for mode, (count, total) in self.by_mode.items()
+            },
+            "monthly_breakdown": {
+                k: {"count": count, "total": round(total, 2)}
+                for k, (count, total) in self.breakdown(granularity).items()
+            },
+            "balance_statistics": balance_stats,
+            "notable_large_transactions": large_transactions
+        }
+
+    def breakdown(self, granularity: str = "month") -> dict:
+        """Monthly [count, total] tallies regrouped into `granularity` buckets, in date order."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity} (expected one of {', '.join(GRANULARITIES)})")
+        bucket = GRANULARITIES[granularity]
+        buckets = {}
+        for month, (count, total) in sorted(self.monthly.items()):
+            entry = buckets.setdefault(bucket(month), [0, 0])
+            entry[0] += count
+            entry[1] += total
+        return buckets
+
+    def behavioral_patterns(self, as_of=None) -> dict:
+        """
+        Cross-account behavior in the shape returned by analyze_behavioral_patterns.
+
+        Rolling windows end on `as_of` (the end of the data range), or today.
+        """
+        if not self.source_rows:
+            return {"message": "No transactions to analyze"}
+
+        if not self.count:
+            return {"message": "Could not parse transactions"}
+
+        most_active_day = max(self.weekday_order, key=lambda d: self.weekday_counts[d])
+        peak_hours = sorted(
+            ((h, self.hour_counts[h]) for h in self.hour_order),
+            key=lambda x: -x[1]
+        )[:3]
+        # Days of month with 3+ transactions; detected series are in recurring_payments
+        frequent_days = [day for day, count in enumerate(self.day_counts) if count >= 3]
+        recurring = detect_recurring(self.series, self.last[0])
+        preferred_mode = max(self.by_mode, key=lambda m: self.by_mode[m][0]) if self.by_mode else "UNKNOWN"
+
+        return {
+            "most_active_weekday": WEEKDAY_NAMES[most_active_day],
+            "weekday_distribution": {
+                WEEKDAY_NAMES[i]: {"count": self.weekday_counts[i], "total_amount": round(self.weekday_amounts[i], 2)}
+                for i in range(7)
+            },
+            "peak_transaction_hours": [{"hour": h, "count": c} for h, c in peak_hours],
+            "recurring_payment_days": frequent_days,
+            "recurring_payments": recurring,
+            "rolling_windows": self.time_index().rolling_windows(as_of=as_of),
+            "preferred_payment_mode": preferred_mode,
+            "payment_mode_distribution": {
+                mode: round((count / self.count) * 100, 1)
+                for mode, (count, _) in self.by_mode.items()
+            },
+            "total_analyzed_transactions": self.count,
+            "receipent_count_data": {k: count for k, (count, _) in self.recipients.items()},
+            "receipent_amount_data": {k: amount for k, (_, amount) in self.recipients.items()}
+        }
+
+    def time_index(self) -> TimeIndex:
+        """Prefix-sum index over everything folded so far, for date-range and rolling-window totals."""
+        return TimeIndex.from_daily(self.daily)
+
+    # ==================== SERIALIZATION ====================
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TransactionAggregate":
+        agg = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(agg, name, data[name])
+        return agg
+
+
+def _add_tallies(tally: dict, rows: list):
+    for key, count, total in rows:
+        entry = tally.setdefault(key, [0, 0])
+        entry[0] += count
+        entry[1] += total
+
+
+def _extend_order(order: list, keys: list):
+    for key in keys:
+        if key not in order:
+            order.append(key)
+
+
+def _as_datetime(point: list):
+    return to_datetime(np.datetime64(point[1], "us"), point[2])
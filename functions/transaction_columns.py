@@ -0,0 +1,251 @@
+from datetime import datetime
+import numpy as np
+from functions.fi_records import TransactionBatch
+from functions.narration import intern_recipients
+from functions.parsing import NAIVE_OFFSET, parse_timestamp_column, safe_float, to_datetime
+
+# Transaction types that bring money into an account
+CREDIT_TYPES = {"CREDIT", "INTEREST"}
+
+_COLUMNS = (
+    "amount", "balance", "epoch_us", "wall", "utc_offset",
+    "type_code", "mode_code", "recipient_code"
+)
+
+
+class TransactionColumns:
+    """
+    Column-oriented view of FI_DATA_READY transactions, sorted by timestamp.
+
+    Amounts and balances are float64 arrays, timestamps are kept both as
+    UTC epoch microseconds (for ordering and spans) and as wall-clock
+    datetime64 plus UTC offset minutes (for calendar group-bys and for
+    rebuilding the original datetime via `timestamp`). Transaction type, payment mode
+    and the counterparty parsed from the narration are interned into small
+    integer codes so breakdowns can run through `np.bincount` instead of
+    per-row dict updates.
+    """
+
+    __slots__ = _COLUMNS + ("types", "modes", "recipients", "source_rows")
+
+    def __init__(self, amount, balance, epoch_us, wall, utc_offset, type_code, mode_code, recipient_code,
+                 types, modes, recipients, source_rows):
+        self.amount = amount
+        self.balance = balance
+        self.epoch_us = epoch_us
+        self.wall = wall
+        self.utc_offset = utc_offset
+        self.type_code = type_code
+        self.mode_code = mode_code
+        self.recipient_code = recipient_code
+        self.types = types
+        self.modes = modes
+        self.recipients = recipients
+        self.source_rows = source_rows
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def timestamp(self, i: int) -> datetime:
+        """The i-th row's timestamp as the datetime parse_date would return."""
+        return to_datetime(self.wall[i], self.utc_offset[i])
+
+    def take(self, order: np.ndarray) -> "TransactionColumns":
+        """Return a copy with every column reordered by `order`."""
+        return TransactionColumns(
+            *(getattr(self, name)[order] for name in _COLUMNS),
+            types=self.types,
+            modes=self.modes,
+            recipients=self.recipients,
+            source_rows=self.source_rows
+        )
+
+    @classmethod
+    def from_transactions(
+        cls,
+        transactions: list,
+        type_ids: dict | None = None,
+        mode_ids: dict | None = None,
+        recipient_ids: dict | None = None
+    ) -> "TransactionColumns":
+        """
+        Parse raw transactions once into columns; rows without a valid timestamp are dropped.
+
+        Pass shared `type_ids`/`mode_ids`/`recipient_ids` dicts to intern labels
+        across several accounts so their codes stay comparable after a merge.
+        """
+        type_ids = {} if type_ids is None else type_ids
+        mode_ids = {} if mode_ids is None else mode_ids
+        recipient_ids = {} if recipient_ids is None else recipient_ids
+        wall, utc_offset = parse_timestamp_column([txn.get("transactionTimestamp", "") for txn in transactions])
+        parsed = ~np.isnat(wall)
+        amounts, balances, type_codes, mode_codes, narrations = [], [], [], [], []
+
+        for txn, ok in zip(transactions, parsed.tolist()):
+            if not ok:
+                continue
+            amounts.append(safe_float(txn.get("amount", 0)))
+            balances.append(safe_float(txn.get("balance", 0)))
+            type_codes.append(type_ids.setdefault(txn.get("type", "UNKNOWN"), len(type_ids)))
+            mode_codes.append(mode_ids.setdefault(txn.get("mode", "UNKNOWN"), len(mode_ids)))
+            narrations.append(txn.get("narration", ""))
+
+        wall, utc_offset = wall[parsed], utc_offset[parsed]
+        offset_us = np.where(utc_offset == NAIVE_OFFSET, 0, utc_offset).astype(np.int64) * 60_000_000
+        cols = cls(
+            amount=np.array(amounts, dtype=np.float64),
+            balance=np.array(balances, dtype=np.float64),
+            epoch_us=wall.astype(np.int64) - offset_us,
+            wall=wall,
+            utc_offset=utc_offset,
+            type_code=np.array(type_codes, dtype=np.intp),
+            mode_code=np.array(mode_codes, dtype=np.intp),
+            recipient_code=np.array(intern_recipients(narrations, recipient_ids), dtype=np.intp),
+            types=list(type_ids),
+            modes=list(mode_ids),
+            recipients=list(recipient_ids),
+            source_rows=len(transactions)
+        )
+
+        # get_fi_data already returns rows ordered by timestamp; only sort when they are not
+        if np.any(cols.epoch_us[1:] < cols.epoch_us[:-1]):
+            cols = cols.take(np.argsort(cols.epoch_us, kind="stable"))
+        return cols
+
+    @classmethod
+    def from_batch(
+        cls,
+        batch: TransactionBatch,
+        type_ids: dict | None = None,
+        mode_ids: dict | None = None,
+        recipient_ids: dict | None = None
+    ) -> "TransactionColumns":
+        """
+        Columns from a typed fi_records batch, without going through FI dicts.
+
+        Gives the same result as `from_transactions(batch.to_transactions())`:
+        the batch's clock times are what get_fi_data renders as `+00:00`
+        timestamps, so they are taken as UTC.
+        """
+        type_ids = {} if type_ids is None else type_ids
+        mode_ids = {} if mode_ids is None else mode_ids
+        recipient_ids = {} if recipient_ids is None else recipient_ids
+        parsed = np.flatnonzero(~np.isnat(batch.timestamp))
+        type_lookup = np.array([type_ids.setdefault(t, len(type_ids)) for t in batch.types], dtype=np.intp)
+        mode_lookup = np.array([mode_ids.setdefault(m, len(mode_ids)) for m in batch.modes], dtype=np.intp)
+        narrations = [batch.narration[i] for i in parsed.tolist()]
+
+        wall = batch.timestamp[parsed]
+        cols = cls(
+            amount=batch.amount_paise[parsed] / 100,
+            balance=batch.balance_paise[parsed] / 100,
+            epoch_us=wall.astype(np.int64),
+            wall=wall,
+            utc_offset=np.zeros(len(parsed), dtype=np.int32),
+            type_code=type_lookup[batch.type_code[parsed]],
+            mode_code=mode_lookup[batch.mode_code[parsed]],
+            recipient_code=np.array(intern_recipients(narrations, recipient_ids), dtype=np.intp),
+            types=list(type_ids),
+            modes=list(mode_ids),
+            recipients=list(recipient_ids),
+            source_rows=len(batch)
+        )
+
+        if np.any(cols.epoch_us[1:] < cols.epoch_us[:-1]):
+            cols = cols.take(np.argsort(cols.epoch_us, kind="stable"))
+        return cols
+
+    @classmethod
+    def merge(
+        cls,
+        parts: list["TransactionColumns"],
+        types: list,
+        modes: list,
+        recipients: list
+    ) -> "TransactionColumns":
+        """
+        Merge already-sorted columns into a single timeline.
+
+        Parts must have been interned against the same `types`/`modes`/`recipients` tables.
+        The stable sort over the concatenated runs is numpy's timsort, which
+        detects the k pre-sorted runs and merges them in O(n log k); ties keep
+        the order of `parts`.
+        """
+        if not parts:
+            return cls.from_transactions([])
+
+        merged = cls(
+            *(np.concatenate([getattr(p, name) for p in parts]) for name in _COLUMNS),
+            types=types,
+            modes=modes,
+            recipients=recipients,
+            source_rows=sum(p.source_rows for p in parts)
+        )
+        if len(parts) > 1:
+            merged = merged.take(np.argsort(merged.epoch_us, kind="stable"))
+        return merged
+
+
+class TransactionStore:
+    """
+    Every account's transactions parsed exactly once.
+
+    `accounts[i]` holds the columns of the i-th transaction list passed in,
+    and `timeline` is all of them merged in timestamp order. Type, mode and
+    recipient codes are shared across accounts and the timeline.
+    """
+
+    __slots__ = ("accounts", "timeline")
+
+    def __init__(self, accounts: list[TransactionColumns], timeline: TransactionColumns):
+        self.accounts = accounts
+        self.timeline = timeline
+
+    @classmethod
+    def from_transaction_lists(cls, transaction_lists: list[list | TransactionBatch]) -> "TransactionStore":
+        """Accepts FI transaction lists, fi_records batches, or a mix of both."""
+        type_ids = {}
+        mode_ids = {}
+        recipient_ids = {}
+        accounts = [
+            TransactionColumns.from_batch(txns, type_ids, mode_ids, recipient_ids)
+            if isinstance(txns, TransactionBatch)
+            else TransactionColumns.from_transactions(txns, type_ids, mode_ids, recipient_ids)
+            for txns in transaction_lists
+        ]
+        types, modes, recipients = list(type_ids), list(mode_ids), list(recipient_ids)
+        for cols in accounts:
+            cols.types, cols.modes, cols.recipients = types, modes, recipients
+
+        return cls(accounts, TransactionColumns.merge(accounts, types, modes, recipients))
+
+
+def first_seen(codes: np.ndarray) -> np.ndarray:
+    """Distinct codes ordered by their first appearance in `codes`."""
+    present, first_index = np.unique(codes, return_index=True)
+    return present[np.argsort(first_index)]
+
+
+def group_totals(codes: np.ndarray, labels: list, weights: np.ndarray) -> list[tuple]:
+    """
+    Count and sum `weights` per code.
+
+    Returns (label, count, total) tuples ordered by each label's first
+    appearance in `codes`, matching the insertion order of a dict built by
+    walking the rows.
+    """
+    if not len(codes):
+        return []
+    counts = np.bincount(codes, minlength=len(labels))
+    totals = np.bincount(codes, weights=weights, minlength=len(labels))
+    return [
+        (labels[code], int(counts[code]), float(totals[code]))
+        for code in first_seen(codes)
+    ]
+
+
+def as_columns(transactions: list | TransactionColumns) -> TransactionColumns:
+    """Accept either raw FI transactions or already-parsed columns."""
+    if isinstance(transactions, TransactionColumns):
+        return transactions
+    return TransactionColumns.from_transactions(transactions or [])
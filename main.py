@@ -1,14 +1,21 @@
+from contextlib import ExitStack, asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import time
 import os
 from dotenv import load_dotenv
+from config.async_database import close_async_db, init_async_db
 from config.global_logger import setup_logger
-from routes import personaRoutes, mentorRoutes
+from config.write_journal import start_write_journal, stop_write_journal
+from functions.profiling import PROFILE_HEADER, close_after_body, is_streamed, profile_request, profiling_requested
+from routes import personaRoutes, mentorRoutes, debugRoutes
 
 load_dotenv()
 
+# /debug/* metrics routes are off unless DEBUG_ENDPOINTS is set
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "0").lower() in ("1", "true", "yes")
+
 logger = setup_logger(
     name="zenvest_ai",
     log_level=os.getenv("LOG_LEVEL", "INFO"),
@@ -18,10 +25,21 @@ logger = setup_logger(
     json_logs=False
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled async Supabase client per worker, closed on shutdown
+    await init_async_db()
+    # Replays journaled writes left from the last run; drained before the client closes
+    start_write_journal()
+    yield
+    await stop_write_journal()
+    await close_async_db()
+
 app = FastAPI(
     title="Zenvest AI Backend",
     description="Backend API for Zenvest AI application",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 
@@ -38,6 +56,8 @@ app.add_middleware(
 
 app.include_router(personaRoutes.router, prefix="/api/v1")
 app.include_router(mentorRoutes.router, prefix="/api/v1")
+if DEBUG_ENDPOINTS:
+    app.include_router(debugRoutes.router)
 
 # Request logging middleware
 @app.middleware("http")
@@ -61,7 +81,17 @@ async def log_requests(request: Request, call_next):
 
     # Process request
     try:
-        response = await call_next(request)
+        with ExitStack() as profiling:
+            profile = profiling.enter_context(
+                profile_request(request_id, profiling_requested(request.headers.get(PROFILE_HEADER)))
+            )
+            response = await call_next(request)
+            if profile is not None and is_streamed(response):
+                # SSE bodies generate after this returns; profile them too, without a Server-Timing header
+                response.body_iterator = close_after_body(response.body_iterator, profiling.pop_all())
+                profile = None
+        if profile is not None and profile.stages:
+            response.headers["Server-Timing"] = profile.server_timing()
         duration_ms = (time.time() - start_time) * 1000
 
         # Log response
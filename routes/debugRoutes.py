@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+from auth.jwt_bearer import JWTBearer
+from config.write_journal import get_write_journal
+from functions.fetch_metrics import get_fetch_metrics
+from functions.history_cache import get_history_cache
+from functions.profiling import get_stage_histograms
+
+# Internal timings and queue state; only mounted when DEBUG_ENDPOINTS is set, and then behind a valid token
+router = APIRouter(prefix="/debug", dependencies=[Depends(JWTBearer())])
+
+async def stage_histograms():
+    """Wall and CPU time histograms per profiled stage since startup."""
+    return get_stage_histograms().snapshot()
+
+router.add_api_route("/stages", stage_histograms, methods=["GET"])
+
+async def fetch_metrics():
+    """Payload bytes and fetch/decode time per Supabase query since startup."""
+    return get_fetch_metrics().snapshot()
+
+router.add_api_route("/fetch", fetch_metrics, methods=["GET"])
+
+async def write_behind_metrics():
+    """Journal queue depth, flush latency and time from enqueue to flush."""
+    return get_write_journal().snapshot()
+
+router.add_api_route("/write-behind", write_behind_metrics, methods=["GET"])
+
+async def history_cache_stats():
+    """Entries, bytes held and hit rate of the conversation history cache."""
+    return get_history_cache().stats()
+
+router.add_api_route("/history-cache", history_cache_stats, methods=["GET"])
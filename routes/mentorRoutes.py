@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import Optional
-from controllers.chat.mentor import financial_mentor
+from fastapi.responses import StreamingResponse
+from controllers.chat.mentor import financial_mentor, financial_mentor_stream
+from controllers.chat.sse import SSE_HEADERS
 from auth.jwt_bearer import verify_token
 from fastapi.security import OAuth2PasswordBearer
 
@@ -27,3 +29,14 @@ async def mentor_route(request: FinancialMentorRequest, token: str = Depends(oau
     return await financial_mentor(request, user_id)
 
 router.add_api_route("/chat", mentor_route, methods=["POST"], response_model=FinancialMentorResponse)
+
+async def mentor_stream_route(request: FinancialMentorRequest, token: str = Depends(oauth2_scheme)):
+    token_data = verify_token(token=token)
+    user_id = token_data.get("user_id")
+    return StreamingResponse(
+        financial_mentor_stream(request, user_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+router.add_api_route("/chat/stream", mentor_stream_route, methods=["POST"])
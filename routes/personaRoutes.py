@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends
 from pydantic import BaseModel
 from typing import Optional
-from controllers.chat.persona import persona_chat, ChatRequest
+from fastapi.responses import StreamingResponse
+from controllers.chat.persona import persona_chat, persona_chat_stream, ChatRequest
+from controllers.chat.sse import SSE_HEADERS
 from auth.jwt_bearer import verify_token
 from fastapi.security import OAuth2PasswordBearer
 
@@ -15,10 +17,21 @@ class ChatResponse(BaseModel):
 
 router = APIRouter(prefix= "/persona")
 
-async def persona_route(request: ChatRequest, token: str = Depends(oauth2_scheme)):
+async def persona_route(request: ChatRequest, background_tasks: BackgroundTasks, token: str = Depends(oauth2_scheme)):
     print(request, token)
     token_data = verify_token(token=token)
     user_id = token_data.get("user_id")
-    return await persona_chat(request, user_id)
+    return await persona_chat(request, user_id, background_tasks)
 
 router.add_api_route("/chat", persona_route, methods=["POST"], response_model=ChatResponse)
+
+async def persona_stream_route(request: ChatRequest, background_tasks: BackgroundTasks, token: str = Depends(oauth2_scheme)):
+    token_data = verify_token(token=token)
+    user_id = token_data.get("user_id")
+    return StreamingResponse(
+        persona_chat_stream(request, user_id, background_tasks),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+router.add_api_route("/chat/stream", persona_stream_route, methods=["POST"])
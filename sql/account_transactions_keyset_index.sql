@@ -0,0 +1,5 @@
+-- Supports the keyset-paginated reads in functions/fi_data.py (iter_transaction_pages):
+-- each page filters by user and resumes after the previous page's last
+-- (transaction_timestamp, id), so the scan starts at the cursor instead of an offset.
+create index if not exists account_transactions_user_timestamp_id
+    on account_transactions (user_id, transaction_timestamp, id);
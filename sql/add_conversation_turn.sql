@@ -0,0 +1,35 @@
+-- Persists a chat turn in one round trip, used by add_turn in config/database.py and
+-- config/async_database.py. Inserts every message in p_messages (objects with role,
+-- content and optionally model, token_count, metadata, client_message_id) and bumps the
+-- conversation's updated_at in the same transaction. created_at is offset by each
+-- message's position so the turn reads back in order even though it is written at a
+-- single now(). Messages whose client_message_id is already stored are skipped, so a
+-- resent turn is applied once (requires sql/write_idempotency_keys.sql).
+create or replace function add_conversation_turn(p_conversation_id text, p_messages jsonb)
+returns setof messages
+language plpgsql
+as $$
+begin
+    update conversations
+        set updated_at = now()
+        where conversation_id = p_conversation_id;
+
+    return query
+    insert into messages (conversation_id, role, content, model, token_count, metadata, client_message_id, created_at)
+    select
+        p_conversation_id,
+        m.role,
+        m.content,
+        m.model,
+        m.token_count,
+        m.metadata,
+        m.client_message_id,
+        now() + (m.position - 1) * interval '1 microsecond'
+    from jsonb_to_recordset(p_messages) with ordinality
+        as m(role text, content text, model text, token_count integer, metadata jsonb,
+             client_message_id uuid, position bigint)
+    order by m.position
+    on conflict (client_message_id) do nothing
+    returning *;
+end;
+$$;
@@ -0,0 +1,21 @@
+-- Cheap freshness check for a user's FI snapshot, used by functions/analysis_cache.py.
+-- One row per linked account with its transaction count and latest timestamp, so
+-- callers can tell whether get_fi_data would return anything new without fetching it.
+create or replace function fi_snapshot_fingerprint(p_user_id uuid, p_data_to timestamptz)
+returns table (account_id text, txn_count bigint, max_transaction_timestamp timestamptz)
+language sql
+stable
+as $$
+    select
+        a.id::text,
+        count(t.id),
+        max(t.transaction_timestamp)
+    from user_financial_accounts a
+    left join account_transactions t
+        on t.account_id = a.id
+        and t.user_id = a.user_id
+        and t.transaction_timestamp <= p_data_to
+    where a.user_id = p_user_id
+    group by a.id
+    order by a.id::text;
+$$;
@@ -0,0 +1,5 @@
+-- Supports the limited descending read of a conversation's tail in
+-- get_recent_messages (config/database.py, config/async_database.py):
+-- the newest rows come straight off the index instead of sorting the whole thread.
+create index if not exists messages_conversation_created_at
+    on messages (conversation_id, created_at);
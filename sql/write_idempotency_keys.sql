@@ -0,0 +1,11 @@
+-- Idempotency keys for the write-behind journal (config/write_journal.py), which may
+-- send a turn or a mentor session again after a timeout or a lease handed to another
+-- worker. add_conversation_turn skips messages whose client_message_id is already
+-- stored, and save_financial_sessions upserts on session_id ignoring duplicates.
+alter table messages add column if not exists client_message_id uuid;
+
+create unique index if not exists messages_client_message_id
+    on messages (client_message_id);
+
+create unique index if not exists mentor_sessions_session_id
+    on mentor_sessions (session_id);
@@ -0,0 +1,34 @@
+import math
+import os
+import pytest
+
+# config.database builds its Supabase client at import time; tests never reach it
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+
+def _same(a, b, path: str = "") -> list[str]:
+    if isinstance(a, dict) and isinstance(b, dict):
+        if a.keys() != b.keys():
+            return [f"{path}: keys {sorted(a.keys() ^ b.keys())}"]
+        return [d for key in a for d in _same(a[key], b[key], f"{path}.{key}")]
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return [f"{path}: length {len(a)} != {len(b)}"]
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in _same(x, y, f"{path}[{i}]")]
+    if isinstance(a, float) or isinstance(b, float):
+        # Folding in a different order changes the last bits, and so the rounded cent
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and math.isclose(a, b, rel_tol=1e-9, abs_tol=0.011):
+            return []
+    elif a == b:
+        return []
+    return [f"{path}: {a!r} != {b!r}"]
+
+
+@pytest.fixture
+def assert_same_summary():
+    """Compares two analysis summaries, allowing float summation-order noise."""
+    def check(actual, expected):
+        differences = _same(actual, expected)
+        assert not differences, "\n".join(differences[:20])
+    return check
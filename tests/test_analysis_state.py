@@ -0,0 +1,79 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from functions import analysis_state
+from functions.analysis_state import AnalysisStateStore, UserAnalysisState, analyze_financial_data_incremental
+from functions.finance_analyzer import analyze_financial_data, iter_accounts
+from functions.synthetic_data import generate_fi_data
+
+
+def truncated(aa_data: dict, rows: int) -> dict:
+    """aa_data with every account cut to its first `rows` transactions."""
+    data = copy.deepcopy(aa_data)
+    for account, _, _ in iter_accounts(data):
+        txns = account["transactions"]
+        txns["transaction"] = txns["transaction"][:rows]
+    return data
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = AnalysisStateStore(str(tmp_path / "analysis_state.db"))
+    monkeypatch.setattr(analysis_state, "_state_store", store)
+    return store
+
+
+@pytest.fixture(scope="module")
+def aa_data():
+    return generate_fi_data(accounts=2, transactions_per_account=300, seed=3)
+
+
+def test_incremental_matches_one_shot(store, aa_data, assert_same_summary):
+    analyze_financial_data_incremental("user", truncated(aa_data, 120))
+    assert_same_summary(analyze_financial_data_incremental("user", aa_data), analyze_financial_data(aa_data))
+
+
+def test_concurrent_updates_fold_each_row_once(store, aa_data, assert_same_summary):
+    analyze_financial_data_incremental("user", truncated(aa_data, 120))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: analyze_financial_data_incremental("user", aa_data), range(8)))
+
+    expected = analyze_financial_data(aa_data)
+    for result in results:
+        assert_same_summary(result, expected)
+    assert_same_summary(store.get("user").update(aa_data), expected)
+
+
+def test_state_survives_restart(store, aa_data, assert_same_summary):
+    analyze_financial_data_incremental("user", truncated(aa_data, 120))
+    reopened = AnalysisStateStore(store.path)
+    state = reopened.get("user")
+    assert state is not None
+    assert_same_summary(state.update(aa_data), analyze_financial_data(aa_data))
+
+
+def test_memory_is_bounded_lru(tmp_path):
+    store = AnalysisStateStore(str(tmp_path / "analysis_state.db"), max_users=2)
+    for user_id in ("a", "b"):
+        store.put(user_id, UserAnalysisState())
+    store.get("a")
+    store.put("c", UserAnalysisState())
+
+    assert list(store._states) == ["a", "c"]
+
+
+def test_unchanged_state_is_not_rewritten(store, aa_data):
+    analyze_financial_data_incremental("user", aa_data)
+    state = store.get("user")
+    assert not state.dirty
+
+    state.update(aa_data)
+    assert not state.dirty
+    state.update(truncated(aa_data, 10))
+    assert state.dirty
+
+
+def test_user_locks_are_a_fixed_set(store):
+    locks = {id(store.user_lock(f"user-{i}")) for i in range(10_000)}
+    assert len(locks) <= analysis_state.USER_LOCK_STRIPES
+    assert store.user_lock("user-1") is store.user_lock("user-1")
@@ -0,0 +1,100 @@
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config.async_database import AsyncChatDatabase
+from config.database import ChatDatabase
+from config.write_journal import with_message_ids
+
+
+def turn(i: int) -> list:
+    return with_message_ids([
+        {"role": "user", "content": f"question {i}", "token_count": 3},
+        {"role": "model", "content": f"answer {i}", "model": "gemini-2.5-flash"}
+    ])
+
+
+async def call(db, method: str, *args):
+    result = getattr(db, method)(*args)
+    return await result if asyncio.iscoroutine(result) else result
+
+
+def run_sync(scenario):
+    standin = PostgrestStandIn()
+    return asyncio.run(scenario(ChatDatabase(standin.client()), standin)), standin
+
+
+def run_async(scenario):
+    standin = PostgrestStandIn()
+
+    async def main():
+        db = AsyncChatDatabase(*await standin.async_client())
+        try:
+            return await scenario(db, standin)
+        finally:
+            await db.close()
+    return asyncio.run(main()), standin
+
+
+@pytest.fixture(params=[run_sync, run_async], ids=["sync", "async"])
+def run(request):
+    return request.param
+
+
+def test_add_turn_inserts_in_order_in_one_request(run):
+    async def scenario(db, standin):
+        await call(db, "create_conversation", "user", "conv")
+        before = (await call(db, "get_conversation", "conv"))["updated_at"]
+        requests = standin.requests
+        inserted = await call(db, "add_turn", "conv", turn(0))
+        requests = standin.requests - requests
+        return before, requests, inserted, await call(db, "get_conversation", "conv")
+
+    (before, requests, inserted, conversation), standin = run(scenario)
+    assert requests == 1
+
+    assert [m["content"] for m in inserted] == ["question 0", "answer 0"]
+    assert inserted[0]["created_at"] < inserted[1]["created_at"]
+    assert inserted[0]["token_count"] == 3 and inserted[1]["model"] == "gemini-2.5-flash"
+    assert conversation["updated_at"] > before
+    assert [m["content"] for m in standin.rows("messages")] == ["question 0", "answer 0"]
+
+
+def test_add_turn_skips_resent_messages(run):
+    async def scenario(db, standin):
+        await call(db, "create_conversation", "user", "conv")
+        messages = turn(0)
+        first = await call(db, "add_turn", "conv", messages)
+        again = await call(db, "add_turn", "conv", messages)
+        return first, again
+
+    (first, again), standin = run(scenario)
+    assert len(first) == 2 and again == []
+    assert len(standin.rows("messages")) == 2
+
+
+def test_recent_messages_returns_the_tail_oldest_first(run):
+    async def scenario(db, standin):
+        await call(db, "create_conversation", "user", "conv")
+        empty = await call(db, "get_recent_messages", "conv", 4)
+        for i in range(5):
+            await call(db, "add_turn", "conv", turn(i))
+        return empty, await call(db, "get_recent_messages", "conv", 3), await call(db, "get_recent_messages", "conv", 50)
+
+    (empty, tail, everything), _ = run(scenario)
+    assert empty == []
+    assert [m["content"] for m in tail] == ["answer 3", "question 4", "answer 4"]
+    assert set(tail[0]) == {"id", "role", "content", "token_count", "client_message_id", "created_at"}
+    assert len(everything) == 10 and everything[0]["content"] == "question 0"
+
+
+def test_add_turn_calls_the_rpc_with_the_messages():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = None
+    messages = turn(0)
+
+    assert ChatDatabase(client).add_turn("conv", messages) == []
+    client.rpc.assert_called_once_with(
+        "add_conversation_turn", {"p_conversation_id": "conv", "p_messages": messages}
+    )
+    client.table.assert_not_called()
@@ -0,0 +1,164 @@
+import asyncio
+import time
+import pytest
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config import async_database, write_journal
+from controllers.chat import persona
+from controllers.chat.persona import ChatRequest
+from functions import conversation_summary, history_cache
+from functions.conversation_summary import ConversationSummarizer, ExtractiveSummaryModel
+from functions.history_cache import HistoryCache
+
+
+@pytest.fixture
+def chat_env(monkeypatch):
+    """Stand-in Supabase, direct writes, a fresh history cache and a 10-message tail."""
+    monkeypatch.setattr(write_journal, "WRITE_BEHIND_ENABLED", False)
+    monkeypatch.setattr(history_cache, "_history_cache", HistoryCache(max_messages=10))
+    monkeypatch.setattr(conversation_summary, "HISTORY_TAIL_MESSAGES", 10)
+    monkeypatch.setattr(persona, "HISTORY_TAIL_MESSAGES", 10)
+
+
+def run(scenario):
+    """Run scenario(db, standin) against a fresh stand-in with conversation conv."""
+    async def main():
+        standin = PostgrestStandIn()
+        db = async_database.AsyncChatDatabase(*await standin.async_client())
+        async_database._async_db_instance = db
+        try:
+            await db.create_conversation("user", "conv")
+            return await scenario(db, standin)
+        finally:
+            async_database._async_db_instance = None
+            await db.close()
+    return asyncio.run(main())
+
+
+async def add_turns(db, start: int, count: int):
+    for i in range(start, start + count):
+        await db.add_turn("conv", [
+            {"role": "user", "content": f"Question {i}."},
+            {"role": "model", "content": f"Answer {i}."}
+        ])
+
+
+def summary_state(standin) -> dict:
+    return standin.rows("conversations")[0]["metadata"]["summary"]
+
+
+def test_turns_older_than_the_tail_are_folded(chat_env):
+    async def scenario(db, standin):
+        # 30 short turns: the 10-message tail fits the window whole, the 50 messages before it do not
+        await add_turns(db, 0, 30)
+        summarizer = ConversationSummarizer(ExtractiveSummaryModel())
+        assert await summarizer.update("conv")
+        return summary_state(standin)
+
+    state = run(scenario)
+    assert state["messages"] == 50
+    assert state["text"].splitlines()[0] == "User: Question 0."
+    assert state["text"].splitlines()[-1] == "Sharan: Answer 24."
+
+
+def test_backlog_is_folded_in_batches(chat_env, monkeypatch):
+    monkeypatch.setattr(conversation_summary, "SUMMARY_FOLD_BATCH", 20)
+
+    async def scenario(db, standin):
+        await add_turns(db, 0, 30)
+        summarizer = ConversationSummarizer(ExtractiveSummaryModel())
+        folded = []
+        while await summarizer.update("conv"):
+            folded.append(summary_state(standin)["messages"])
+        return folded
+
+    assert run(scenario) == [20, 40, 50]
+
+
+def test_persona_windows_a_history_cut_to_the_tail(chat_env):
+    request = ChatRequest(id="user", message="Next?", conversation_id="conv")
+
+    async def scenario(db, standin):
+        await add_turns(db, 0, 3)
+        _, _, short = await persona._prepare_turn(request, "user", "conv", 1)
+        history_cache.get_history_cache().invalidate("conv")
+
+        await add_turns(db, 3, 27)
+        _, _, from_db = await persona._prepare_turn(request, "user", "conv", 2)
+        _, _, from_cache = await persona._prepare_turn(request, "user", "conv", 3)
+        return short, from_db, from_cache
+
+    short, from_db, from_cache = run(scenario)
+    assert not short
+    assert from_db and from_cache
+
+
+def test_cached_history_stops_being_complete_once_trimmed():
+    cache = HistoryCache(max_messages=4)
+    cache.put("conv", [{"role": "user", "parts": ["hi"]}], complete=True)
+    assert cache.is_complete("conv")
+
+    cache.append("conv", [{"role": "model", "parts": ["hello"]}] * 3)
+    assert cache.is_complete("conv")
+    cache.append("conv", [{"role": "user", "parts": ["again"]}])
+    assert not cache.is_complete("conv")
+
+
+def test_each_message_is_folded_once(chat_env):
+    async def scenario(db, standin):
+        summarizer = ConversationSummarizer(ExtractiveSummaryModel())
+        await add_turns(db, 0, 20)
+        assert await summarizer.update("conv")
+        first = summary_state(standin)
+        # Nothing new has left the window
+        assert not await summarizer.update("conv")
+
+        await add_turns(db, 20, 3)
+        assert await summarizer.update("conv")
+        return first, summary_state(standin), standin.rows("messages")
+
+    first, second, messages = run(scenario)
+    folded = {message["id"]: message for message in messages}
+    assert first["through"][1] == 30 and folded[30]["content"] == "Answer 14."
+    assert second["messages"] == first["messages"] + 6
+    lines = second["text"].splitlines()
+    assert len(lines) == len(set(lines)) == second["messages"]
+
+
+class SlowModel(ExtractiveSummaryModel):
+    """Holds each fold long enough for a concurrent worker to read the same state."""
+
+    def summarize(self, summary: str, messages: list) -> str:
+        time.sleep(0.2)
+        return super().summarize(summary, messages)
+
+
+def test_concurrent_workers_do_not_overwrite_a_newer_summary(chat_env):
+    async def scenario(db, standin):
+        await add_turns(db, 0, 20)
+        # Separate instances, as in two workers: the per-process _running guard does not see the other
+        workers = [ConversationSummarizer(SlowModel()), ConversationSummarizer(SlowModel())]
+        results = await asyncio.gather(*(worker.update("conv") for worker in workers))
+        state = summary_state(standin)
+
+        await add_turns(db, 20, 3)
+        assert await workers[0].update("conv")
+        return results, state, summary_state(standin)
+
+    results, state, after = run(scenario)
+    assert sorted(results) == [False, True]
+    assert state["messages"] == 30
+    assert after["messages"] == 36
+    assert len(set(after["text"].splitlines())) == 36
+
+
+def test_stale_compare_and_set_is_rejected(chat_env):
+    async def scenario(db, standin):
+        summary = {"text": "new", "through": ["t", 9], "messages": 9}
+        assert await db.update_conversation_metadata("conv", {"summary": summary}, {"metadata->summary->>messages": None})
+        stale = {"text": "old", "through": ["t", 4], "messages": 4}
+        applied = await db.update_conversation_metadata("conv", {"summary": stale}, {"metadata->summary->>messages": None})
+        return applied, summary_state(standin)
+
+    applied, state = run(scenario)
+    assert not applied
+    assert state["text"] == "new"
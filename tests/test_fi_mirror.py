@@ -0,0 +1,134 @@
+from unittest.mock import MagicMock
+import pytest
+from functions import analysis_cache, fi_data, fi_mirror
+from functions.analysis_cache import AnalysisCache, get_financial_analysis
+from functions.fi_mirror import FiMirror, fetch_fi_snapshot_mirrored
+from functions.fi_records import FiSnapshot
+from functions.synthetic_data import generate_db_rows
+
+DATA_TO = "2025-01-01"
+
+
+class SupabaseDown(Exception):
+    pass
+
+
+@pytest.fixture
+def rows():
+    return generate_db_rows("user", accounts=1, transactions_per_account=50)
+
+
+@pytest.fixture
+def remote(rows, monkeypatch):
+    """Stands in for the Supabase reads fi_mirror makes; `fail_after` pages breaks the transaction read."""
+    accounts, transactions = rows
+    state = {"fail_after": None, "remote_fetches": 0}
+
+    def pages(user_id, account_ids, data_to, after=None):
+        remaining = [t for t in transactions if after is None or (t["transaction_timestamp"], t["id"]) > tuple(after)]
+        for i in range(0, len(remaining), 20):
+            if state["fail_after"] is not None and i // 20 >= state["fail_after"]:
+                raise SupabaseDown("connection reset")
+            yield remaining[i:i + 20]
+
+    def fetch_snapshot(user_id, data_to=None):
+        state["remote_fetches"] += 1
+        return FiSnapshot.from_rows(accounts, transactions, data_to or DATA_TO)
+
+    monkeypatch.setattr(fi_mirror, "fetch_accounts", lambda user_id: accounts)
+    monkeypatch.setattr(fi_mirror, "iter_transaction_pages", pages)
+    monkeypatch.setattr(fi_mirror, "fetch_fingerprint_rows", lambda user_id, data_to: None)
+    monkeypatch.setattr(fi_mirror, "load_fi_snapshot", fetch_snapshot)
+    return state
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    mirror = FiMirror(str(tmp_path / "fi_mirror.db"))
+    monkeypatch.setattr(fi_mirror, "_fi_mirror", mirror)
+    return mirror
+
+
+def test_failed_first_pull_fetches_remotely(mirror, remote, rows):
+    remote["fail_after"] = 1
+
+    snapshot = fetch_fi_snapshot_mirrored("user", DATA_TO)
+
+    assert remote["remote_fetches"] == 1
+    assert not snapshot.stale
+    assert snapshot.transaction_count() == len(rows[1])
+    assert not mirror.is_complete("user")
+
+
+@pytest.fixture
+def supabase_down(monkeypatch):
+    """The real remote fetch, against a client whose every request fails."""
+    monkeypatch.setattr(fi_data, "supabase", MagicMock(table=MagicMock(side_effect=SupabaseDown("connection reset"))))
+    monkeypatch.setattr(fi_mirror, "load_fi_snapshot", fi_data.load_fi_snapshot)
+
+
+def test_failed_sync_without_mirror_or_remote_raises(mirror, remote, supabase_down):
+    remote["fail_after"] = 0
+
+    with pytest.raises(SupabaseDown):
+        fetch_fi_snapshot_mirrored("user", DATA_TO)
+    assert not mirror.is_complete("user")
+
+
+def test_failed_remote_fetch_is_stale_and_not_cached(supabase_down, monkeypatch):
+    snapshot = fi_data.fetch_fi_snapshot("user", DATA_TO)
+    assert snapshot.stale and snapshot.transaction_count() == 0
+
+    cache = AnalysisCache()
+    monkeypatch.setattr(fi_mirror, "FI_MIRROR_ENABLED", False)
+    monkeypatch.setattr(analysis_cache, "_analysis_cache", cache)
+    monkeypatch.setattr(analysis_cache, "get_fi_fingerprint", lambda user_id: "fingerprint")
+    monkeypatch.setattr(analysis_cache, "analyze_financial_data_incremental", lambda user_id, data: {})
+
+    financial_data, _ = get_financial_analysis("user")
+
+    assert financial_data.stale
+    assert cache.get("user", "fingerprint") is None
+
+
+def test_failed_sync_after_complete_one_serves_stale_mirror(mirror, remote, rows, monkeypatch):
+    fresh = fetch_fi_snapshot_mirrored("user", DATA_TO)
+    assert mirror.is_complete("user") and not fresh.stale
+
+    monkeypatch.setattr(fi_mirror, "fetch_accounts", lambda user_id: (_ for _ in ()).throw(SupabaseDown()))
+    snapshot = fetch_fi_snapshot_mirrored("user", DATA_TO)
+
+    assert snapshot.stale
+    assert snapshot.transaction_count() == len(rows[1])
+    assert remote["remote_fetches"] == 0
+
+
+def test_interrupted_first_pull_resumes_and_completes(mirror, remote, rows):
+    remote["fail_after"] = 1
+    with pytest.raises(SupabaseDown):
+        mirror.sync("user")
+    assert not mirror.is_complete("user")
+
+    remote["fail_after"] = None
+    assert mirror.sync("user") == len(rows[1]) - 20
+    assert mirror.is_complete("user")
+
+
+def test_stale_analysis_is_not_cached(monkeypatch):
+    stale = FiSnapshot.empty(DATA_TO)
+    stale.stale = True
+    cache = AnalysisCache()
+    monkeypatch.setattr(analysis_cache, "_analysis_cache", cache)
+    monkeypatch.setattr(analysis_cache, "get_fi_fingerprint", lambda user_id: "fingerprint")
+    monkeypatch.setattr(analysis_cache, "fetch_fi_snapshot_mirrored", lambda user_id: stale)
+    monkeypatch.setattr(analysis_cache, "analyze_financial_data_incremental", lambda user_id, data: {})
+
+    get_financial_analysis("user")
+
+    assert cache.get("user", "fingerprint") is None
+
+
+def test_sync_locks_are_a_fixed_set(mirror):
+    locks = {id(mirror._user_lock(f"user-{i}")) for i in range(10_000)}
+    assert len(locks) <= fi_mirror.USER_LOCK_STRIPES
+    assert mirror._user_lock("user-1") is mirror._user_lock("user-1")
@@ -0,0 +1,21 @@
+from functions.finance_analyzer import iter_accounts
+from functions.fi_records import FiSnapshot
+from functions.synthetic_data import generate_db_rows
+
+# Amounts as Supabase returns them from a numeric column
+RAW_AMOUNTS = [1500, 1500.5, 12.34, 0.01, 99999999.99, 250, 0, None, 7.1]
+
+
+def test_amounts_render_as_get_fi_data_always_did():
+    accounts, transactions = generate_db_rows("user", accounts=1, transactions_per_account=len(RAW_AMOUNTS))
+    for txn, amount in zip(transactions, RAW_AMOUNTS):
+        txn["amount"] = txn["balance"] = amount
+
+    fi_data = FiSnapshot.from_rows(accounts, transactions, "2025-01-01").to_fi_data()
+    account, _, _ = next(iter_accounts(fi_data))
+    rendered = [(t["amount"], t["balance"]) for t in account["transactions"]["transaction"]]
+
+    # The baseline rendering: str(t.get('amount', '') or '')
+    expected = [(str(t.get("amount", "") or ""), str(t.get("balance", "") or "")) for t in transactions]
+    assert sorted(rendered) == sorted(expected)
+    assert ("1500", "1500") in rendered and ("1500.5", "1500.5") in rendered
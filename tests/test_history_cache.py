@@ -0,0 +1,79 @@
+from functions import history_cache
+from functions.history_cache import HistoryCache, to_history_message
+
+
+def history(n: int, text: str = "x" * 100) -> list:
+    return [to_history_message({"role": "user" if i % 2 == 0 else "model", "content": f"{text}{i}"}) for i in range(n)]
+
+
+def entry_size(messages: list) -> int:
+    return history_cache._size(messages)
+
+
+def test_evicts_least_recently_used_by_bytes():
+    size = entry_size(history(2))
+    cache = HistoryCache(max_bytes=size * 2, max_messages=10)
+    cache.put("a", history(2))
+    cache.put("b", history(2))
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.put("c", history(2))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == size * 2
+
+
+def test_append_grows_the_entry_and_can_evict_others():
+    cache = HistoryCache(max_bytes=entry_size(history(4)), max_messages=10)
+    cache.put("a", history(2))
+    cache.put("b", history(2))
+    cache.append("b", history(2))
+    assert cache.get("a") is None
+    assert len(cache.get("b")) == 4
+
+
+def test_oversized_history_is_not_cached():
+    cache = HistoryCache(max_bytes=entry_size(history(2)) - 1, max_messages=10)
+    cache.put("a", history(2))
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(history_cache.time, "monotonic", lambda: now[0])
+    cache = HistoryCache(ttl_seconds=60, max_messages=10)
+    cache.put("a", history(2))
+
+    now[0] += 59
+    assert cache.get("a") is not None
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_keeps_the_tail_and_tracks_completeness():
+    cache = HistoryCache(max_messages=4)
+    cache.put("short", history(3), complete=True)
+    cache.put("long", history(6), complete=True)
+    assert cache.is_complete("short") and not cache.is_complete("long")
+    assert cache.get("long") == history(6)[-4:]
+
+    cache.append("short", history(1))
+    assert cache.is_complete("short")
+    cache.append("short", history(1))
+    assert not cache.is_complete("short") and len(cache.get("short")) == 4
+    assert cache.stats()["bytes"] == entry_size(cache.get("short")) + entry_size(cache.get("long"))
+
+
+def test_summary_counts_towards_size():
+    cache = HistoryCache(max_messages=10)
+    cache.put("a", history(2))
+    before = cache.stats()["bytes"]
+    cache.set_summary("a", "s" * 50)
+    assert cache.get_summary("a") == "s" * 50
+    assert cache.stats()["bytes"] == before + 50
+    cache.invalidate("a")
+    assert cache.stats()["bytes"] == 0 and cache.get_summary("a") is None
@@ -0,0 +1,51 @@
+from functions.history_window import CHARS_PER_TOKEN, estimate_tokens, select_history_window, window_tokens
+
+
+def message(role: str, tokens: int) -> dict:
+    return {"role": role, "parts": ["x" * (tokens * CHARS_PER_TOKEN)]}
+
+
+def conversation(turns: int, tokens: int = 100) -> list:
+    return [message(role, tokens) for _ in range(turns) for role in ("user", "model")]
+
+
+def test_estimate_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("x" * (CHARS_PER_TOKEN + 1)) == 2
+
+
+def test_short_history_is_sent_whole():
+    history = conversation(5)
+    assert select_history_window(history, token_budget=8000) == history
+
+
+def test_window_keeps_the_newest_messages_within_budget():
+    history = conversation(50)
+    window = select_history_window(history, token_budget=1000, min_turns=1)
+
+    assert window == history[-len(window):]
+    assert window_tokens(window) <= 1000
+    assert len(window) == 10
+
+
+def test_min_turns_are_kept_past_the_budget():
+    window = select_history_window(conversation(10, tokens=500), token_budget=100, min_turns=3)
+    assert len(window) == 6
+
+
+def test_window_starts_at_a_user_message():
+    history = conversation(10)
+    # A budget that fits an odd number of messages would otherwise open on a reply
+    window = select_history_window(history, token_budget=500, min_turns=1)
+    assert window[0]["role"] == "user"
+    assert len(window) == 4
+
+
+def test_long_messages_are_capped_at_both_ends():
+    text = "start " + "x" * 40000 + " end"
+    window = select_history_window([{"role": "user", "parts": [text]}], message_cap=100)
+
+    kept = window[0]["parts"][0]
+    assert estimate_tokens(kept) <= 100
+    assert kept.startswith("start") and kept.endswith("end")
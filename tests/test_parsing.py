@@ -0,0 +1,42 @@
+import random
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from functions.parsing import parse_date, parse_timestamp_column, to_datetime
+
+
+def column_values(values: list) -> list:
+    wall, offset = parse_timestamp_column(values)
+    return [None if np.isnat(w) else to_datetime(w, o) for w, o in zip(wall, offset)]
+
+
+def test_column_matches_parse_date_across_layouts():
+    values = [
+        "2024-01-31T23:59:59+05:30",   # fixed layout
+        "2024-02-29T00:00:00-04:00",   # leap day, negative offset
+        "2023-06-15T12:30:00+00:00",
+        "2024-03-10T08:15:30.250Z",    # fractional seconds, Z
+        "2024-03-10T08:15:30+0530",    # offset without a colon
+        "2024-03-10",                  # date only, naive
+        "2023-02-29T10:00:00+05:30",   # fixed layout, impossible date
+        "2024-13-01T10:00:00+05:30",   # fixed layout, impossible month
+        "2024-01-01T24:00:00+05:30",   # fixed layout, impossible hour
+        "not a date",
+        "",
+        None,
+    ]
+    assert column_values(values) == [parse_date(v) for v in values]
+
+
+def test_column_matches_parse_date_on_random_timestamps():
+    rng = random.Random(7)
+    values = []
+    for _ in range(500):
+        offset = timedelta(minutes=rng.choice([-480, -210, 0, 330, 345, 540]))
+        moment = datetime(2000, 1, 1, tzinfo=timezone(offset)) + timedelta(seconds=rng.randrange(10 ** 9))
+        values.append(moment.isoformat())
+    assert column_values(values) == [parse_date(v) for v in values]
+
+
+def test_empty_column():
+    wall, offset = parse_timestamp_column([])
+    assert len(wall) == len(offset) == 0
@@ -0,0 +1,108 @@
+import cProfile
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from jose import jwt
+from functions import profiling
+from functions.profiling import profile_request, stage
+from routes import debugRoutes
+
+
+@pytest.fixture
+def sample_everything(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+
+def test_overlapping_samples_run_one_profiler(sample_everything):
+    with profile_request("first", enabled=False) as first:
+        # Picked for sampling while "first" holds the profiler: runs unsampled instead of failing
+        with profile_request("second", enabled=False) as second:
+            pass
+        with profile_request("third", enabled=True) as third:
+            with stage("work"):
+                pass
+    assert first is not None and second is None
+    assert [path for path, _, _ in third.stages] == ["work"]
+    assert not profiling._sampling.locked()
+
+
+def test_sample_skipped_when_another_profiler_is_active(sample_everything):
+    outside = cProfile.Profile()
+    outside.enable()
+    try:
+        with profile_request("request", enabled=False) as profile:
+            pass
+    finally:
+        outside.disable()
+    assert profile is not None
+    assert not profiling._sampling.locked()
+
+
+@pytest.fixture
+def debug_client(monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    app = FastAPI()
+    app.include_router(debugRoutes.router)
+    return TestClient(app)
+
+
+def test_debug_routes_require_a_token(debug_client):
+    assert debug_client.get("/debug/stages").status_code in (401, 403)
+    assert debug_client.get("/debug/stages", headers={"Authorization": "Bearer nope"}).status_code == 403
+
+    token = jwt.encode({"user_id": "admin"}, "test-secret")
+    response = debug_client.get("/debug/stages", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+def test_debug_routes_are_off_by_default():
+    from main import DEBUG_ENDPOINTS, app
+    assert not DEBUG_ENDPOINTS
+    assert not [route for route in app.routes if getattr(route, "path", "").startswith("/debug")]
+
+
+@pytest.fixture
+def profiled_app(monkeypatch):
+    from main import log_requests
+    logged = []
+    monkeypatch.setattr(profiling.logger, "info", lambda message, **kwargs: logged.append(message))
+
+    app = FastAPI()
+    app.middleware("http")(log_requests)
+
+    async def events():
+        with stage("generate"):
+            yield "data: hello\n\n"
+        with stage("save"):
+            yield "data: done\n\n"
+
+    @app.get("/plain")
+    async def plain():
+        with stage("work"):
+            return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        with stage("setup"):
+            pass
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return TestClient(app), logged
+
+
+def test_streamed_body_stages_are_profiled(profiled_app):
+    client, logged = profiled_app
+    response = client.get("/stream", headers={profiling.PROFILE_HEADER: "1"})
+
+    assert response.text == "data: hello\n\ndata: done\n\n"
+    assert "Server-Timing" not in response.headers
+    [profile_log] = [message for message in logged if message.startswith("Stage profile")]
+    assert all(f"{name}:" in profile_log for name in ("setup", "generate", "save"))
+
+
+def test_plain_response_gets_server_timing(profiled_app):
+    client, _ = profiled_app
+    response = client.get("/plain", headers={profiling.PROFILE_HEADER: "1"})
+    assert response.headers["Server-Timing"].startswith("work;dur=")
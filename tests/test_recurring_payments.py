@@ -0,0 +1,78 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from functions.finance_analyzer import analyze_behavioral_patterns
+from functions.recurring_payments import detect_recurring, fold_series, merge_series
+from functions.transaction_columns import TransactionColumns
+
+IST = timezone(timedelta(hours=5, minutes=30))
+START = datetime(2024, 1, 5, 10, 0, tzinfo=IST)
+
+
+def txn(when: datetime, amount: float, name: str, txn_type: str = "DEBIT") -> dict:
+    return {
+        "amount": f"{amount:.2f}", "mode": "UPI", "type": txn_type, "balance": "1000.00",
+        "narration": f"UPI/DR/594634318905/{name}/{name.lower()}@hdfcbank/1",
+        "transactionTimestamp": when.isoformat(),
+    }
+
+
+def history() -> list:
+    rows = []
+    # Rent on the 5th for a year, one month skipped
+    rows += [txn(START.replace(month=m), 25000, "LANDLORD") for m in range(1, 13) if m != 7]
+    # Salary at month end, amounts drifting within one band
+    rows += [txn(START.replace(month=m, day=28), 90000 + 500 * m, "ACME", "CREDIT") for m in range(1, 13)]
+    # Weekly groceries
+    rows += [txn(START + timedelta(weeks=w, hours=3), 1500, "GROCER") for w in range(50)]
+    # A subscription that stopped in April
+    rows += [txn(START.replace(month=m, day=12), 649, "NETFLIX") for m in range(1, 5)]
+    # Irregular one-off spends to the same shop
+    rows += [txn(START + timedelta(days=d, hours=5), 800, "BOOKSHOP") for d in (3, 40, 41, 150, 300)]
+    rows.sort(key=lambda r: r["transactionTimestamp"])
+    return rows
+
+
+def detect(rows: list, chunks: int = 1) -> list:
+    series = {}
+    for part in np.array_split(np.arange(len(rows)), chunks):
+        chunk = {}
+        fold_series(chunk, TransactionColumns.from_transactions([rows[i] for i in part]))
+        merge_series(series, chunk)
+    latest = max(entry[2] for entry in series.values())
+    return detect_recurring(series, latest)
+
+
+def test_detects_periodic_series():
+    found = {s["counterparty"]: s for s in detect(history())}
+    assert set(found) == {"LANDLORD", "ACME", "GROCER", "NETFLIX"}
+
+    rent = found["LANDLORD"]
+    assert (rent["frequency"], rent["occurrences"], rent["active"]) == ("monthly", 11, True)
+    assert rent["regularity"] == 0.9  # the skipped month is one irregular interval out of ten
+    assert rent["expected_amount"] == 25000
+
+    assert found["ACME"]["type"] == "CREDIT" and found["ACME"]["frequency"] == "monthly"
+    assert found["GROCER"]["frequency"] == "weekly" and found["GROCER"]["average_interval_days"] == 7.0
+    assert found["NETFLIX"]["active"] is False
+
+
+def test_orders_active_series_first_by_monthly_amount():
+    order = [s["counterparty"] for s in detect(history())]
+    assert order == ["ACME", "LANDLORD", "GROCER", "NETFLIX"]
+
+
+def test_chunked_folds_match_one_shot():
+    rows = history()
+    assert detect(rows, chunks=7) == detect(rows)
+
+
+def test_recurring_payment_days_keeps_its_day_of_month_meaning():
+    rows = history()
+    patterns = analyze_behavioral_patterns(rows)
+    days = Counter(datetime.fromisoformat(r["transactionTimestamp"]).day for r in rows)
+
+    assert patterns["recurring_payment_days"] == sorted(day for day, count in days.items() if count >= 3)
+    # Detected series are reported separately and do not narrow the day list
+    series_days = {date.fromisoformat(s["last_date"]).day for s in patterns["recurring_payments"]}
+    assert set(patterns["recurring_payment_days"]) - series_days
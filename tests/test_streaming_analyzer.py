@@ -0,0 +1,90 @@
+import pytest
+from functions import analysis_state, transaction_aggregate
+from functions.analysis_state import AnalysisStateStore, account_key, analyze_financial_data_incremental
+from functions.finance_analyzer import (
+    analyze_behavioral_patterns, analyze_financial_data, analyze_transactions, data_as_of, iter_accounts
+)
+from functions.recurring_payments import prune_series
+from functions.streaming_analyzer import StreamingAnalyzer, aggregate_transaction_stream, analyze_transactions_stream
+from functions.synthetic_data import generate_fi_data
+from functions.time_index import DAILY_HORIZON_DAYS, TimeIndex, compact_daily
+
+
+@pytest.fixture(scope="module")
+def history():
+    aa_data = generate_fi_data(accounts=1, transactions_per_account=4000, seed=11)
+    account, _, _ = next(iter_accounts(aa_data))
+    return aa_data, account["transactions"]["transaction"]
+
+
+def test_stream_matches_batch(history, assert_same_summary):
+    aa_data, txns = history
+    as_of = data_as_of(aa_data)
+    assert_same_summary(analyze_transactions_stream(txns, chunk_size=250), analyze_transactions(txns))
+    assert_same_summary(
+        aggregate_transaction_stream(txns, chunk_size=250).behavioral_patterns(as_of),
+        analyze_behavioral_patterns(txns, as_of)
+    )
+
+
+def test_batch_incremental_and_streaming_agree(tmp_path, monkeypatch, assert_same_summary):
+    monkeypatch.setattr(analysis_state, "_state_store", AnalysisStateStore(str(tmp_path / "state.db")))
+    aa_data = generate_fi_data(accounts=3, transactions_per_account=600, seed=13)
+    batch = analyze_financial_data(aa_data)
+
+    rows = sorted(
+        ((account_key(account, fip_id), txn) for account, _, fip_id in iter_accounts(aa_data)
+         for txn in account["transactions"]["transaction"]),
+        key=lambda row: row[1]["transactionTimestamp"]
+    )
+    streamed = StreamingAnalyzer(chunk_size=128).consume(rows).summarize(aa_data)
+    incremental = analyze_financial_data_incremental("user", aa_data)
+
+    assert_same_summary(streamed, batch)
+    assert_same_summary(incremental, batch)
+
+
+def test_daily_tallies_are_bounded(history):
+    _, txns = history
+    aggregate = aggregate_transaction_stream(txns, chunk_size=250)
+    days = sorted(aggregate.daily)
+    old = [d for d in days if d < days[-1 - DAILY_HORIZON_DAYS]]
+    assert old and all(d.endswith("-01") for d in old)
+    assert len(days) <= DAILY_HORIZON_DAYS + 1 + len(aggregate.monthly)
+    assert sum(c for by_type in aggregate.daily.values() for c, _ in by_type.values()) == len(txns)
+
+
+def test_compact_daily_preserves_totals():
+    daily = {
+        "2022-03-05": {"DEBIT": [1, 10.0]},
+        "2022-03-20": {"DEBIT": [2, 5.0], "CREDIT": [1, 100.0]},
+        "2024-01-02": {"DEBIT": [1, 1.0]},
+    }
+    compact_daily(daily, horizon_days=30)
+    assert daily == {
+        "2022-03-01": {"DEBIT": [3, 15.0], "CREDIT": [1, 100.0]},
+        "2024-01-02": {"DEBIT": [1, 1.0]},
+    }
+    assert TimeIndex.from_daily(daily).range_totals("2022-03-01", "2022-03-31")["net"] == 85.0
+
+
+def test_recipients_are_capped_heaviest_first(history, monkeypatch):
+    _, txns = history
+    full = aggregate_transaction_stream(txns, chunk_size=len(txns)).recipients
+    monkeypatch.setattr(transaction_aggregate, "MAX_RECIPIENTS", 5)
+    capped = aggregate_transaction_stream(txns, chunk_size=len(txns)).recipients
+    heaviest = sorted(full.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)[:5]
+    assert capped == dict(heaviest)
+
+
+def test_prune_series_keeps_reportable_series():
+    day = 86_400_000_000
+    entry = lambda count, last_day: [count, 0, last_day * day, last_day * day, 0, 1.0, 1.0, [0] * 4, [0.0] * 4]
+    series = {
+        "established": entry(12, 10),   # old but already recurring
+        "recent": entry(1, 990),        # could still recur
+        "dormant": entry(2, 100),       # one-off, long gone
+        "newest": entry(3, 1000),
+    }
+    prune_series(series, limit=3)
+    assert set(series) == {"established", "recent", "newest"}
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+from functions.finance_analyzer import analyze_financial_data, data_as_of
+from functions.synthetic_data import generate_fi_data
+from functions.time_index import TimeIndex
+
+DAILY = {
+    "2024-01-10": {"DEBIT": [1, 100.0]},
+    "2024-02-20": {"CREDIT": [1, 500.0], "DEBIT": [2, 50.0]},
+}
+
+
+def test_window_ends_on_as_of_not_latest_transaction():
+    index = TimeIndex.from_daily(DAILY)
+    # A quiet March: nothing in the 30 days to the end of the data range
+    window = index.window(30, as_of="2024-03-31T00:00:00.000Z")
+    assert (window["from"], window["to"]) == ("2024-03-02", "2024-03-31")
+    assert window["transactions"] == 0 and window["net"] == 0
+
+    window = index.window(30, as_of="2024-02-29")
+    assert window["transactions"] == 3
+    assert (window["inflow"], window["outflow"], window["net"]) == (500.0, 50.0, 450.0)
+
+
+def test_window_defaults_to_today():
+    today = date.today()
+    index = TimeIndex.from_daily({
+        (today - timedelta(days=3)).isoformat(): {"DEBIT": [1, 10.0]},
+        (today - timedelta(days=40)).isoformat(): {"DEBIT": [1, 20.0]},
+    })
+    windows = index.rolling_windows()
+    assert windows["last_7_days"]["to"] == today.isoformat()
+    assert windows["last_7_days"]["outflow"] == 10.0
+    assert windows["last_30_days"]["outflow"] == 10.0
+    assert windows["last_90_days"]["outflow"] == 30.0
+
+
+def test_analysis_anchors_windows_on_data_range_end():
+    aa_data = generate_fi_data(accounts=1, transactions_per_account=50, seed=5)
+    aa_data["dataRange"]["to"] = "2100-01-01T00:00:00.000Z"
+    assert data_as_of(aa_data) == "2100-01-01"
+
+    summary = analyze_financial_data(aa_data)
+    windows = summary["behavioral_patterns"]["rolling_windows"]
+    assert windows["last_30_days"]["to"] == "2100-01-01"
+    assert windows["last_365_days"]["transactions"] == 0
+    recent = summary["personalization_context"]["financial_snapshot"]["recent_cash_flow"]
+    assert recent["last_30_days"] == {"inflow": 0.0, "outflow": 0.0, "net": 0.0}
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from benchmarks.postgrest_standin import PostgrestStandIn
+from config import async_database, write_journal
+from config.async_database import AsyncChatDatabase
+from config.write_journal import WriteJournal, with_message_ids
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def standin_db() -> tuple[PostgrestStandIn, AsyncChatDatabase]:
+    standin = PostgrestStandIn()
+    db = AsyncChatDatabase(*await standin.async_client())
+    await db.create_conversation("user", "conv")
+    return standin, db
+
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(async_database, "_async_db_instance", None)
+    return str(tmp_path / "write_journal.db")
+
+
+def turn(i: int) -> list:
+    return with_message_ids([
+        {"role": "user", "content": f"question {i}"},
+        {"role": "model", "content": f"answer {i}", "model": "gemini-2.5-flash"}
+    ])
+
+
+def session(i: int) -> dict:
+    return {
+        "user_id": "user", "session_id": f"fin_session_{i}", "question": "q", "financial_data": {},
+        "analysis": "", "mentor_response": f"advice {i}", "model": "gemini-2.5-flash", "data_quality": {}
+    }
+
+
+def test_workers_sharing_a_journal_send_each_entry_once(journal_path, monkeypatch):
+    async def scenario():
+        standin, db = await standin_db()
+        monkeypatch.setattr(async_database, "_async_db_instance", db)
+        workers = [WriteJournal(journal_path) for _ in range(3)]
+        for i in range(30):
+            await workers[i % 3].add_turn("conv", turn(i))
+            await workers[i % 3].save_financial_session(**session(i))
+
+        await asyncio.gather(*(worker.flush() for worker in workers for _ in range(2)))
+        for worker in workers:
+            worker.close()
+        await db.close()
+        return standin
+
+    standin = run(scenario())
+    contents = [row["content"] for row in standin.rows("messages")]
+    assert contents == [text for i in range(30) for text in (f"question {i}", f"answer {i}")]
+    assert len(standin.rows("mentor_sessions")) == 30
+
+
+def test_resent_writes_are_applied_once():
+    async def scenario():
+        standin, db = await standin_db()
+        messages = turn(0)
+        await db.add_turn("conv", messages)
+        assert await db.add_turn("conv", messages) == []
+        await db.save_financial_sessions([session(0), session(1)])
+        await db.save_financial_sessions([session(1), session(2)])
+        await db.close()
+        return standin
+
+    standin = run(scenario())
+    assert len(standin.rows("messages")) == 2
+    assert [row["session_id"] for row in standin.rows("mentor_sessions")] == [f"fin_session_{i}" for i in range(3)]
+
+
+def test_claimed_entries_are_skipped_until_the_lease_expires(journal_path, monkeypatch):
+    async def scenario():
+        first, second = WriteJournal(journal_path), WriteJournal(journal_path)
+        await first.add_turn("conv", turn(0))
+        await first.add_turn("conv", turn(1))
+
+        assert [entry.seq for entry in first._claim_batch()] == [1, 2]
+        assert second._claim_batch() == []
+
+        # A later turn of the conversation waits behind the in-flight ones
+        await first.add_turn("conv", turn(2))
+        assert second._claim_batch() == []
+
+        # Once the first worker's lease runs out, whoever claims next resends everything in order
+        with first._conn:
+            first._conn.execute("UPDATE journal SET claimed_until = 0")
+        monkeypatch.setattr(write_journal, "WRITE_BEHIND_LEASE_SECONDS", -1)
+        assert [entry.seq for entry in second._claim_batch()] == [1, 2, 3]
+        assert [entry.seq for entry in first._claim_batch()] == [1, 2, 3]
+        first.close()
+        second.close()
+
+    run(scenario())
+
+
+def test_retry_blocks_later_turns_of_the_conversation(journal_path):
+    async def scenario():
+        journal = WriteJournal(journal_path)
+        await journal.add_turn("conv", turn(0))
+        journal._record_failure(journal._claim_batch(), "TimeoutError")
+        await journal.add_turn("other", turn(1))
+        await journal.add_turn("conv", turn(2))
+
+        # seq 3 waits behind the backing-off seq 1; the other conversation is free
+        assert [entry.key for entry in journal._claim_batch()] == ["other"]
+        journal.close()
+
+    run(scenario())
+
+
+def test_conversation_messages_include_pending_turns_once(journal_path, monkeypatch):
+    async def scenario():
+        standin, db = await standin_db()
+        monkeypatch.setattr(async_database, "_async_db_instance", db)
+        journal = WriteJournal(journal_path)
+        flushed, pending = turn(0), turn(1)
+        await journal.add_turn("conv", flushed)
+        await journal.add_turn("conv", pending)
+        # The first turn reached Supabase but is still journaled, as when another worker is mid-flush
+        await db.add_turn("conv", flushed)
+
+        messages = await journal.conversation_messages("conv")
+        tail = await journal.conversation_messages("conv", limit=5)
+        journal.close()
+        await db.close()
+        return messages, tail
+
+    messages, tail = run(scenario())
+    assert [message["content"] for message in messages] == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert [message["content"] for message in tail] == ["question 0", "answer 0", "question 1", "answer 1"]
+
+
+def test_appends_are_counted_without_scanning_the_journal(journal_path):
+    async def scenario():
+        journal = WriteJournal(journal_path)
+        for i in range(3):
+            await journal.add_turn("conv", turn(i))
+        assert journal._appended == 3
+        await journal.flush()
+        assert journal._appended == 0
+        journal.close()
+
+    run(scenario())